@@ -1,9 +1,16 @@
-import math
 import os
 from random import random, randint
 from Game_UI import SlidePuzzle, WIDTH, HEIGHT
+import numpy as np
 import pygame
 
+import curriculum
+import qtable
+from distance_table import loadTable
+from permutation import findRank
+from qlearning import QLearningEngine, learningRate
+from transitions import GOAL, trainingStates, transitionTable
+
 
 def main():
     """
@@ -54,19 +61,13 @@ def initPlayerAI(puzzle, modelAI, nbGames=100):
 
         puzzle.drawBar(pos, size, borderC, barC, 0.0)
 
-        # Pre-Learning.
-        for i in range(31):
-            for j in range(nbGames):
-                AI.initLearning(i + 1, 1)
-                puzzle.drawBar(
-                    pos,
-                    size,
-                    borderC,
-                    barC,
-                    (i * nbGames + j + 1) / (31 * nbGames),
-                )
-                for event in pygame.event.get():
-                    puzzle.catchExitEvent(event)
+        def showProgress(fraction):
+            puzzle.drawBar(pos, size, borderC, barC, fraction)
+            for event in pygame.event.get():
+                puzzle.catchExitEvent(event)
+
+        # Pre-Learning, the games are played across a pool of processes.
+        AI.preTrain(nbGames, showProgress)
         AI.saveQTable()
     return AI
 
@@ -98,16 +99,25 @@ class AIPlayer:
         # A permutations of the string "123456789" corresponds to possible state
         # of the game. And in each state, we can make 4 actions [up, right, down, left].
         # The Q-Table is indexed in the lexicographical order of the string representing a state.
-        self.qTable = []
+        # It is a numpy array of shape (9!, 4), see the qtable module.
+        self.qTable = None
         self.qTablePath = fileQTable
 
         self.puzzle = puzzle
-
-        if fileQTable != "" and os.path.isfile(fileQTable):
+        # The vectorised training engine, created on first use (see getEngine).
+        self.engine = None
+        # The move table: nextState[stateIndex, action] is the index of the next state.
+        self.nextState = transitionTable()
+
+        if fileQTable.endswith(".txt"):
+            # Q-Tables saved in the former text format are converted once to the binary format.
+            self.qTablePath = os.path.splitext(fileQTable)[0] + qtable.QTABLE_EXT
+            if os.path.isfile(fileQTable) and not os.path.isfile(self.qTablePath):
+                qtable.convertTextQTable(fileQTable, self.qTablePath)
+        if self.qTablePath != "" and os.path.isfile(self.qTablePath):
             self.loadQTable()
         else:
-            for _ in range(math.factorial(9)):
-                self.qTable.append([0.0, 0.0, 0.0, 0.0])
+            self.qTable = qtable.newQTable()
 
     def moveTileAI(self):
         """
@@ -155,14 +165,29 @@ class AIPlayer:
         self.puzzle.trainingDiplay("The AI is training ...", 0, playedGames, 1, 0, 0)
         trainedSoFar = 0
         totalNbMoves = 0
-        trainingInterval = 0
+        # Games and moves shown by the last refresh of the display.
+        trainingInterval = 1
         nbMoves = 0
-        while trainedSoFar < trainingNb:
-            trainingInterval = self.getTrainingInterval(playedGames)
-            nbMoves = self.train(trainingInterval)
-            totalNbMoves += nbMoves
-            trainedSoFar += trainingInterval
-            playedGames += trainingInterval
+        # Games and moves solved since the last refresh.
+        pendingGames = 0
+        pendingMoves = 0
+
+        def showProgress(nbGames, moves):
+            # The display is refreshed every getTrainingInterval games, like before the
+            # games were played in lockstep.
+            nonlocal trainedSoFar, totalNbMoves, playedGames, trainingInterval, nbMoves
+            nonlocal pendingGames, pendingMoves
+            trainedSoFar += nbGames
+            totalNbMoves += moves
+            pendingGames += nbGames
+            pendingMoves += moves
+            if trainedSoFar < trainingNb and pendingGames < self.getTrainingInterval(
+                playedGames
+            ):
+                return
+            playedGames += pendingGames
+            trainingInterval, nbMoves = pendingGames, pendingMoves
+            pendingGames = pendingMoves = 0
             self.puzzle.trainingDiplay(
                 "The AI is training ...",
                 trainedSoFar,
@@ -175,6 +200,9 @@ class AIPlayer:
                 if event.type == pygame.QUIT:
                     self.saveQTable()
                     self.puzzle.exit()
+
+        # All the games are given to the engine at once, it is only fast on large batches.
+        self.train(trainingNb, showProgress)
         self.saveQTable()
         while True:
             self.puzzle.trainingDiplay(
@@ -230,98 +258,49 @@ class AIPlayer:
         :param state:       A string corresponding to a state of the game.
         :return:            A list of Q-Values corresponding to the 4 possible directoins.
         """
-        return self.qTable[findRank(state) - 1].copy()
+        return self.qTable[findRank(state) - 1].tolist()
 
     def saveQTable(self):
         """
-        Saves the QTable in a text file called "QTable.txt".
-        """
-        f = open(self.qTablePath, "w")
-        f.write("{}\n".format(self.nbPlayedGames))
-        f.write("{}\n".format(self.epsilon))
-        f.write("{}\n".format(self.gamma))
-        f.write("{}\n".format(self.learningSteps))
-        for i in range(math.factorial(9)):
-            for j in range(4):
-                f.write("{} ".format(self.qTable[i][j]))
-            f.write("\n")
-        f.close()
+        Saves the QTable in the binary file "self.qTablePath" (see the qtable module).
+        A memory-mapped QTable is copied in memory first, so that its file can be replaced.
+        """
+        self.qTable = qtable.inMemory(self.qTable)
+        qtable.saveQTable(
+            self.qTablePath,
+            self.qTable,
+            self.nbPlayedGames,
+            self.epsilon,
+            self.gamma,
+            self.learningSteps,
+        )
 
     def loadQTable(self):
         """
-        Loads the QTable contained in the "QTable.txt" file.
+        Loads the QTable contained in the binary file "self.qTablePath", it is memory-mapped.
         """
-        f = open(self.qTablePath, "r")
-        self.nbPlayedGames = int(f.readline().strip())
-        self.epsilon = float(f.readline().strip())
-        self.gamma = float(f.readline().strip())
-        self.learningSteps = int(f.readline().strip())
-        for _ in range(math.factorial(9)):
-            directions = []
-            directionValues = f.readline().split()
-            for j in range(4):
-                directions.append(float(directionValues[j]))
-            self.qTable.append(directions)
-        f.close()
+        self.qTable, params = qtable.loadQTable(self.qTablePath)
+        self.nbPlayedGames = params["nbPlayedGames"]
+        self.epsilon = params["epsilon"]
+        self.gamma = params["gamma"]
+        self.learningSteps = params["learningSteps"]
 
-    def makeMove(self, currentState, direction):
+    def makeMove(self, stateIndex, direction):
         """
-        Makes the desired move by returning the next state of the game.
+        Makes the desired move by returning the next state of the game, read in the move table.
         If the move is illegal, the same state is returned.
 
-        :param currentState:    A string corresponding to the current state of the game.
+        :param stateIndex:      An integer corresponding to the index of the current state of the game.
         :param direction:       An integer corresponding to the direction where we want to move the empty tile.
-        :return:                A string corresponding to the next state of the game (after the move).
-        """
-        nextState = None
-        emptyTileIndex = currentState.index("9")
-        if direction == self.UP:
-            if emptyTileIndex >= 3:
-                destinationTile = currentState[emptyTileIndex - 3]
-                nextState = (
-                    currentState[0 : emptyTileIndex - 3]
-                    + "9"
-                    + currentState[emptyTileIndex - 2 : emptyTileIndex]
-                    + destinationTile
-                    + currentState[emptyTileIndex + 1 :]
-                )
-        elif direction == self.DOWN:
-            if emptyTileIndex <= 5:
-                destinationTile = currentState[emptyTileIndex + 3]
-                nextState = (
-                    currentState[0:emptyTileIndex]
-                    + destinationTile
-                    + currentState[emptyTileIndex + 1 : emptyTileIndex + 3]
-                    + "9"
-                    + currentState[emptyTileIndex + 4 :]
-                )
-        elif direction == self.LEFT:
-            if emptyTileIndex % 3 != 0:
-                destinationTile = currentState[emptyTileIndex - 1]
-                nextState = (
-                    currentState[0 : emptyTileIndex - 1]
-                    + "9"
-                    + destinationTile
-                    + currentState[emptyTileIndex + 1 :]
-                )
-        else:
-            if emptyTileIndex % 3 != 2:
-                destinationTile = currentState[emptyTileIndex + 1]
-                nextState = (
-                    currentState[0:emptyTileIndex]
-                    + destinationTile
-                    + "9"
-                    + currentState[emptyTileIndex + 2 :]
-                )
-        if nextState == None:
-            nextState = currentState
-        return nextState
-
-    def selectNewAction(self, currentState):
+        :return:                An integer corresponding to the index of the next state of the game (after the move).
+        """
+        return int(self.nextState[stateIndex, direction])
+
+    def selectNewAction(self, stateIndex):
         """
         Chooses a new action according to the epsilon-greedy selection method.
 
-        :param currentState:    A string corresponding to the current state of the game.
+        :param stateIndex:      An integer corresponding to the index of the current state of the game.
         :return:                An integer corresponding to the new action
                                 (i.e. the direction we want to move the empty tile to).
         """
@@ -330,14 +309,10 @@ class AIPlayer:
             return randint(0, 3)
         # With probability 1-epsilon, choose the action corresponding to the maximum reward.
         else:
-            stateIndex = findRank(currentState) - 1
-            maxQValue = max(self.qTable[stateIndex])
+            qValues = self.qTable[stateIndex]
             # If multiple actions give the maximum value, we randomly choose one of those maximum actions.
-            maxIndexes = []
-            for i in range(4):
-                if self.qTable[stateIndex][i] == maxQValue:
-                    maxIndexes.append(i)
-            return maxIndexes[randint(0, len(maxIndexes) - 1)]
+            maxIndexes = np.flatnonzero(qValues == qValues.max())
+            return int(maxIndexes[randint(0, len(maxIndexes) - 1)])
 
     def getAlpha(self):
         """
@@ -346,9 +321,7 @@ class AIPlayer:
 
         :return:    Double corresponding to the current learning rate.
         """
-        return 1 / (
-            10 ** ((self.nbPlayedGames + self.learningSteps) / self.learningSteps)
-        )
+        return learningRate(self.nbPlayedGames, self.learningSteps)
 
     def playGame(self, state):
         """
@@ -359,35 +332,36 @@ class AIPlayer:
         oldEpsilon = self.epsilon
         self.epsilon = 0.0
         self.currentSolution = []
-        while state != "123456789":
-            newAction = self.selectNewAction(state)
-            newState = self.playRound(state, newAction)
-            if newState != state:
+        # The string is only converted once, the game is then played on state indices.
+        stateIndex = findRank(state) - 1
+        while stateIndex != GOAL:
+            newAction = self.selectNewAction(stateIndex)
+            newStateIndex = self.playRound(stateIndex, newAction)
+            if newStateIndex != stateIndex:
                 self.currentSolution.append(newAction)
-                state = newState
+                stateIndex = newStateIndex
         self.nbPlayedGames += 1
         self.epsilon = oldEpsilon
 
-    def playRound(self, state, action):
+    def playRound(self, stateIndex, action):
         """
         Moves a tile and updates the Q-Table.
 
-        :param state:       A string corresponding to the current state of the game.
+        :param stateIndex:  An integer corresponding to the index of the current state of the game.
         :param action:      An integer corresponding to the direction where to move the empty tile.
-        :return:            A string corresponding to the next state of the game (after the move).
+        :return:            An integer corresponding to the index of the next state of the game (after the move).
         """
-        stateIndex = findRank(state) - 1
-        nextState = self.makeMove(state, action)
-        if nextState == "123456789":
+        nextStateIndex = self.makeMove(stateIndex, action)
+        if nextStateIndex == GOAL:
             reward = 1
         else:
             reward = 0
-        self.qTable[stateIndex][action] += self.getAlpha() * (
+        self.qTable[stateIndex, action] += self.getAlpha() * (
             reward
-            + self.gamma * max(self.qTable[findRank(nextState) - 1])
-            - self.qTable[stateIndex][action]
+            + self.gamma * self.qTable[nextStateIndex].max()
+            - self.qTable[stateIndex, action]
         )
-        return nextState
+        return nextStateIndex
 
     def generateNStepsGame(self, nbMoves):
         """
@@ -395,135 +369,98 @@ class AIPlayer:
 
         :param nbMoves:     An integer corresponding to the maximum numbers of moves
                             necessary to solve the game instance.
-        :return:            A string corresponding to an instance of the 8Puzzle game.
+        :return:            An integer corresponding to the index of an instance of the 8Puzzle game.
         """
-        initState = "123456789"
-        currentState = initState
+        currentState = GOAL
         # We start by the final state and move away from it.
         while nbMoves > 0:
             newAction = randint(0, 3)
             newState = self.makeMove(currentState, newAction)
-            if newState != initState and newState != currentState:
+            if newState != GOAL and newState != currentState:
                 currentState = newState
                 nbMoves -= 1
         return currentState
 
     def generateGame(self):
         """
-        Generates a random instance of the 8Puzzle game.
-
-        :return:    A string corresponding to an instance of the game.
-        """
-        # We iterate if we created un unsolvable instance of the game.
-        solvableGame = False
-        game = []
-        while not solvableGame:
-            tiles = [1, 2, 3, 4, 5, 6, 7, 8, 9]
-            game = []
-            for i in range(9):
-                newTileIndex = randint(0, 8 - i)
-                game.append(tiles.pop(newTileIndex))
-            solvableGame = self.isSolvable(game)
-        # We convert the state, encoded as a list, into an integer.
-        stateAsInt = 0
-        for j in range(9):
-            stateAsInt += (10 ** (8 - j)) * game[j]
-        return str(stateAsInt)
-
-    def isSolvable(self, tiles):
-        count = 0
-        for i in range(len(tiles) - 1):
-            for j in range(i + 1, len(tiles)):
-                if tiles[i] > tiles[j] and tiles[i] != 9:
-                    count += 1
-        return True if (count % 2 == 0 and count != 0) else False
+        Generates a random instance of the 8Puzzle game, among the solvable
+        instances that are not already solved.
+
+        :return:    An integer corresponding to the index of an instance of the game.
+        """
+        startStates = trainingStates()
+        return int(startStates[randint(0, len(startStates) - 1)])
+
+    def getEngine(self):
+        """
+        Return the engine used to train the AI on many games at once.
+
+        :return:    A QLearningEngine working on this AI.
+        """
+        if self.engine is None:
+            self.engine = QLearningEngine(self)
+        return self.engine
 
     def initLearning(self, typeGame, nbGames):
         """
         An initial learning of the AI agent. We play a given number of games,
         that can be solved in at least 'typeGame' moves.
+        The games are played in lockstep by the QLearningEngine.
 
         :param typeGame:        Integer indicating that the games can be solved in at least
                                 'typegames' moves.
         :param nbGames:         Integer corresponding to the number of games to train the AI on.
         """
-        gamesWon = 0
-        while gamesWon < nbGames:
-            state = self.generateNStepsGame(typeGame)
-            nbMoves = 0
-            while state != "123456789" and nbMoves < typeGame * 100:
-                newAction = self.selectNewAction(state)
-                newState = self.playRound(state, newAction)
-                if newState != state:
-                    state = newState
-                    nbMoves += 1
-            if state == "123456789":
-                gamesWon += 1
+        self.getEngine().initLearning(typeGame, nbGames)
 
-    def preTrain(self, nbGames=100):
+    def preTrain(self, nbGames=100, progress=None, processes=None):
         """
         Proceeds to the inital training, by playing "nbGames" of each type.
+        The games are shared between a pool of processes (see the curriculum module).
 
         :param nbGames:     Integer corresponding to the number of games to train the AI on.
+        :param progress:    An optional function called with the fraction of the games played so far.
+        :param processes:   Integer corresponding to the number of processes (default the number of CPUs).
         """
-        for i in range(31):
-            self.initLearning(i + 1, nbGames)
+        curriculum.preLearning(self, nbGames, progress=progress, processes=processes)
 
-    def train(self, nbGames):
+    def train(self, nbGames, progress=None):
         """
-        Trains the AI by playing a specified number of games. The games are randomly generated.
+        Trains the AI by playing a specified number of games. The games are randomly generated
+        and played in lockstep by the QLearningEngine.
 
         :param nbGames:     An integer corresponding to the number of games to train the AI on.
+        :param progress:    An optional function, called with the number of games solved and
+                            their total number of moves each time some games are solved.
         :return:            Integer corresponding to total number of moves.
         """
-        nbMoves = 0
-        for _ in range(nbGames):
-            state = self.generateGame()
-            while state != "123456789":
-                newAction = self.selectNewAction(state)
-                state = self.playRound(state, newAction)
-                nbMoves += 1
-            self.nbPlayedGames += 1
-        return nbMoves
-
-
-def findSmallerInRight(string, start, end):
-    """
-    Counts the number of caracters that are smaller than
-    string[start] and are at the right of it.
-
-    :param string:      Input string.
-    :param start:       Integer corresponding to the index of the starting character.
-    :param end:         Integer corresponding to the index of the string.
-    :return:            Integer corresponding to the number of chars, on the right, that are smaller.
-    """
-    countRight = 0
-    i = start + 1
-    while i <= end:
-        if string[i] < string[start]:
-            countRight = countRight + 1
-        i = i + 1
-    return countRight
-
+        return self.getEngine().train(nbGames, progress)
 
-def findRank(string):
-    """
-    Returns the rank of the given string, considering all the
-    possible permutations of the string.
+    def evaluate(self, nbGames=100, maxMoves=1000):
+        """
+        Evaluates the greedy policy of the AI against the optimal solutions given by
+        the distance table. The Q-Table is not updated.
 
-    :param string:      Input string.
-    :return:            An integer corresponding to the rank of the input string.
-    """
-    strLen = len(string)
-    mul = math.factorial(strLen)
-    rank = 1
-    i = 0
-    while i < strLen:
-        mul = mul / (strLen - i)
-        countRight = findSmallerInRight(string, i, strLen - 1)
-        rank = rank + countRight * mul
-        i = i + 1
-    return int(rank)
+        :param nbGames:     Integer corresponding to the number of random games to play.
+        :param maxMoves:    Integer corresponding to the number of moves after which a game is given up.
+        :return:            A tuple with the ratio of solved games and the average number of moves
+                            above the optimal solution, for the solved games (None if none was solved).
+        """
+        table = loadTable()
+        solved = 0
+        extraMoves = 0
+        for _ in range(nbGames):
+            stateIndex = self.generateGame()
+            optimal = int(table[stateIndex])
+            nbMoves = 0
+            while stateIndex != GOAL and nbMoves < maxMoves:
+                action = int(self.qTable[stateIndex].argmax())
+                stateIndex = self.makeMove(stateIndex, action)
+                nbMoves += 1
+            if stateIndex == GOAL:
+                solved += 1
+                extraMoves += nbMoves - optimal
+        return solved / nbGames, extraMoves / solved if solved else None
 
 
 if __name__ == "__main__":
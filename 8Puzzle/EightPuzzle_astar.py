@@ -1,10 +1,11 @@
 import os
 import pygame
-import heapq
 import time
 import sys
 
 from Game_UI import SlidePuzzle
+from distance_table import loadTable, optimalPath
+from puzzle_core import astar
 
 FPS = 60
 
@@ -42,8 +43,10 @@ def playAIGame(puzzle, fpsclock):
 
     # Solve the game with A*
     start = time.time()
-    path = iter(solveAI(puzzle))
+    stats = {}
+    path = iter(solveAI(puzzle, stats))
     print("Exec time", time.time() - start)
+    print("Search stats", stats)
     if path is None:
         print("Error, the AI did not find any solution.")
         pygame.quit()
@@ -66,41 +69,23 @@ def playAIGame(puzzle, fpsclock):
         finished = puzzle.checkGameState(True)
 
 
-def solveAI(puzzle):
+def solveAI(puzzle, stats=None):
     """
-    Implementation of the A* algorithm to solve the 8-puzzle game.
+    Solve the 8-puzzle game optimally.
+    On the 3x3 grid, the solution is read from the precomputed distance table
+    (see distance_table), otherwise the A* algorithm of puzzle_core is used.
 
     :param puzzle: The puzzle instance.
-                   puzzle.tiles can be read/written (list of 9 (x,y) tuples).
-                   puzzle.isWin() returns True when puzzle.tiles matches the goal.
+                   puzzle.tiles is read (list of 9 (x,y) tuples) but left untouched.
+    :param stats:  An optional dictionary, filled with the counters of the search
+                   (see puzzle_core.astar, only "expanded" for the distance table).
     :return:       A list of blank-tile positions tracing the solution path.
                    e.g. [(2,2), (1,2), (1,1), ...] — each entry is where the blank
-                   moves to at each step.
-
-    Available helpers:
-        - heapq.heappush(queue, (priority, state, path))
-        - heapq.heappop(queue) -> (priority, state, path)
-        - moves(puzzle) -> list of neighbor configurations (set puzzle.tiles first!)
-        - heuristic(puzzle, config) -> int (Manhattan distance for a configuration)
+                   moves to at each step. None if there is no solution.
     """
-    start_tiles = puzzle.tiles[:]
-    queue = []
-    heapq.heappush(queue, (heuristic(puzzle, start_tiles), start_tiles, [start_tiles[-1]]))
-    g_scores = {str(start_tiles): 0}
-
-    while queue:
-        f_score, current_config, path = heapq.heappop(queue)
-        puzzle.tiles = current_config
-
-        if puzzle.isWin():
-            return path
-
-        for next_config in moves(puzzle):
-            g = g_scores[str(current_config)] + 1
-            if str(next_config) not in g_scores or g < g_scores[str(next_config)]:
-                g_scores[str(next_config)] = g
-                f = g + heuristic(puzzle, next_config)
-                heapq.heappush(queue, (f, next_config, path + [next_config[-1]]))
+    if tuple(puzzle.gs) == (3, 3):
+        return optimalPath(puzzle.tiles, loadTable(), stats)
+    return astar(puzzle.tiles, puzzle.gs, stats)
 
 
 def moves(puzzle):
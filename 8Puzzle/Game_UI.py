@@ -3,6 +3,8 @@ import re
 import pathlib
 import pygame
 
+from puzzle_core import PuzzleBoard
+
 # Constant for the size of the screen.
 WIDTH = 800
 HEIGHT = 500
@@ -11,7 +13,7 @@ TXT_CORE_SIZE = 38
 TXT_MENU_SIZE = 50
 
 
-class SlidePuzzle:
+class SlidePuzzle(PuzzleBoard):
     def __init__(self, gs, ts, ms, screen):
         """
         Init the game.
@@ -21,16 +23,11 @@ class SlidePuzzle:
         :param ms: The size of the margin. It is an Int.
         :param screen:      The screen, Surface object.
         """
-        # Attributes for the main core of the game.
+        # Attributes for the main core of the game (tiles, winCdt, ...).
+        super().__init__(gs)
         self.screen = screen
 
-        self.gs, self.ts, self.ms = gs, ts, ms
-        self.tiles_len = gs[0] * gs[1] - 1
-        # Tiles is a list of position [(0, 0), (1, 0), (2, 0), (0, 1), (1, 1), (2, 1), (0, 2), (1, 2), (2, 2)]
-        # for gs = (3, 3).
-        self.tiles = [(x, y) for y in range(gs[1]) for x in range(gs[0])]
-        # The win condition is the same list but we do not want to change to compare it with tiles.
-        self.winCdt = [(x, y) for y in range(gs[1]) for x in range(gs[0])]
+        self.ts, self.ms = ts, ms
 
         # actual pos on the screen.
         self.tilepos = [
@@ -106,35 +103,6 @@ class SlidePuzzle:
         pygame.draw.rect(self.screen, barC, (*innerPos, *innerSize))
         pygame.display.flip()
 
-    def getBlank(self):
-        """
-        Get the blank tile, the empty tile.
-
-        :return: Return the last tile, the position of the last tile. It is a tuple of Int (x, y).
-        """
-        return self.tiles[-1]
-
-    def setBlank(self, pos):
-        """
-        Set the blank tile, the empty tile.
-
-        :param pos: The position of the blank tile. It is a tuple of Int (x, y).
-        """
-        self.tiles[-1] = pos
-
-    # The blank tile, the empty tile.
-    opentile = property(getBlank, setBlank)
-
-    def isWin(self):
-        """
-        Check if the game is won.
-
-        :return: Return a Boolean, it is True if the game is won, otherwise False.
-        """
-        if self.tiles == self.winCdt:
-            return True
-        return False
-
     def sliding(self):
         """
         Check if there is a tile that is sliding.
@@ -167,29 +135,6 @@ class SlidePuzzle:
         )
         self.nb_move += 1
 
-    def inGrid(self, tile):
-        """
-        Check if the tile is in the grid.
-
-        :param tile: The tile to check, a tuple (x, y) of int.
-        :return:     Return a Boolean, it is True if the tile is in the grid, otherwise False.
-        """
-        return (
-            tile[0] >= 0
-            and tile[0] < self.gs[0]
-            and tile[1] >= 0
-            and tile[1] < self.gs[1]
-        )
-
-    def adjacent(self):
-        """
-        Give the positions of the tiles adjacent to the blank tile.
-
-        :return: Return positions of the tiles adjacent to the blank tile, 4 tuples (x, y) of Int.
-        """
-        x, y = self.opentile
-        return (x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)
-
     def random(self):
         """
         Choose randomly an action.
@@ -202,32 +147,6 @@ class SlidePuzzle:
             False,
         )
 
-    def shuffle(self):
-        """
-        Shuffle tiles and check if the board is solvable.
-        """
-        print("shuf")
-        while not self.isSolvable():
-            random.shuffle(self.tiles)
-
-    def isSolvable(self):
-        """
-        Check if the game is solvable.
-
-        :return: Return a Boolean, True if the board is solvable, otherwise False.
-        """
-        tiles = []
-        for i in range(len(self.tiles)):
-            for j in range(len(self.tiles)):
-                if self.tiles[j][1] * 3 + self.tiles[j][0] + 1 == i + 1:
-                    tiles.append(j + 1)
-        count = 0
-        for i in range(len(tiles) - 1):
-            for j in range(i + 1, len(tiles)):
-                if tiles[i] > tiles[j] and tiles[i] != 9:
-                    count += 1
-        return True if (count % 2 == 0 and count != 0) else False
-
     def update(self, dt):
         """
         Update the view.
@@ -569,8 +488,14 @@ class SlidePuzzle:
         ]
         # Do a natural sort, it is a sort where we sort as follow:
         # [a1, a11, a2, a22] => [a1, a2, a11, a22].
-        reg = re.compile(r"QTable_(\d+).txt")
+        reg = re.compile(r"QTable_(\d+)\.(txt|qtb)$")
         onlyfiles = list(filter(lambda f: reg.search(f), onlyfiles))
+        # A model saved in the former text format is listed once, after its conversion.
+        onlyfiles = [
+            f
+            for f in onlyfiles
+            if not (f.endswith(".txt") and f[:-4] + ".qtb" in onlyfiles)
+        ]
         print(onlyfiles)
         sorted_models = sorted([int(reg.search(f).group(1)) for f in onlyfiles])
         print(sorted_models)
@@ -614,7 +539,7 @@ class SlidePuzzle:
                                 return str(
                                     model_name
                                     / pathlib.Path(
-                                        f"QTable_{sorted_models[-1]+1}.txt"
+                                        f"QTable_{sorted_models[-1]+1}.qtb"
                                     )
                                 )
                             else:
@@ -622,7 +547,7 @@ class SlidePuzzle:
                                 return ""
                         else:
                             return str(
-                                model_name / pathlib.Path("QTable_0.txt")
+                                model_name / pathlib.Path("QTable_0.qtb")
                             )
                     if event.key == pygame.K_n:
                         return self.selectExistingModel(onlyfiles)
@@ -1095,19 +1020,6 @@ class SlidePuzzle:
                         self.want_to_quit = self.pauseMenu()
                         finished = self.want_to_quit
 
-    def convertToString(self):
-        """
-        Converts the current board into a string that can be feeded to AI.
-
-        :return: Return a String of the board.
-        """
-        state = []
-        for i in range(9):
-            state.append(0)
-        for j in range(self.tiles_len + 1):
-            state[self.tiles[j][0] + 3 * self.tiles[j][1]] = str(j + 1)
-        return "".join(state)
-
     def exit(self):
         """
         Exit the application.
@@ -0,0 +1,170 @@
+"""
+solver-benchmark: measure the A* solver on a fixed corpus of 3x3 boards.
+
+The corpus is drawn with a seeded random generator from the distance table
+(see distance_table), a given number of boards for every optimal depth from 1
+to 31 moves, so two runs with the same seed solve exactly the same boards.
+Every board is solved by A* with each heuristic and one CSV line is written per
+(board, heuristic) with the counters of the search (see puzzle_core.astar)
+and the wall time. The optimal column checks the length of the solution against
+the distance table, a False there is a regression.
+
+A summary per heuristic is printed on the standard error.
+
+Usage:
+    python benchmark.py -o benchmark.csv
+    python benchmark.py --per-depth 20 --depths 20-31 --heuristic linear --heuristic pdb
+"""
+import argparse
+import csv
+import random
+import sys
+import time
+
+import numpy as np
+
+from distance_table import GS, loadTable
+from permutation import unrank
+from puzzle_core import HEURISTICS, astar, heuristicFunction
+from puzzle_state import decode, tileAt
+
+# Largest optimal depth of a 3x3 board.
+MAX_DEPTH = 31
+FIELDS = [
+    "depth",
+    "board",
+    "heuristic",
+    "length",
+    "optimal",
+    "expanded",
+    "generated",
+    "peak_open",
+    "duplicates",
+    "heuristic_calls",
+    "wall_time",
+]
+
+
+def corpus(perDepth, seed=0, depths=range(1, MAX_DEPTH + 1)):
+    """
+    Draw the boards of the benchmark.
+
+    :param perDepth: An Int, the number of boards of each depth (less when there are
+                     not enough boards of that depth, e.g. there are only 2 of depth 31).
+    :param seed:     The seed of the random generator.
+    :param depths:   The optimal depths of the boards.
+    :return:         A list of (depth, state) tuples, state being a packed configuration.
+    """
+    table = loadTable()
+    rng = random.Random(seed)
+    boards = []
+    for depth in depths:
+        indices = np.flatnonzero(table == depth)
+        for i in sorted(rng.sample(range(len(indices)), min(perDepth, len(indices)))):
+            boards.append((depth, unrank(int(indices[i]))))
+    return boards
+
+
+def boardString(state):
+    """
+    :param state: A packed configuration of the 3x3 grid.
+    :return:      A string, the tiles row by row with 0 for the blank, as read by solve_batch.
+    """
+    n = GS[0] * GS[1]
+    return " ".join(str((tileAt(state, cell) + 1) % n) for cell in range(n))
+
+
+def run(boards, heuristics, writer):
+    """
+    Solve the boards with every heuristic and write the results.
+
+    :param boards:     A list of (depth, state) tuples, see corpus().
+    :param heuristics: A list of heuristic names, see puzzle_core.heuristicFunction.
+    :param writer:     A csv.DictWriter.
+    :return:           A dictionary {heuristic: list of the rows written}.
+    """
+    functions = {name: heuristicFunction(name, GS) for name in heuristics}
+    results = {name: [] for name in heuristics}
+    for depth, state in boards:
+        tiles = decode(state, GS)
+        for name in heuristics:
+            stats = {}
+            start = time.perf_counter()
+            path = astar(tiles, GS, stats, functions[name])
+            wallTime = time.perf_counter() - start
+            row = {
+                "depth": depth,
+                "board": boardString(state),
+                "heuristic": name,
+                "length": len(path) - 1,
+                "optimal": len(path) - 1 == depth,
+                "expanded": stats["expanded"],
+                "generated": stats["generated"],
+                "peak_open": stats["peakOpen"],
+                "duplicates": stats["duplicates"],
+                "heuristic_calls": stats["heuristicCalls"],
+                "wall_time": round(wallTime, 6),
+            }
+            writer.writerow(row)
+            results[name].append(row)
+    return results
+
+
+def parseDepths(text):
+    """
+    :param text: A string, a depth ("12") or a range of depths ("20-31").
+    :return:     A range of Int.
+    """
+    first, _, last = text.partition("-")
+    return range(int(first), int(last or first) + 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="solver-benchmark", description="Benchmark the A* solver on a fixed corpus of 3x3 boards."
+    )
+    parser.add_argument(
+        "-o", "--output", default="-", help="CSV output file (default stdout)."
+    )
+    parser.add_argument(
+        "-n", "--per-depth", type=int, default=10, help="Number of boards per optimal depth (default 10)."
+    )
+    parser.add_argument(
+        "-d", "--depths", default="1-{}".format(MAX_DEPTH), help="Depths of the boards (default 1-31)."
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the corpus (default 0).")
+    parser.add_argument(
+        "-H",
+        "--heuristic",
+        action="append",
+        choices=HEURISTICS,
+        help="Heuristic to benchmark, can be repeated (default all of them).",
+    )
+    args = parser.parse_args()
+
+    boards = corpus(args.per_depth, args.seed, parseDepths(args.depths))
+    out = sys.stdout if args.output == "-" else open(args.output, "w", newline="")
+    writer = csv.DictWriter(out, fieldnames=FIELDS)
+    writer.writeheader()
+    results = run(boards, args.heuristic or list(HEURISTICS), writer)
+    if out is not sys.stdout:
+        out.close()
+
+    for name, rows in results.items():
+        print(
+            "{:<10} boards {:>4}  expanded {:>10}  generated {:>10}  max peak open {:>8}  "
+            "time {:>8.2f}s  not optimal {}".format(
+                name,
+                len(rows),
+                sum(row["expanded"] for row in rows),
+                sum(row["generated"] for row in rows),
+                max(row["peak_open"] for row in rows),
+                sum(row["wall_time"] for row in rows),
+                sum(not row["optimal"] for row in rows),
+            ),
+            file=sys.stderr,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Pre-learning of the reinforcement learning AI across a pool of processes.
+
+The curriculum plays, for each level of difficulty from 1 to NB_LEVELS moves, a
+number of games generated that many moves away from the goal (see
+AIPlayer.initLearning). The games of every level are split in shards, one per
+worker process: each worker goes through the whole curriculum on its own copy of
+the Q-table and sends back what it changed (a Q-table delta). The deltas are then
+merged into the Q-table of the AI, an entry changed by several workers receiving
+the average of their changes.
+
+The workers report the games they win on a queue, so the caller can show the
+progression while the pool is running.
+"""
+import multiprocessing
+import os
+import queue
+
+import numpy as np
+
+from qlearning import QLearningEngine, learningRate
+from transitions import trainingStates, transitionTable
+
+# Number of levels of the curriculum, the deepest 3x3 configuration is 31 moves away from the goal.
+NB_LEVELS = 31
+
+# State of the worker processes, set by initWorker.
+_baseTable = None
+_params = None
+_progress = None
+
+
+class ShardAgent:
+    """
+    The part of AIPlayer used by the QLearningEngine, for the worker processes.
+    """
+
+    def __init__(self, qTable, epsilon, gamma, nbPlayedGames, learningSteps):
+        self.qTable = qTable
+        self.epsilon = epsilon
+        self.gamma = gamma
+        self.nbPlayedGames = nbPlayedGames
+        self.learningSteps = learningSteps
+
+    def getAlpha(self):
+        return learningRate(self.nbPlayedGames, self.learningSteps)
+
+
+def initWorker(baseTable, params, progressQueue):
+    """
+    Initialise a worker process.
+
+    :param baseTable:       The Q-table of the AI before the pre-learning.
+    :param params:          A tuple (epsilon, gamma, nbPlayedGames, learningSteps) of the AI.
+    :param progressQueue:   The queue on which the number of games won is put.
+    """
+    global _baseTable, _params, _progress
+    _baseTable = baseTable
+    _params = params
+    _progress = progressQueue
+
+
+def learnShard(task):
+    """
+    Go through the curriculum on a shard of the games, run in a worker process.
+
+    :param task:    A tuple (nbGames, nbLevels, seed): the number of games of each
+                    level played by this worker, the number of levels and the seed of
+                    its random generator (or None).
+    :return:        The delta of the Q-table, a tuple (indices, values) with the flat
+                    indices of the entries changed and the value added to each of them.
+    """
+    nbGames, nbLevels, seed = task
+    agent = ShardAgent(_baseTable.copy(), *_params)
+    engine = QLearningEngine(agent, seed=seed)
+    for level in range(nbLevels):
+        engine.initLearning(level + 1, nbGames, _progress.put)
+    delta = (agent.qTable - _baseTable).ravel()
+    indices = np.flatnonzero(delta)
+    return indices, delta[indices]
+
+
+def mergeDeltas(qTable, deltas):
+    """
+    Add the deltas of the workers to a Q-table, averaging the entries changed by several of them.
+
+    :param qTable:  The Q-table to update in place, an array of shape (9!, 4).
+    :param deltas:  A list of deltas, see learnShard.
+    """
+    total = np.zeros(qTable.size, dtype=np.float64)
+    count = np.zeros(qTable.size, dtype=np.int32)
+    for indices, values in deltas:
+        total[indices] += values
+        count[indices] += 1
+    changed = np.flatnonzero(count)
+    flat = qTable.reshape(-1)
+    flat[changed] += (total[changed] / count[changed]).astype(qTable.dtype)
+
+
+def preLearning(agent, nbGames=100, nbLevels=NB_LEVELS, processes=None, progress=None, seed=None):
+    """
+    Proceeds to the initial training of an AI, by winning nbGames games of each level
+    of the curriculum, across a pool of processes.
+
+    :param agent:       The AIPlayer to train, its Q-table is updated in place.
+    :param nbGames:     Integer corresponding to the number of games of each level.
+    :param nbLevels:    Integer corresponding to the number of levels of the curriculum.
+    :param processes:   Integer corresponding to the number of worker processes (default the number of CPUs).
+    :param progress:    An optional function called regularly, while the workers are running,
+                        with the fraction of the games won so far (a double between 0 and 1).
+    :param seed:        An optional seed, the worker i using seed + i.
+    """
+    processes = max(1, min(processes or os.cpu_count() or 1, nbGames))
+    shards = [nbGames // processes + (i < nbGames % processes) for i in range(processes)]
+    tasks = [
+        (shard, nbLevels, None if seed is None else seed + i) for i, shard in enumerate(shards)
+    ]
+    # The move table is saved once here, the workers only load it (or inherit it,
+    # with the start states, when the processes are forked).
+    transitionTable()
+    trainingStates()
+    params = (agent.epsilon, agent.gamma, agent.nbPlayedGames, agent.learningSteps)
+    progressQueue = multiprocessing.Queue()
+    total = nbGames * nbLevels
+    done = 0
+    with multiprocessing.Pool(
+        processes,
+        initializer=initWorker,
+        initargs=(np.asarray(agent.qTable), params, progressQueue),
+    ) as pool:
+        result = pool.map_async(learnShard, tasks)
+        while done < total:
+            try:
+                done += progressQueue.get(timeout=0.05)
+            except queue.Empty:
+                if result.ready() and not result.successful():
+                    # Raises the exception of the failed worker.
+                    result.get()
+            if progress is not None:
+                progress(done / total)
+        deltas = result.get()
+    mergeDeltas(agent.qTable, deltas)
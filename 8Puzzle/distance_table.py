@@ -0,0 +1,103 @@
+"""
+Exact distance to the goal of every configuration of the 3x3 puzzle.
+
+Only 181,440 configurations can be reached from the goal, so a single backward
+breadth-first search gives the optimal number of moves of all of them. The
+distances are stored in an array of 9! bytes indexed like the Q-table, by
+findRank(state) - 1 where state is the string given by convertToString(), which
+is also the rank of the packed configuration (see permutation.rank). Unreachable
+configurations hold UNREACHABLE. The array is saved as a .npy file
+and memory-mapped when loaded, so it is shared by all the processes using it.
+
+An optimal solution is then found by a greedy descent: from any configuration,
+one of the neighbours is exactly one move closer to the goal.
+"""
+import math
+import os
+from collections import deque
+from functools import lru_cache
+
+import numpy as np
+
+from permutation import rank
+from puzzle_state import cellIndex, cellPos, encode, neighbours
+
+GS = (3, 3)
+TABLE_PATH = os.path.join("PDB", "distances_3x3.npy")
+UNREACHABLE = 255
+
+
+def buildTable():
+    """
+    Compute the distance of every configuration with a breadth-first search from the goal.
+
+    :return: A numpy array of 9! uint8.
+    """
+    table = np.full(math.factorial(9), UNREACHABLE, dtype=np.uint8)
+    goal = encode([cellPos(cell, GS) for cell in range(9)], GS)
+    table[rank(goal)] = 0
+    queue = deque([(goal, 8, 0)])
+    while queue:
+        state, blank, dist = queue.popleft()
+        for nextState, cell, _ in neighbours(state, blank, GS):
+            index = rank(nextState)
+            if table[index] == UNREACHABLE:
+                table[index] = dist + 1
+                queue.append((nextState, cell, dist + 1))
+    return table
+
+
+@lru_cache(maxsize=None)
+def loadTable(path=TABLE_PATH):
+    """
+    Load the distance table, build and save it first if the file does not exist.
+    The table is loaded only once per process.
+
+    :param path: A string, the path of the .npy file.
+    :return:     A read-only memory-mapped numpy array of 9! uint8.
+    """
+    if not os.path.isfile(path):
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        np.save(path, buildTable())
+    return np.load(path, mmap_mode="r")
+
+
+def distance(tiles, table):
+    """
+    Give the optimal number of moves of a configuration.
+
+    :param tiles: A list of 9 (x, y) tuples, the position of each tile (blank last).
+    :param table: The distance table, see loadTable().
+    :return:      An Int, UNREACHABLE if the configuration is not solvable.
+    """
+    return int(table[rank(encode(tiles, GS))])
+
+
+def optimalPath(tiles, table, stats=None):
+    """
+    Find an optimal solution by always moving to a neighbour one move closer to the goal.
+
+    :param tiles: A list of 9 (x, y) tuples, the position of each tile (blank last).
+    :param table: The distance table, see loadTable().
+    :param stats: An optional dictionary, its "expanded" entry is set to the number
+                  of configurations the descent went through.
+    :return:      A list of blank-tile positions tracing the solution path (same
+                  format as solveAI), or None if the configuration is not solvable.
+    """
+    state = encode(tiles, GS)
+    blank = cellIndex(tiles[-1], GS)
+    dist = int(table[rank(state)])
+    if dist == UNREACHABLE:
+        return None
+    path = [tiles[-1]]
+    while dist > 0:
+        for nextState, cell, _ in neighbours(state, blank, GS):
+            if table[rank(nextState)] == dist - 1:
+                state, blank, dist = nextState, cell, dist - 1
+                path.append(cellPos(cell, GS))
+                break
+    if stats is not None:
+        stats["expanded"] = len(path) - 1
+    return path
@@ -0,0 +1,73 @@
+"""
+Ranking of the permutations, used to index the tables of the 3x3 puzzle
+(the Q-table of the reinforcement learning AI and the distance table).
+
+The rank of a permutation is its index in the lexicographical order, computed
+from its Lehmer code: the i-th digit is the number of values smaller than the
+i-th one that appear on its right, i.e. its value minus the number of smaller
+values already seen. Keeping the seen values in a bit mask and counting its bits
+with a lookup table makes each digit O(1), so the rank is computed in O(n).
+
+The permutations are given as packed integers (see puzzle_state), the value of
+the i-th element being stored on the 4 bits starting at bit 4 * i.
+"""
+import math
+
+from puzzle_state import BITS, MASK
+
+# Largest permutation that fits in a packed integer.
+MAX_SIZE = 1 << BITS
+FACTORIALS = [math.factorial(i) for i in range(MAX_SIZE + 1)]
+# Number of bits set in every mask of MAX_SIZE bits.
+BIT_COUNT = bytes(bin(mask).count("1") for mask in range(1 << MAX_SIZE))
+
+
+def rank(state, n=9):
+    """
+    Returns the rank (from 0) of a packed permutation of the values 0 to n - 1.
+
+    :param state:   The packed permutation, an Int.
+    :param n:       The number of elements of the permutation (default 9).
+    :return:        An integer corresponding to the rank of the permutation.
+    """
+    seen = 0
+    res = 0
+    for i in range(n):
+        value = (state >> (BITS * i)) & MASK
+        res += (value - BIT_COUNT[seen & ((1 << value) - 1)]) * FACTORIALS[n - 1 - i]
+        seen |= 1 << value
+    return res
+
+
+def unrank(index, n=9):
+    """
+    Returns the packed permutation of the values 0 to n - 1 of a given rank.
+
+    :param index:   The rank of the permutation (from 0), an Int.
+    :param n:       The number of elements of the permutation (default 9).
+    :return:        The packed permutation, an Int.
+    """
+    remaining = list(range(n))
+    state = 0
+    for i in range(n):
+        digit, index = divmod(index, FACTORIALS[n - 1 - i])
+        state |= remaining.pop(digit) << (BITS * i)
+    return state
+
+
+def findRank(string):
+    """
+    Returns the rank of the given string, considering all the
+    possible permutations of the string.
+
+    :param string:      Input string, a permutation of the characters "1", "2", ... (at most "9").
+    :return:            An integer corresponding to the rank of the input string (from 1).
+    """
+    n = len(string)
+    seen = 0
+    res = 1
+    for i in range(n):
+        value = ord(string[i]) - 49  # ord("1")
+        res += (value - BIT_COUNT[seen & ((1 << value) - 1)]) * FACTORIALS[n - 1 - i]
+        seen |= 1 << value
+    return res
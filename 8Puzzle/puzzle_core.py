@@ -0,0 +1,297 @@
+"""
+Core of the sliding puzzle, without any graphical dependency.
+
+PuzzleBoard holds the configuration of the game (SlidePuzzle adds the pygame
+interface on top of it) and solve() gives access to the solvers, so they can be
+used on headless hosts, e.g. by solve_batch.py.
+"""
+import heapq
+import random
+import time
+from collections import namedtuple
+
+from distance_table import loadTable, optimalPath
+from puzzle_state import (
+    cellIndex,
+    cellPos,
+    checkGridSize,
+    encode,
+    manhattan,
+    manhattanTable,
+    neighbours,
+    tileAt,
+)
+from sliding_solver import (
+    PatternDatabase,
+    colConflict,
+    idaStar,
+    isSolvable,
+    rowConflict,
+)
+
+# Heuristics that can guide astar(), see heuristicFunction().
+HEURISTICS = ("manhattan", "linear", "pdb")
+
+# Result of solve(): the blank positions of the solution path (None if unsolvable),
+# the number of expanded nodes and the wall-clock time in seconds.
+Solution = namedtuple("Solution", ["path", "nodesExpanded", "wallTime"])
+
+
+class PuzzleBoard:
+    def __init__(self, gs):
+        """
+        Init the board in its goal configuration.
+
+        :param gs: The grid size. It is a tuple (n,n) of Int.
+        """
+        self.gs = gs
+        self.tiles_len = gs[0] * gs[1] - 1
+        # Tiles is a list of position [(0, 0), (1, 0), (2, 0), (0, 1), (1, 1), (2, 1), (0, 2), (1, 2), (2, 2)]
+        # for gs = (3, 3).
+        self.tiles = [(x, y) for y in range(gs[1]) for x in range(gs[0])]
+        # The win condition is the same list but we do not want to change to compare it with tiles.
+        self.winCdt = [(x, y) for y in range(gs[1]) for x in range(gs[0])]
+
+    def getBlank(self):
+        """
+        Get the blank tile, the empty tile.
+
+        :return: Return the last tile, the position of the last tile. It is a tuple of Int (x, y).
+        """
+        return self.tiles[-1]
+
+    def setBlank(self, pos):
+        """
+        Set the blank tile, the empty tile.
+
+        :param pos: The position of the blank tile. It is a tuple of Int (x, y).
+        """
+        self.tiles[-1] = pos
+
+    # The blank tile, the empty tile.
+    opentile = property(getBlank, setBlank)
+
+    def isWin(self):
+        """
+        Check if the game is won.
+
+        :return: Return a Boolean, it is True if the game is won, otherwise False.
+        """
+        if self.tiles == self.winCdt:
+            return True
+        return False
+
+    def inGrid(self, tile):
+        """
+        Check if the tile is in the grid.
+
+        :param tile: The tile to check, a tuple (x, y) of int.
+        :return:     Return a Boolean, it is True if the tile is in the grid, otherwise False.
+        """
+        return (
+            tile[0] >= 0
+            and tile[0] < self.gs[0]
+            and tile[1] >= 0
+            and tile[1] < self.gs[1]
+        )
+
+    def adjacent(self):
+        """
+        Give the positions of the tiles adjacent to the blank tile.
+
+        :return: Return positions of the tiles adjacent to the blank tile, 4 tuples (x, y) of Int.
+        """
+        x, y = self.opentile
+        return (x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)
+
+    def shuffle(self):
+        """
+        Shuffle tiles and check if the board is solvable.
+        """
+        while not self.isSolvable():
+            random.shuffle(self.tiles)
+
+    def isSolvable(self):
+        """
+        Check if the game is solvable.
+
+        :return: Return a Boolean, True if the board is solvable, otherwise False.
+        """
+        tiles = []
+        for i in range(len(self.tiles)):
+            for j in range(len(self.tiles)):
+                if self.tiles[j][1] * 3 + self.tiles[j][0] + 1 == i + 1:
+                    tiles.append(j + 1)
+        count = 0
+        for i in range(len(tiles) - 1):
+            for j in range(i + 1, len(tiles)):
+                if tiles[i] > tiles[j] and tiles[i] != 9:
+                    count += 1
+        return True if (count % 2 == 0 and count != 0) else False
+
+    def convertToString(self):
+        """
+        Converts the current board into a string that can be feeded to AI.
+
+        :return: Return a String of the board.
+        """
+        state = []
+        for i in range(9):
+            state.append(0)
+        for j in range(self.tiles_len + 1):
+            state[self.tiles[j][0] + 3 * self.tiles[j][1]] = str(j + 1)
+        return "".join(state)
+
+
+def heuristicFunction(name, gs, pdb=None):
+    """
+    Give a heuristic of astar(), evaluated from scratch on every configuration.
+
+    :param name: "manhattan" (Manhattan distance), "linear" (Manhattan distance plus the
+                 linear conflicts of the rows and columns) or "pdb" (sum of the additive
+                 pattern databases).
+    :param gs:   The grid size, a tuple (width, height) of Int.
+    :param pdb:  The sliding_solver.PatternDatabase used by "pdb" (default the one of
+                 the grid size, built if needed).
+    :return:     A function giving the value of a packed configuration.
+    :raise ValueError: If the configurations of the grid cannot be packed (more than 16 cells).
+    """
+    checkGridSize(gs)
+    w, h = gs
+    cells = range(w * h)
+    if name == "manhattan":
+        return lambda state: manhattan(state, gs)
+    if name == "linear":
+
+        def linearConflict(state):
+            board = [tileAt(state, cell) for cell in cells]
+            return (
+                manhattan(state, gs)
+                + sum(rowConflict(board, y, gs) for y in range(h))
+                + sum(colConflict(board, x, gs) for x in range(w))
+            )
+
+        return linearConflict
+    if name == "pdb":
+        if pdb is None:
+            pdb = PatternDatabase.loadOrBuild(gs)
+        return lambda state: pdb.value(pdb.indices([tileAt(state, cell) for cell in cells]))
+    raise ValueError("Unknown heuristic {}".format(name))
+
+
+def astar(tiles, gs, stats=None, heuristic=None):
+    """
+    Implementation of the A* algorithm to solve the sliding puzzle.
+
+    The configurations are packed into integers (see puzzle_state), the explored
+    ones are kept in a closed set and the solution is rebuilt from parent pointers,
+    so no configuration is copied or converted to a string during the search.
+
+    :param tiles:     A list of (x, y) tuples, the position of each tile (blank last),
+                      as in SlidePuzzle.tiles. The list is not modified.
+    :param gs:        The grid size, a tuple (width, height) of Int.
+    :param stats:     An optional dictionary, filled with the counters of the search:
+                      "expanded" (nodes expanded), "generated" (successors generated),
+                      "peakOpen" (largest size of the open set), "duplicates" (configurations
+                      pushed again with a better cost) and "heuristicCalls".
+    :param heuristic: An optional function giving the heuristic of a packed configuration
+                      (see heuristicFunction). By default the Manhattan distance is used,
+                      updated incrementally for the moved tile.
+    :return:          A list of blank-tile positions tracing the solution path.
+                      e.g. [(2,2), (1,2), (1,1), ...] — each entry is where the blank
+                      moves to at each step. None if there is no solution.
+    """
+    start = encode(tiles, gs)
+    goal = encode([cellPos(cell, gs) for cell in range(gs[0] * gs[1])], gs)
+    distances = manhattanTable(gs)
+
+    h = manhattan(start, gs) if heuristic is None else heuristic(start)
+    queue = [(h, h, start, cellIndex(tiles[-1], gs))]
+    g_scores = {start: 0}
+    # parents[state] = (previous state, cell of the blank in state).
+    parents = {}
+    closed = set()
+    generated = 0
+    duplicates = 0
+    heuristicCalls = 1
+    peakOpen = 1
+
+    path = None
+    while queue:
+        _, h, state, blank = heapq.heappop(queue)
+        if state in closed:
+            continue
+        if state == goal:
+            path = []
+            while state != start:
+                state, cell = parents[state]
+                path.append(cellPos(cell, gs))
+            path.append(tiles[-1])
+            path.reverse()
+            break
+        closed.add(state)
+
+        g = g_scores[state] + 1
+        for next_state, cell, tile in neighbours(state, blank, gs):
+            generated += 1
+            if next_state in closed or g >= g_scores.get(next_state, g + 1):
+                continue
+            if next_state in g_scores:
+                duplicates += 1
+            g_scores[next_state] = g
+            parents[next_state] = (state, cell)
+            if heuristic is None:
+                # Only the moved tile changes its contribution to the heuristic.
+                next_h = h - distances[tile][cell] + distances[tile][blank]
+            else:
+                next_h = heuristic(next_state)
+            heuristicCalls += 1
+            heapq.heappush(queue, (g + next_h, next_h, next_state, cell))
+        if len(queue) > peakOpen:
+            peakOpen = len(queue)
+
+    if stats is not None:
+        stats["expanded"] = len(closed)
+        stats["generated"] = generated
+        stats["peakOpen"] = peakOpen
+        stats["duplicates"] = duplicates
+        stats["heuristicCalls"] = heuristicCalls
+    return path
+
+
+def solve(tiles, gs, method="auto", pdb=None):
+    """
+    Solve a configuration optimally.
+
+    :param tiles:  A list of (x, y) tuples, the position of each tile (blank last).
+    :param gs:     The grid size, a tuple (width, height) of Int.
+    :param method: "astar", "idastar", "table" (3x3 grid only, descent in the distance table)
+                   or "auto" (the table for 3x3 grids, A* for smaller ones and IDA* for larger ones).
+    :param pdb:    An optional sliding_solver.PatternDatabase used by IDA*.
+    :return:       A Solution.
+    :raise ValueError: If A* is asked for a grid of more than 16 cells, its configurations
+                   cannot be packed (see puzzle_state.checkGridSize).
+    """
+    gs = tuple(gs)
+    if method == "auto":
+        if gs == (3, 3):
+            method = "table"
+        else:
+            method = "astar" if gs[0] * gs[1] < 9 else "idastar"
+    if method == "astar":
+        checkGridSize(gs)
+    stats = {"expanded": 0}
+    start = time.perf_counter()
+    if not isSolvable(tiles, gs):
+        path = None
+    elif method == "table":
+        if gs != (3, 3):
+            raise ValueError("The distance table only exists for the 3x3 grid")
+        path = optimalPath(tiles, loadTable(), stats)
+    elif method == "astar":
+        path = astar(tiles, gs, stats)
+    elif method == "idastar":
+        path = idaStar(tiles, gs, pdb, stats)
+    else:
+        raise ValueError("Unknown method {}".format(method))
+    return Solution(path, stats["expanded"], time.perf_counter() - start)
@@ -0,0 +1,194 @@
+"""
+Compact integer representation of sliding puzzle configurations.
+
+A configuration is packed into a single integer using 4 bits per cell: the
+nibble starting at bit 4 * c holds the number of the tile lying on cell c,
+where cells are numbered in row-major order (c = x + y * width). Tiles are
+numbered like in SlidePuzzle.tiles, so the blank is the last tile
+(number width * height - 1). A tile number must fit in 4 bits, so grids of more
+than 16 cells (5x5 for instance) cannot be packed (see checkGridSize).
+
+Such integers are cheap to hash and to compare, which makes them suitable
+as keys of the dictionaries and sets used by the search algorithms.
+"""
+from functools import lru_cache
+
+# Number of bits used to store a tile.
+BITS = 4
+MASK = (1 << BITS) - 1
+# Largest number of cells of a packed configuration.
+MAX_CELLS = 1 << BITS
+
+
+def cellIndex(pos, gs):
+    """
+    Convert a position into a cell index.
+
+    :param pos: The position, a tuple (x, y) of Int.
+    :param gs:  The grid size, a tuple (width, height) of Int.
+    :return:    The index of the cell in row-major order.
+    """
+    return pos[0] + pos[1] * gs[0]
+
+
+def cellPos(cell, gs):
+    """
+    Convert a cell index into a position.
+
+    :param cell: The index of the cell in row-major order.
+    :param gs:   The grid size, a tuple (width, height) of Int.
+    :return:     The position, a tuple (x, y) of Int.
+    """
+    return cell % gs[0], cell // gs[0]
+
+
+def checkGridSize(gs):
+    """
+    Check that the configurations of a grid can be packed into integers.
+
+    :param gs:  The grid size, a tuple (width, height) of Int.
+    :raise ValueError: If the grid has more than MAX_CELLS cells.
+    """
+    if gs[0] * gs[1] > MAX_CELLS:
+        raise ValueError(
+            "A {}x{} grid has more than {} cells, its configurations cannot be packed".format(
+                gs[0], gs[1], MAX_CELLS
+            )
+        )
+
+
+def encode(tiles, gs):
+    """
+    Pack a configuration into an integer.
+
+    :param tiles: A list of (x, y) tuples, tiles[i] being the position of tile i
+                  (the last one being the blank), as in SlidePuzzle.tiles.
+    :param gs:    The grid size, a tuple (width, height) of Int.
+    :return:      The packed configuration, an Int.
+    :raise ValueError: If the grid is too large (see checkGridSize).
+    """
+    checkGridSize(gs)
+    state = 0
+    for tile, pos in enumerate(tiles):
+        state |= tile << (BITS * cellIndex(pos, gs))
+    return state
+
+
+def decode(state, gs):
+    """
+    Unpack an integer into a configuration.
+
+    :param state: The packed configuration, an Int.
+    :param gs:    The grid size, a tuple (width, height) of Int.
+    :return:      A list of (x, y) tuples, the position of each tile.
+    """
+    n = gs[0] * gs[1]
+    tiles = [None] * n
+    for cell in range(n):
+        tiles[(state >> (BITS * cell)) & MASK] = cellPos(cell, gs)
+    return tiles
+
+
+def tileAt(state, cell):
+    """
+    Return the number of the tile lying on a cell.
+
+    :param state: The packed configuration, an Int.
+    :param cell:  The index of the cell.
+    :return:      The number of the tile.
+    """
+    return (state >> (BITS * cell)) & MASK
+
+
+def blankCell(state, gs):
+    """
+    Find the cell of the blank tile.
+
+    :param state: The packed configuration, an Int.
+    :param gs:    The grid size, a tuple (width, height) of Int.
+    :return:      The index of the cell holding the blank.
+    """
+    blank = gs[0] * gs[1] - 1
+    for cell in range(gs[0] * gs[1]):
+        if (state >> (BITS * cell)) & MASK == blank:
+            return cell
+
+
+@lru_cache(maxsize=None)
+def adjacentCells(gs):
+    """
+    Compute, for every cell, the cells the blank can be exchanged with.
+    The neighbours are listed in the same order as SlidePuzzle.adjacent().
+
+    :param gs: The grid size, a tuple (width, height) of Int.
+    :return:   A tuple giving for each cell a tuple of neighbour cells.
+    """
+    w, h = gs
+    res = []
+    for cell in range(w * h):
+        x, y = cellPos(cell, gs)
+        res.append(
+            tuple(
+                cellIndex((nx, ny), gs)
+                for nx, ny in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1))
+                if 0 <= nx < w and 0 <= ny < h
+            )
+        )
+    return tuple(res)
+
+
+@lru_cache(maxsize=None)
+def manhattanTable(gs):
+    """
+    Precompute the Manhattan distance of every tile on every cell to its goal cell.
+    The blank is not counted, hence the heuristic built on it is admissible.
+
+    :param gs: The grid size, a tuple (width, height) of Int.
+    :return:   A tuple of tuples, table[tile][cell] being the distance.
+    """
+    n = gs[0] * gs[1]
+    table = []
+    for tile in range(n):
+        gx, gy = cellPos(tile, gs)
+        table.append(
+            tuple(
+                0
+                if tile == n - 1
+                else abs(cellPos(cell, gs)[0] - gx) + abs(cellPos(cell, gs)[1] - gy)
+                for cell in range(n)
+            )
+        )
+    return tuple(table)
+
+
+def manhattan(state, gs):
+    """
+    Compute the Manhattan distance of a packed configuration.
+
+    :param state: The packed configuration, an Int.
+    :param gs:    The grid size, a tuple (width, height) of Int.
+    :return:      The sum of the distances of all the tiles (blank excluded), an Int.
+    """
+    table = manhattanTable(gs)
+    dist = 0
+    for cell in range(gs[0] * gs[1]):
+        dist += table[(state >> (BITS * cell)) & MASK][cell]
+    return dist
+
+
+def neighbours(state, blank, gs):
+    """
+    Compute the configurations reachable in one move.
+
+    :param state: The packed configuration, an Int.
+    :param blank: The index of the cell holding the blank.
+    :param gs:    The grid size, a tuple (width, height) of Int.
+    :return:      Yield (next_state, cell, tile) tuples where cell is the new cell
+                  of the blank and tile the number of the tile that was moved.
+    """
+    blankTile = gs[0] * gs[1] - 1
+    for cell in adjacentCells(gs)[blank]:
+        tile = (state >> (BITS * cell)) & MASK
+        # Exchanging the nibbles of the two cells amounts to xoring both with tile ^ blank.
+        diff = tile ^ blankTile
+        yield state ^ (diff << (BITS * blank)) ^ (diff << (BITS * cell)), cell, tile
@@ -0,0 +1,158 @@
+"""
+Vectorised Q-learning for the 3x3 puzzle.
+
+Instead of playing one game at a time, the engine advances thousands of independent
+games (episodes) in lockstep: at each step, every episode chooses its action with the
+epsilon-greedy rule, moves with the precomputed move table (see transitions) and
+its Q-value is updated, all with a few numpy operations on the whole batch.
+When two episodes update the same entry of the Q-table during a step, only one of
+the updates is kept, which does not matter given the number of steps.
+
+The engine works on the Q-Table and the parameters of an AIPlayer (agent), it
+applies the same rules as AIPlayer.train and AIPlayer.initLearning.
+"""
+import numpy as np
+
+from transitions import GOAL, trainingStates, transitionTable
+
+# Default number of episodes played in lockstep.
+BATCH_SIZE = 4096
+
+
+def learningRate(nbPlayedGames, learningSteps):
+    """
+    The learning rate of AIPlayer.getAlpha: 0.1 divided by 10 every learningSteps games.
+
+    :param nbPlayedGames:   An integer, the number of games played by the AI.
+    :param learningSteps:   An integer, the number of games after which the learning rate is divided by 10.
+    :return:                A double, the learning rate.
+    """
+    return 1 / (10 ** ((nbPlayedGames + learningSteps) / learningSteps))
+
+
+class QLearningEngine:
+    def __init__(self, agent, batchSize=BATCH_SIZE, seed=None):
+        """
+        :param agent:       The AIPlayer whose Q-Table is trained, its qTable, epsilon, gamma
+                            and nbPlayedGames attributes and its getAlpha method are used.
+        :param batchSize:   An integer, the number of episodes played in lockstep.
+        :param seed:        An optional seed for the random generator.
+        """
+        self.agent = agent
+        self.batchSize = batchSize
+        self.rng = np.random.default_rng(seed)
+        self.nextState = transitionTable()
+        self.startStates = trainingStates()
+
+    def randomGames(self, nbGames):
+        """
+        Vectorised version of AIPlayer.generateGame.
+
+        :param nbGames: An integer, the number of games to generate.
+        :return:        An int32 array of state indices.
+        """
+        return self.rng.choice(self.startStates, nbGames)
+
+    def nStepsGames(self, nbMoves, nbGames):
+        """
+        Vectorised version of AIPlayer.generateNStepsGame: random walks of nbMoves moves
+        from the goal, that never come back to it.
+
+        :param nbMoves: An integer, the number of moves of the walks.
+        :param nbGames: An integer, the number of games to generate.
+        :return:        An int32 array of state indices.
+        """
+        states = np.full(nbGames, GOAL, dtype=np.int32)
+        remaining = np.full(nbGames, nbMoves)
+        while remaining.any():
+            nextStates = self.nextState[states, self.rng.integers(0, 4, nbGames)]
+            moved = (remaining > 0) & (nextStates != GOAL) & (nextStates != states)
+            states[moved] = nextStates[moved]
+            remaining[moved] -= 1
+        return states
+
+    def step(self, states):
+        """
+        Plays one move in every episode and updates the Q-Table.
+
+        :param states:  An int32 array of the current state index of every episode.
+        :return:        An int32 array of the next state index of every episode.
+        """
+        agent = self.agent
+        qTable = agent.qTable
+        qValues = qTable[states]
+        # Greedy action, chosen randomly among the actions of maximum value.
+        best = qValues == qValues.max(axis=1, keepdims=True)
+        greedy = np.argmax(best * self.rng.random(qValues.shape), axis=1)
+        explore = self.rng.random(len(states)) < agent.epsilon
+        actions = np.where(explore, self.rng.integers(0, 4, len(states)), greedy)
+
+        nextStates = self.nextState[states, actions]
+        reward = (nextStates == GOAL).astype(np.float32)
+        target = reward + agent.gamma * qTable[nextStates].max(axis=1)
+        qTable[states, actions] += agent.getAlpha() * (target - qTable[states, actions])
+        return nextStates
+
+    def train(self, nbGames, progress=None):
+        """
+        Trains the AI on exactly nbGames random games, every move (illegal ones included)
+        being counted, like AIPlayer.train. At most batchSize games are played at once, a
+        new game replacing a solved one until nbGames games are started. The engine is only
+        fast on large batches: the games should be asked for in one call rather than a few
+        at a time, with progress to follow them.
+
+        :param nbGames:     An integer corresponding to the number of games to train the AI on.
+        :param progress:    An optional function, called with the number of games solved and
+                            their total number of moves each time some games are solved.
+        :return:            Integer corresponding to total number of moves of those games.
+        """
+        started = min(nbGames, self.batchSize)
+        states = self.randomGames(started)
+        moves = np.zeros(started, dtype=np.int64)
+        nbMoves = 0
+        while len(states):
+            states = self.step(states)
+            moves += 1
+            done = states == GOAL
+            if done.any():
+                nbDone = int(done.sum())
+                doneMoves = int(moves[done].sum())
+                nbMoves += doneMoves
+                self.agent.nbPlayedGames += nbDone
+                if progress is not None:
+                    progress(nbDone, doneMoves)
+                nbNew = min(nbDone, nbGames - started)
+                started += nbNew
+                states = np.concatenate([states[~done], self.randomGames(nbNew)])
+                moves = np.concatenate([moves[~done], np.zeros(nbNew, dtype=np.int64)])
+        return nbMoves
+
+    def initLearning(self, typeGame, nbGames, progress=None):
+        """
+        Vectorised version of AIPlayer.initLearning: plays games generated
+        typeGame moves away from the goal, a game being lost after typeGame * 100
+        moves, until nbGames of them are won.
+
+        :param typeGame:    Integer indicating the number of moves used to generate the games.
+        :param nbGames:     Integer corresponding to the number of games to win.
+        :param progress:    An optional function, called with the number of games won
+                            (at most nbGames in total) each time some games are won.
+        """
+        size = min(nbGames, self.batchSize)
+        states = self.nStepsGames(typeGame, size)
+        moves = np.zeros(size, dtype=np.int64)
+        gamesWon = 0
+        while gamesWon < nbGames:
+            nextStates = self.step(states)
+            # Only the moves that changed the state are counted.
+            moves += nextStates != states
+            states = nextStates
+            won = states == GOAL
+            nbWon = min(int(won.sum()), nbGames - gamesWon)
+            gamesWon += nbWon
+            if progress is not None and nbWon:
+                progress(nbWon)
+            over = won | (moves >= typeGame * 100)
+            if over.any():
+                states[over] = self.nStepsGames(typeGame, int(over.sum()))
+                moves[over] = 0
@@ -0,0 +1,175 @@
+"""
+Binary storage of the Q-table of the reinforcement learning AI.
+
+The Q-table is a float32 numpy array of shape (9!, 4): one row per state, in the
+order given by findRank(state) - 1, and one column per direction (up, right, down,
+left). A file is made of a fixed-size header followed by the raw array:
+
+    magic "QTBL" | version (uint32) | number of states (uint64) | number of actions (uint64)
+    | nbPlayedGames (int64) | epsilon (float64) | gamma (float64) | learningSteps (int64)
+    | padding up to HEADER_SIZE bytes | Q-values (float32, row-major)
+
+The array is memory-mapped when loaded (copy-on-write, the file only changes when
+the table is saved), so loading a model is immediate. A table that is going to be saved
+to the file it was mapped from must first be copied in memory (see inMemory): Windows
+cannot replace the file of an open map.
+
+Q-tables saved in the former text format can be converted with:
+    python qtable.py QTable/QTable_0.txt
+"""
+import math
+import os
+import struct
+import sys
+
+import numpy as np
+
+QTABLE_MAGIC = b"QTBL"
+QTABLE_VERSION = 1
+QTABLE_EXT = ".qtb"
+HEADER_FORMAT = "<4sIQQqddq"
+# The array starts on a 64-byte boundary.
+HEADER_SIZE = 64
+NB_STATES = math.factorial(9)
+NB_ACTIONS = 4
+
+
+def newQTable():
+    """
+    :return: A Q-table full of zeros, a numpy array of shape (9!, 4).
+    """
+    return np.zeros((NB_STATES, NB_ACTIONS), dtype=np.float32)
+
+
+def inMemory(qTable):
+    """
+    :param qTable:  A Q-table, memory-mapped or not.
+    :return:        The Q-table as an array in memory: a memory-mapped table is copied, its
+                    file is released once the map is not referenced anymore.
+    """
+    if isinstance(qTable, np.memmap):
+        return np.array(qTable)
+    return qTable
+
+
+def saveQTable(path, qTable, nbPlayedGames, epsilon, gamma, learningSteps):
+    """
+    Saves a Q-table and the parameters of the AI in a binary file.
+    The file is written next to the destination then renamed, so a model is never
+    left half written. The destination must not be memory-mapped anymore: the rename
+    fails on Windows while a map of the file is open (see inMemory), so saving the
+    memory-mapped table of the destination itself is refused on every platform.
+
+    :param path:            A string, the path of the file.
+    :param qTable:          The Q-table, an array of shape (9!, 4).
+    :param nbPlayedGames:   An integer, the number of games played by the AI.
+    :param epsilon:         A double, the probability of exploring a non-optimal move.
+    :param gamma:           A double, the discount factor of the Bellman equation.
+    :param learningSteps:   An integer, the number of games after which the learning rate is divided by 10.
+    """
+    if (
+        isinstance(qTable, np.memmap)
+        and qTable.filename is not None
+        and os.path.exists(path)
+        and os.path.samefile(qTable.filename, path)
+    ):
+        raise ValueError("{} is memory-mapped, copy the Q-table in memory first".format(path))
+    header = struct.pack(
+        HEADER_FORMAT,
+        QTABLE_MAGIC,
+        QTABLE_VERSION,
+        qTable.shape[0],
+        qTable.shape[1],
+        nbPlayedGames,
+        epsilon,
+        gamma,
+        learningSteps,
+    )
+    tmpPath = path + ".tmp"
+    with open(tmpPath, "wb") as f:
+        f.write(header.ljust(HEADER_SIZE, b"\0"))
+        f.write(np.ascontiguousarray(qTable, dtype=np.float32).tobytes())
+    os.replace(tmpPath, path)
+
+
+def loadQTable(path):
+    """
+    Loads a Q-table saved by saveQTable.
+
+    :param path:    A string, the path of the file.
+    :return:        A tuple (qTable, params) with qTable a copy-on-write memory-mapped
+                    array of shape (9!, 4) and params a dictionary with the entries
+                    nbPlayedGames, epsilon, gamma and learningSteps.
+    """
+    with open(path, "rb") as f:
+        header = f.read(HEADER_SIZE)
+    if len(header) < HEADER_SIZE or header[:4] != QTABLE_MAGIC:
+        raise ValueError("{} is not a binary Q-table".format(path))
+    (
+        _,
+        version,
+        nbStates,
+        nbActions,
+        nbPlayedGames,
+        epsilon,
+        gamma,
+        learningSteps,
+    ) = struct.unpack_from(HEADER_FORMAT, header)
+    if version != QTABLE_VERSION:
+        raise ValueError("Unsupported Q-table version {}".format(version))
+    qTable = np.memmap(
+        path, dtype=np.float32, mode="c", offset=HEADER_SIZE, shape=(nbStates, nbActions)
+    )
+    params = {
+        "nbPlayedGames": nbPlayedGames,
+        "epsilon": epsilon,
+        "gamma": gamma,
+        "learningSteps": learningSteps,
+    }
+    return qTable, params
+
+
+def readTextQTable(path):
+    """
+    Reads a Q-table saved in the former text format: the parameters of the AI on
+    one line each, followed by one line of 4 Q-values per state.
+
+    :param path:    A string, the path of the text file.
+    :return:        A tuple (qTable, params), see loadQTable.
+    """
+    with open(path, "r") as f:
+        params = {
+            "nbPlayedGames": int(f.readline().strip()),
+            "epsilon": float(f.readline().strip()),
+            "gamma": float(f.readline().strip()),
+            "learningSteps": int(f.readline().strip()),
+        }
+        values = np.array(f.read().split(), dtype=np.float32)
+    return values.reshape(NB_STATES, NB_ACTIONS), params
+
+
+def convertTextQTable(textPath, path=None):
+    """
+    Converts a Q-table from the former text format to the binary format.
+
+    :param textPath:    A string, the path of the text file.
+    :param path:        A string, the path of the binary file (default: same name, with the .qtb extension).
+    :return:            The path of the binary file.
+    """
+    if path is None:
+        path = os.path.splitext(textPath)[0] + QTABLE_EXT
+    qTable, params = readTextQTable(textPath)
+    saveQTable(path, qTable, **params)
+    return path
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("usage: qtable.py QTABLE.txt [QTABLE.txt ...]")
+        sys.exit(1)
+    for textPath in sys.argv[1:]:
+        print(textPath, "->", convertTextQTable(textPath))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,484 @@
+"""
+Optimal solver for sliding puzzles of any size (8-puzzle, 15-puzzle, ...).
+
+The search is an IDA* (iterative deepening A*): it only stores the current path,
+so its memory usage does not grow with the number of explored configurations,
+unlike A* which runs out of memory on most 15-puzzle instances.
+
+It is guided by the maximum of two admissible heuristics:
+    - the Manhattan distance plus the linear conflicts of every row and column,
+    - the sum of additive disjoint pattern databases (PDB). A PDB stores, for
+      every placement of a group of tiles, the number of moves of those tiles
+      needed to bring them home. The groups being disjoint, the values can be summed.
+
+Both heuristics are updated incrementally, only for the tile that moved.
+The pattern databases are built once by a breadth-first search from the goal and
+saved to disk, building the default 15-puzzle databases takes a few minutes.
+
+Usage:
+    python sliding_solver.py --size 4x4          # build (or load) and solve a random board
+"""
+import argparse
+import os
+import random
+import struct
+import sys
+import time
+from collections import deque
+
+from puzzle_state import adjacentCells, cellIndex, cellPos, manhattanTable
+
+# Folder where the pattern databases are saved.
+PDB_FOLDER = "PDB"
+PDB_MAGIC = b"SPDB"
+PDB_VERSION = 1
+
+# Largest number of bits (pattern tiles and blank) of a BFS state while building a PDB.
+MAX_PDB_BITS = 25
+# Value of a PDB entry that was not reached by the BFS.
+UNKNOWN = 255
+
+
+def positionBits(gs):
+    """
+    Number of bits needed to store a cell index.
+
+    :param gs: The grid size, a tuple (width, height) of Int.
+    :return:   An Int.
+    """
+    return max(1, (gs[0] * gs[1] - 1).bit_length())
+
+
+def pdbPath(gs):
+    """
+    Default path of the pattern databases of a grid size.
+
+    :param gs: The grid size, a tuple (width, height) of Int.
+    :return:   A string.
+    """
+    return os.path.join(PDB_FOLDER, "pdb_{}x{}.bin".format(*gs))
+
+
+def defaultPatterns(gs):
+    """
+    Give a partition of the tiles in disjoint groups, used to build the PDBs.
+
+    :param gs: The grid size, a tuple (width, height) of Int.
+    :return:   A list of lists of tile numbers.
+    """
+    n = gs[0] * gs[1] - 1
+    if gs == (4, 4):
+        # The usual 5-5-5 partition of the 15-puzzle.
+        return [[0, 1, 2, 4, 5], [3, 6, 7, 10, 11], [8, 9, 12, 13, 14]]
+    # Otherwise, consecutive tiles in row-major order, as many as the BFS can afford.
+    size = max(1, min(5, MAX_PDB_BITS // positionBits(gs) - 1))
+    return [list(range(i, min(i + size, n))) for i in range(0, n, size)]
+
+
+def isSolvable(tiles, gs):
+    """
+    Check if a configuration can be solved.
+    The parity of the permutation of the cells must be equal to the parity
+    of the distance between the blank and its goal cell.
+
+    :param tiles: A list of (x, y) tuples, the position of each tile (blank last).
+    :param gs:    The grid size, a tuple (width, height) of Int.
+    :return:      A Boolean, True if the configuration is solvable.
+    """
+    board = [0] * len(tiles)
+    for tile, pos in enumerate(tiles):
+        board[cellIndex(pos, gs)] = tile
+    parity = 0
+    seen = [False] * len(board)
+    for start in range(len(board)):
+        # Each cycle of length l of the permutation is made of l - 1 transpositions.
+        length = 0
+        cell = start
+        while not seen[cell]:
+            seen[cell] = True
+            cell = board[cell]
+            length += 1
+        if length:
+            parity += length - 1
+    bx, by = tiles[-1]
+    return parity % 2 == (gs[0] - 1 - bx + gs[1] - 1 - by) % 2
+
+
+def randomTiles(gs, rng=random):
+    """
+    Generate a random solvable configuration.
+
+    :param gs:  The grid size, a tuple (width, height) of Int.
+    :param rng: The random generator to use (default the random module).
+    :return:    A list of (x, y) tuples, the position of each tile (blank last).
+    """
+    tiles = [cellPos(cell, gs) for cell in range(gs[0] * gs[1])]
+    rng.shuffle(tiles)
+    if not isSolvable(tiles, gs):
+        # Exchanging two tiles (not the blank) changes the parity.
+        tiles[0], tiles[1] = tiles[1], tiles[0]
+    return tiles
+
+
+def lineConflict(goals):
+    """
+    Linear conflict of a line: the tiles of the line that have their goal in it must
+    leave it when they are not in the right order. At least (number of tiles - longest
+    increasing subsequence of their goals) tiles leave, costing 2 extra moves each.
+
+    :param goals: The goal coordinates, along the line, of the tiles having their goal in it,
+                  listed in the order they currently appear.
+    :return:      The number of extra moves, an Int.
+    """
+    if len(goals) < 2:
+        return 0
+    longest = []
+    for i in range(len(goals)):
+        best = 1
+        for j in range(i):
+            if goals[j] < goals[i] and longest[j] + 1 > best:
+                best = longest[j] + 1
+        longest.append(best)
+    return 2 * (len(goals) - max(longest))
+
+
+def rowConflict(board, y, gs):
+    """
+    Linear conflict of a row of the board.
+
+    :param board: A list giving the tile lying on each cell.
+    :param y:     The index of the row.
+    :param gs:    The grid size, a tuple (width, height) of Int.
+    :return:      The number of extra moves, an Int.
+    """
+    w = gs[0]
+    blank = w * gs[1] - 1
+    goals = []
+    for x in range(w):
+        tile = board[x + y * w]
+        if tile != blank and tile // w == y:
+            goals.append(tile % w)
+    return lineConflict(goals)
+
+
+def colConflict(board, x, gs):
+    """
+    Linear conflict of a column of the board.
+
+    :param board: A list giving the tile lying on each cell.
+    :param x:     The index of the column.
+    :param gs:    The grid size, a tuple (width, height) of Int.
+    :return:      The number of extra moves, an Int.
+    """
+    w = gs[0]
+    blank = w * gs[1] - 1
+    goals = []
+    for y in range(gs[1]):
+        tile = board[x + y * w]
+        if tile != blank and tile % w == x:
+            goals.append(tile // w)
+    return lineConflict(goals)
+
+
+class PatternDatabase:
+    """
+    Additive disjoint pattern databases of a grid size.
+    The entry of a group is indexed by the cells of its tiles, packed on
+    positionBits(gs) bits each, so that the index can be updated with a xor
+    when one tile moves.
+    """
+
+    def __init__(self, gs, patterns, tables):
+        """
+        :param gs:       The grid size, a tuple (width, height) of Int.
+        :param patterns: A list of lists of tile numbers, the disjoint groups.
+        :param tables:   A list of bytearrays, one per group.
+        """
+        self.gs = tuple(gs)
+        self.patterns = [list(p) for p in patterns]
+        self.tables = tables
+        self.bits = positionBits(gs)
+        # For each tile, the index of its group and the shift of its cell in the index.
+        self.groupOf = {}
+        for g, pattern in enumerate(self.patterns):
+            for slot, tile in enumerate(pattern):
+                self.groupOf[tile] = (g, self.bits * slot)
+
+    @classmethod
+    def build(cls, gs, patterns=None):
+        """
+        Build the databases with a 0-1 breadth-first search from the goal.
+        Moving a tile of the group costs 1, moving another tile costs 0.
+
+        :param gs:       The grid size, a tuple (width, height) of Int.
+        :param patterns: The disjoint groups (default defaultPatterns(gs)).
+        :return:         A PatternDatabase.
+        """
+        if patterns is None:
+            patterns = defaultPatterns(gs)
+        return cls(gs, patterns, [cls._buildTable(gs, p) for p in patterns])
+
+    @staticmethod
+    def _buildTable(gs, pattern):
+        """
+        Build the table of one group of tiles.
+
+        :param gs:      The grid size, a tuple (width, height) of Int.
+        :param pattern: The list of the tile numbers of the group.
+        :return:        A bytearray.
+        """
+        bits = positionBits(gs)
+        k = len(pattern)
+        if bits * (k + 1) > MAX_PDB_BITS:
+            raise ValueError("Pattern of {} tiles too large for a {}x{} grid".format(k, *gs))
+        mask = (1 << bits) - 1
+        patternMask = (1 << (bits * k)) - 1
+        blankShift = bits * k
+        adjacency = adjacentCells(gs)
+
+        table = bytearray([UNKNOWN]) * (1 << (bits * k))
+        dist = bytearray([UNKNOWN]) * (1 << (bits * (k + 1)))
+        start = 0
+        for slot, tile in enumerate(pattern):
+            start |= tile << (bits * slot)
+        start |= (gs[0] * gs[1] - 1) << blankShift
+        dist[start] = 0
+        queue = deque([start])
+        while queue:
+            key = queue.popleft()
+            d = dist[key]
+            if table[key & patternMask] == UNKNOWN:
+                table[key & patternMask] = d
+            blank = key >> blankShift
+            occupied = {(key >> (bits * slot)) & mask: slot for slot in range(k)}
+            for cell in adjacency[blank]:
+                slot = occupied.get(cell)
+                if slot is None:
+                    nextKey = (key & patternMask) | (cell << blankShift)
+                    if dist[nextKey] > d:
+                        dist[nextKey] = d
+                        queue.appendleft(nextKey)
+                else:
+                    shift = bits * slot
+                    nextKey = ((key & patternMask) ^ ((cell ^ blank) << shift)) | (cell << blankShift)
+                    if dist[nextKey] > d + 1:
+                        dist[nextKey] = d + 1
+                        queue.append(nextKey)
+        return table
+
+    def indices(self, board):
+        """
+        Compute the index of every group for a board.
+
+        :param board: A list giving the tile lying on each cell.
+        :return:      A list of Int, one per group.
+        """
+        idx = [0] * len(self.patterns)
+        for cell, tile in enumerate(board):
+            if tile in self.groupOf:
+                g, shift = self.groupOf[tile]
+                idx[g] |= cell << shift
+        return idx
+
+    def value(self, idx):
+        """
+        :param idx: The indices of the groups, see indices().
+        :return:    The heuristic value, the sum of the entries of the groups.
+        """
+        return sum(table[i] for table, i in zip(self.tables, idx))
+
+    def save(self, path):
+        """
+        Save the databases in a binary file.
+
+        :param path: A string, the path of the file.
+        """
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        with open(path, "wb") as f:
+            f.write(PDB_MAGIC)
+            f.write(struct.pack("<BBBB", PDB_VERSION, self.gs[0], self.gs[1], len(self.patterns)))
+            for pattern in self.patterns:
+                f.write(struct.pack("<B", len(pattern)))
+                f.write(bytes(pattern))
+            for table in self.tables:
+                f.write(table)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load databases saved by save().
+
+        :param path: A string, the path of the file.
+        :return:     A PatternDatabase.
+        """
+        with open(path, "rb") as f:
+            if f.read(4) != PDB_MAGIC:
+                raise ValueError("{} is not a pattern database file".format(path))
+            version, w, h, nbPatterns = struct.unpack("<BBBB", f.read(4))
+            if version != PDB_VERSION:
+                raise ValueError("Unsupported pattern database version {}".format(version))
+            patterns = []
+            for _ in range(nbPatterns):
+                (k,) = struct.unpack("<B", f.read(1))
+                patterns.append(list(f.read(k)))
+            bits = positionBits((w, h))
+            tables = [bytearray(f.read(1 << (bits * len(p)))) for p in patterns]
+        return cls((w, h), patterns, tables)
+
+    @classmethod
+    def loadOrBuild(cls, gs, path=None, patterns=None):
+        """
+        Load the databases of a grid size, build and save them if they do not exist yet.
+
+        :param gs:       The grid size, a tuple (width, height) of Int.
+        :param path:     The path of the file (default PDB/pdb_<w>x<h>.bin).
+        :param patterns: The disjoint groups used when building (default defaultPatterns(gs)).
+        :return:         A PatternDatabase.
+        """
+        if path is None:
+            path = pdbPath(gs)
+        if os.path.isfile(path):
+            return cls.load(path)
+        pdb = cls.build(gs, patterns)
+        pdb.save(path)
+        return pdb
+
+
+def idaStar(tiles, gs, pdb=None, stats=None):
+    """
+    Solve a sliding puzzle optimally with IDA*.
+
+    :param tiles: A list of (x, y) tuples, the position of each tile (blank last),
+                  as in SlidePuzzle.tiles.
+    :param gs:    The grid size, a tuple (width, height) of Int.
+    :param pdb:   An optional PatternDatabase of the same grid size.
+    :param stats: An optional dictionary, its "expanded" entry is set to the number
+                  of expanded nodes (summed over all the iterations).
+    :return:      A list of blank-tile positions tracing the solution path, starting with
+                  the current position of the blank (same format as solveAI), or None if
+                  the configuration is not solvable.
+    """
+    gs = tuple(gs)
+    if pdb is not None and pdb.gs != gs:
+        raise ValueError("The pattern database does not match the grid size")
+    if not isSolvable(tiles, gs):
+        return None
+
+    w, h = gs
+    board = [0] * (w * h)
+    for tile, pos in enumerate(tiles):
+        board[cellIndex(pos, gs)] = tile
+    blank = cellIndex(tiles[-1], gs)
+    adjacency = adjacentCells(gs)
+    dist = manhattanTable(gs)
+
+    md = sum(dist[tile][cell] for cell, tile in enumerate(board))
+    rows = [rowConflict(board, y, gs) for y in range(h)]
+    cols = [colConflict(board, x, gs) for x in range(w)]
+    lc = sum(rows) + sum(cols)
+    if pdb is not None:
+        idx, tables, groupOf = pdb.indices(board), pdb.tables, pdb.groupOf
+        pdbValue = pdb.value(idx)
+    else:
+        idx, tables, groupOf = [], [], {}
+        pdbValue = 0
+
+    path = [blank]
+    # Smallest f value that exceeded the bound during the last iteration.
+    nextBound = [0]
+    expanded = [0]
+
+    def search(blank, previous, g, bound, md, lc, pdbValue):
+        f = g + max(md + lc, pdbValue)
+        if f > bound:
+            if f < nextBound[0]:
+                nextBound[0] = f
+            return False
+        if md == 0:
+            return True
+        expanded[0] += 1
+        for cell in adjacency[blank]:
+            if cell == previous:
+                continue
+            tile = board[cell]
+            board[blank], board[cell] = tile, board[blank]
+            nextMd = md - dist[tile][cell] + dist[tile][blank]
+
+            # Only the lines crossed by the tile can change their conflicts.
+            if cell - blank in (1, -1):
+                x1, x2 = cell % w, blank % w
+                old = cols[x1], cols[x2]
+                cols[x1] = colConflict(board, x1, gs)
+                cols[x2] = colConflict(board, x2, gs)
+                nextLc = lc - old[0] - old[1] + cols[x1] + cols[x2]
+            else:
+                y1, y2 = cell // w, blank // w
+                old = rows[y1], rows[y2]
+                rows[y1] = rowConflict(board, y1, gs)
+                rows[y2] = rowConflict(board, y2, gs)
+                nextLc = lc - old[0] - old[1] + rows[y1] + rows[y2]
+
+            nextPdb = pdbValue
+            group = groupOf.get(tile)
+            if group is not None:
+                grp, shift = group
+                before = idx[grp]
+                idx[grp] ^= (cell ^ blank) << shift
+                nextPdb += tables[grp][idx[grp]] - tables[grp][before]
+
+            path.append(cell)
+            if search(cell, blank, g + 1, bound, nextMd, nextLc, nextPdb):
+                return True
+            path.pop()
+
+            if group is not None:
+                idx[grp] = before
+            if cell - blank in (1, -1):
+                cols[x1], cols[x2] = old
+            else:
+                rows[y1], rows[y2] = old
+            board[blank], board[cell] = board[cell], tile
+        return False
+
+    bound = max(md + lc, pdbValue)
+    while True:
+        nextBound[0] = float("inf")
+        found = search(blank, None, 0, bound, md, lc, pdbValue)
+        if stats is not None:
+            stats["expanded"] = expanded[0]
+        if found:
+            return [cellPos(cell, gs) for cell in path]
+        bound = nextBound[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Optimal sliding puzzle solver (IDA*).")
+    parser.add_argument(
+        "-s", "--size", default="4x4", help="Size of the grid, WIDTHxHEIGHT (default 4x4)."
+    )
+    parser.add_argument(
+        "--no-pdb", action="store_true", help="Do not use the pattern databases."
+    )
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the random board.")
+    args = parser.parse_args()
+    gs = tuple(int(v) for v in args.size.lower().split("x"))
+
+    pdb = None
+    if not args.no_pdb:
+        start = time.time()
+        pdb = PatternDatabase.loadOrBuild(gs)
+        print("Pattern databases ready in", round(time.time() - start, 2), "s")
+
+    tiles = randomTiles(gs, random.Random(args.seed))
+    start = time.time()
+    path = idaStar(tiles, gs, pdb)
+    if path is None:
+        print("Error, the board is not solvable.")
+        sys.exit(1)
+    print("Solved in", len(path) - 1, "moves, exec time", round(time.time() - start, 2), "s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+solve-batch: solve a file of sliding puzzle boards without any graphical interface.
+
+Each line of the input file holds one board, its tiles listed row by row and
+separated by spaces or commas, 0 being the blank. Empty lines and lines starting
+with # are ignored. For instance the following line is a 3x3 board one move away
+from the goal:
+
+    1 2 3 4 5 6 7 0 8
+
+The boards are solved across a pool of processes and one JSON object per board
+is written (in the input order) with the solution path (the successive positions
+of the blank), its length, the number of expanded nodes and the wall time.
+
+Usage:
+    python solve_batch.py boards.txt -o solutions.jsonl
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import sys
+
+from distance_table import loadTable
+from puzzle_core import solve
+from puzzle_state import cellPos
+from sliding_solver import PatternDatabase, pdbPath
+
+# Pattern databases of the worker processes, loaded by initWorker.
+_pdb = None
+
+
+def parseBoard(line, gs=None):
+    """
+    Convert a line of the input file into a configuration.
+
+    :param line: A string, the tiles row by row (0 is the blank).
+    :param gs:   The grid size, a tuple (width, height) of Int. If None, the board is
+                 supposed to be square.
+    :return:     A tuple (board, gs, tiles) with board the list of the numbers read,
+                 gs the grid size and tiles the position of each tile (blank last),
+                 as in SlidePuzzle.tiles.
+    """
+    board = [int(v) for v in line.replace(",", " ").split()]
+    n = len(board)
+    if gs is None:
+        side = int(round(math.sqrt(n)))
+        gs = (side, side)
+    if gs[0] * gs[1] != n or sorted(board) != list(range(n)):
+        raise ValueError("Invalid board: {}".format(line.strip()))
+    tiles = [None] * n
+    for cell, number in enumerate(board):
+        # Tile k (k >= 1) is the (k-1)-th tile, the blank is the last one.
+        tiles[number - 1 if number else n - 1] = cellPos(cell, gs)
+    return board, gs, tiles
+
+
+def initWorker(pdbs):
+    """
+    Initialise a worker process.
+
+    :param pdbs: A dictionary {grid size: path of the pattern databases}.
+    """
+    global _pdb
+    _pdb = {gs: PatternDatabase.load(path) for gs, path in pdbs.items()}
+
+
+def solveBoard(task):
+    """
+    Solve one board, run in a worker process.
+
+    :param task: A tuple (board, gs, tiles, method) see parseBoard.
+    :return:     A dictionary, the JSON record of the board.
+    """
+    board, gs, tiles, method = task
+    solution = solve(tiles, gs, method, _pdb.get(gs))
+    path = solution.path
+    return {
+        "board": board,
+        "path": [list(pos) for pos in path] if path is not None else None,
+        "length": len(path) - 1 if path is not None else None,
+        "nodes_expanded": solution.nodesExpanded,
+        "wall_time": round(solution.wallTime, 6),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="solve-batch", description="Solve a file of sliding puzzle boards."
+    )
+    parser.add_argument("input", help="File of boards, one per line (0 is the blank).")
+    parser.add_argument(
+        "-o", "--output", default="-", help="JSONL output file (default stdout)."
+    )
+    parser.add_argument(
+        "-s", "--size", default=None, help="Size of the grid, WIDTHxHEIGHT (default square)."
+    )
+    parser.add_argument(
+        "-m",
+        "--method",
+        choices=("auto", "astar", "idastar", "table"),
+        default="auto",
+        help="Search algorithm (default the distance table for 3x3 boards, A* below and "
+        "IDA* with pattern databases above).",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of worker processes (default the number of CPUs).",
+    )
+    args = parser.parse_args()
+    gs = tuple(int(v) for v in args.size.lower().split("x")) if args.size else None
+
+    tasks = []
+    with open(args.input) as f:
+        for line in f:
+            if line.strip() and not line.lstrip().startswith("#"):
+                board, size, tiles = parseBoard(line, gs)
+                tasks.append((board, size, tiles, args.method))
+
+    # The tables are built once here, the workers only load them.
+    pdbs = {}
+    for _, size, _, method in tasks:
+        if method == "table" or (method == "auto" and size == (3, 3)):
+            loadTable()
+        elif size not in pdbs and (
+            method == "idastar" or (method == "auto" and size[0] * size[1] > 9)
+        ):
+            PatternDatabase.loadOrBuild(size)
+            pdbs[size] = pdbPath(size)
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w")
+    with multiprocessing.Pool(args.jobs, initializer=initWorker, initargs=(pdbs,)) as pool:
+        for record in pool.imap(solveBoard, tasks):
+            out.write(json.dumps(record) + "\n")
+    if out is not sys.stdout:
+        out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Move table of the 3x3 puzzle for the reinforcement learning AI.
+
+The states are the permutations of "123456789" (9 being the blank) indexed by
+findRank(state) - 1, i.e. in lexicographical order, and the actions are the
+directions of AIPlayer (0 = up, 1 = right, 2 = down, 3 = left) in which the blank
+is moved. nextState[index, action] is the index of the state reached, which is the
+state itself when the move is illegal. The table is saved as a .npy file the first
+time it is needed and memory-mapped afterwards, like the distance table.
+"""
+import itertools
+import math
+import os
+from functools import lru_cache
+
+import numpy as np
+
+NB_STATES = math.factorial(9)
+TRANSITIONS_PATH = os.path.join("PDB", "transitions_3x3.npy")
+# Index of the goal state "123456789".
+GOAL = 0
+# Offset of the blank on the board and condition for the move to be legal, for each action.
+MOVES = (
+    (-3, lambda blank: blank >= 3),
+    (1, lambda blank: blank % 3 != 2),
+    (3, lambda blank: blank <= 5),
+    (-1, lambda blank: blank % 3 != 0),
+)
+
+
+def allStates():
+    """
+    :return: A uint8 array of shape (9!, 9), the i-th row being the state of index i
+             (tiles numbered from 0, 8 being the blank).
+    """
+    # itertools.permutations enumerates them in lexicographical order.
+    return np.array(list(itertools.permutations(range(9))), dtype=np.uint8)
+
+
+def rankStates(states):
+    """
+    Vectorised version of findRank.
+
+    :param states: A uint8 array of shape (n, 9) of states.
+    :return:       An int32 array of shape (n,), the index of each state.
+    """
+    index = np.zeros(len(states), dtype=np.int64)
+    for i in range(8):
+        smaller = (states[:, i + 1 :] < states[:, i : i + 1]).sum(axis=1)
+        index += smaller * math.factorial(8 - i)
+    return index.astype(np.int32)
+
+
+def buildTransitions():
+    """
+    Compute the move table.
+
+    :return: An int32 array of shape (9!, 4).
+    """
+    states = allStates()
+    blanks = np.argmax(states == 8, axis=1)
+    rows = np.arange(NB_STATES)
+    table = np.empty((NB_STATES, 4), dtype=np.int32)
+    for action, (offset, isLegal) in enumerate(MOVES):
+        legal = isLegal(blanks)
+        moved = states[legal].copy()
+        blank = blanks[legal]
+        target = blank + offset
+        sub = np.arange(len(moved))
+        moved[sub, blank] = moved[sub, target]
+        moved[sub, target] = 8
+        table[:, action] = rows
+        table[legal, action] = rankStates(moved)
+    return table
+
+
+def inversions(states):
+    """
+    Count the inversions of states, the solvability criterion of the 3x3 puzzle.
+
+    :param states: A uint8 array of shape (n, 9) of states.
+    :return:       An array of shape (n,), the number of pairs of tiles (blank excluded) in
+                   the wrong order.
+    """
+    count = np.zeros(len(states), dtype=np.int64)
+    for i in range(8):
+        count += ((states[:, i + 1 :] < states[:, i : i + 1]) & (states[:, i : i + 1] != 8)).sum(axis=1)
+    return count
+
+
+@lru_cache(maxsize=None)
+def transitionTable(path=TRANSITIONS_PATH):
+    """
+    Load the move table, build and save it first if the file does not exist.
+    The table is loaded only once per process.
+
+    :param path: A string, the path of the .npy file.
+    :return:     A read-only memory-mapped int32 array of shape (9!, 4).
+    """
+    if not os.path.isfile(path):
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        np.save(path, buildTransitions())
+    return np.load(path, mmap_mode="r")
+
+
+@lru_cache(maxsize=None)
+def trainingStates():
+    """
+    The states generateGame can return: the solvable ones that are not already sorted.
+
+    :return: An int32 array of state indices.
+    """
+    count = inversions(allStates())
+    return np.flatnonzero((count % 2 == 0) & (count != 0)).astype(np.int32)
@@ -0,0 +1,285 @@
+"""
+benchmark: compare the search throughput of the bots on several board geometries.
+
+A geometry is given as ROWSxCOLS:CONNECT, for example 6x7:4 for the usual board of 6 rows
+and 7 columns with 4 discs to align. For each geometry, the same number of positions is
+drawn by playing random moves from the empty board (a position where the game is already
+over is drawn again), position i of a geometry being drawn with the seed seed + i. Then:
+
+- MiniMax searches every position at a fixed depth, without its endgame solver, so that
+  the number of nodes per second measures the search itself,
+- MCTS runs a fixed number of iterations from every position, one random game (rollout)
+  being played per iteration, with a new tree for each position.
+
+One CSV line is written per geometry. The search is run in this process only, so the
+throughputs of the geometries can be compared with each other, not with other machines.
+
+Usage:
+    python benchmark.py
+    python benchmark.py 6x7:4 9x9:5 --depth 5 --iterations 2000 -o benchmark.csv
+"""
+import argparse
+import csv
+import random
+import sys
+import time
+from collections import namedtuple
+
+from common import RANDOM
+from connect4game import Connect4Game
+from minimax import MiniMax
+from monte_carlo import MonteCarlo
+
+DEFAULT_GEOMETRIES = ("6x7:4", "7x8:4", "8x8:5", "9x9:5")
+DEFAULT_POSITIONS = 20
+DEFAULT_PLIES = 6
+DEFAULT_DEPTH = 5
+DEFAULT_ITERATIONS = 1000
+FIELDS = [
+    "geometry",
+    "rows",
+    "cols",
+    "connect",
+    "positions",
+    "minimax_depth",
+    "minimax_nodes",
+    "minimax_nodes_per_s",
+    "minimax_ms_per_move",
+    "mcts_iterations",
+    "mcts_iterations_per_s",
+    "mcts_ms_per_move",
+]
+
+Geometry = namedtuple("Geometry", ["name", "rows", "cols", "connect"])
+
+
+def parse_geometry(text):
+    """
+    :param text: description of a geometry, ROWSxCOLS:CONNECT
+    :return: a Geometry
+    """
+    try:
+        size, connect = text.lower().split(":")
+        rows, cols = size.split("x")
+        geometry = Geometry(text, int(rows), int(cols), int(connect))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid geometry: {text}")
+    if not 2 <= geometry.connect <= max(geometry.rows, geometry.cols):
+        raise argparse.ArgumentTypeError(f"cannot align {geometry.connect} discs: {text}")
+    return geometry
+
+
+def positions(geometry, nb_positions, plies, seed=0):
+    """
+    :param geometry: Geometry of the board
+    :param nb_positions: number of positions
+    :param plies: number of random moves played from the empty board
+    :param seed: seed of the first position
+    :return: list of the positions, as the columns played from the empty board
+    """
+    drawn = []
+    for i in range(nb_positions):
+        rng = random.Random(seed + i)
+        while True:
+            game = new_game(geometry)
+            moves = []
+            for _ in range(plies):
+                col = rng.choice(game._board.valid_moves())
+                game.apply_move(col)
+                moves.append(col)
+                if game.is_over():
+                    break
+            if not game.is_over():
+                break
+        drawn.append(moves)
+    return drawn
+
+
+def new_game(geometry, moves=()):
+    """
+    :param geometry: Geometry of the board
+    :param moves: columns played from the empty board, player 1 moving first
+    :return: a Connect4Game of the position, without bots of its own
+    """
+    game = Connect4Game(
+        RANDOM,
+        RANDOM,
+        rows=geometry.rows,
+        cols=geometry.cols,
+        connect=geometry.connect,
+        starter=1,
+    )
+    for col in moves:
+        game.apply_move(col)
+    return game
+
+
+def bench_minimax(geometry, games, depth):
+    """
+    :param geometry: Geometry of the board
+    :param games: list of the positions, see positions
+    :param depth: depth of the searches
+    :return: a tuple (nodes, seconds): the nodes searched and the time of all the searches
+    """
+    nodes = 0
+    elapsed = 0.0
+    for moves in games:
+        game = new_game(geometry, moves)
+        # The solver would replace the search of the positions with few empty cells.
+        bot = MiniMax(game, depth, solve_threshold=0)
+        start = time.perf_counter()
+        bot.search(game._board)
+        elapsed += time.perf_counter() - start
+        nodes += bot.nodes
+    return nodes, elapsed
+
+
+def bench_mcts(geometry, games, iterations):
+    """
+    :param geometry: Geometry of the board
+    :param games: list of the positions, see positions
+    :param iterations: number of iterations of each search
+    :return: the time of all the searches in seconds
+    """
+    elapsed = 0.0
+    for moves in games:
+        game = new_game(geometry, moves)
+        bot = MonteCarlo(game, iterations, reuse_tree=False)
+        start = time.perf_counter()
+        bot.monte_carlo_tree_search(iterations, game.copy_state(), 2.0)
+        elapsed += time.perf_counter() - start
+    return elapsed
+
+
+def run(geometries, nb_positions, plies, depth, iterations, seed=0, progress=None):
+    """
+    Runs the benchmark.
+
+    :param geometries: list of Geometry
+    :param nb_positions: number of positions of each geometry
+    :param plies: number of random moves played to draw a position
+    :param depth: depth of the MiniMax searches
+    :param iterations: number of iterations of the MCTS searches
+    :param seed: seed of the first position of each geometry
+    :param progress: optional function called with each Geometry before it is run
+    :return: the CSV lines of the geometries (dictionaries, see FIELDS)
+    """
+    lines = []
+    for geometry in geometries:
+        if progress is not None:
+            progress(geometry)
+        games = positions(geometry, nb_positions, plies, seed)
+        nodes, minimax_time = bench_minimax(geometry, games, depth)
+        mcts_time = bench_mcts(geometry, games, iterations)
+        lines.append(
+            {
+                "geometry": geometry.name,
+                "rows": geometry.rows,
+                "cols": geometry.cols,
+                "connect": geometry.connect,
+                "positions": len(games),
+                "minimax_depth": depth,
+                "minimax_nodes": nodes,
+                "minimax_nodes_per_s": round(nodes / max(minimax_time, 1e-9), 1),
+                "minimax_ms_per_move": round(1000 * minimax_time / len(games), 3),
+                "mcts_iterations": iterations,
+                "mcts_iterations_per_s": round(
+                    iterations * len(games) / max(mcts_time, 1e-9), 1
+                ),
+                "mcts_ms_per_move": round(1000 * mcts_time / len(games), 3),
+            }
+        )
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="benchmark",
+        description="Search throughput of the Connect 4 bots on several board geometries.",
+    )
+    parser.add_argument(
+        "geometries",
+        nargs="*",
+        type=parse_geometry,
+        default=[parse_geometry(text) for text in DEFAULT_GEOMETRIES],
+        help="Geometries ROWSxCOLS:CONNECT (default {}).".format(
+            " ".join(DEFAULT_GEOMETRIES)
+        ),
+    )
+    parser.add_argument(
+        "-n",
+        "--positions",
+        type=int,
+        default=DEFAULT_POSITIONS,
+        help="Number of positions of each geometry (default {}).".format(
+            DEFAULT_POSITIONS
+        ),
+    )
+    parser.add_argument(
+        "-p",
+        "--plies",
+        type=int,
+        default=DEFAULT_PLIES,
+        help="Number of random moves played to draw a position (default {}).".format(
+            DEFAULT_PLIES
+        ),
+    )
+    parser.add_argument(
+        "-d",
+        "--depth",
+        type=int,
+        default=DEFAULT_DEPTH,
+        help="Depth of the MiniMax searches (default {}).".format(DEFAULT_DEPTH),
+    )
+    parser.add_argument(
+        "-i",
+        "--iterations",
+        type=int,
+        default=DEFAULT_ITERATIONS,
+        help="Number of iterations of the MCTS searches (default {}).".format(
+            DEFAULT_ITERATIONS
+        ),
+    )
+    parser.add_argument(
+        "-o", "--output", default="-", help="CSV output file (default stdout)."
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="Seed of the first position (default 0)."
+    )
+    args = parser.parse_args()
+
+    def progress(geometry):
+        print("{}...".format(geometry.name), file=sys.stderr, flush=True)
+
+    lines = run(
+        args.geometries,
+        args.positions,
+        args.plies,
+        args.depth,
+        args.iterations,
+        args.seed,
+        progress,
+    )
+    out = sys.stdout if args.output == "-" else open(args.output, "w", newline="")
+    writer = csv.DictWriter(out, fieldnames=FIELDS)
+    writer.writeheader()
+    writer.writerows(lines)
+    if out is not sys.stdout:
+        out.close()
+
+    for row in lines:
+        print(
+            "{:<8} minimax {:>10.0f} nodes/s {:>9.1f}ms/move  "
+            "mcts {:>8.0f} iterations/s {:>9.1f}ms/move".format(
+                row["geometry"],
+                row["minimax_nodes_per_s"],
+                row["minimax_ms_per_move"],
+                row["mcts_iterations_per_s"],
+                row["mcts_ms_per_move"],
+            ),
+            file=sys.stderr,
+        )
+
+
+if __name__ == "__main__":
+    main()
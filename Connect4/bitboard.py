@@ -0,0 +1,226 @@
+import random
+from functools import lru_cache
+
+from common import DEFAULT_COLS, DEFAULT_CONNECT, DEFAULT_ROWS, EMPTY
+
+# Seed of the Zobrist keys, so that the hashes are the same in every process.
+ZOBRIST_SEED = 4
+
+
+@lru_cache(maxsize=None)
+def zobrist_keys(size):
+    """
+    Random 64-bit keys used to hash the positions: the hash of a position is the
+    XOR of the keys of its discs, so it is updated with one XOR per move.
+
+    :param size: number of bits of the masks
+    :return: dictionary giving for each player (1 and -1) the list of the keys of the bits
+    """
+    rng = random.Random(ZOBRIST_SEED)
+    return {player: [rng.getrandbits(64) for _ in range(size)] for player in (1, -1)}
+
+
+@lru_cache(maxsize=None)
+def line_steps(stride, connect):
+    """
+    Shifts used to detect the lines of connect bits in a mask: for each direction, the mask
+    ANDed with itself shifted by each step in turn keeps the first bits of the lines of 2,
+    4, ... bits and then of connect bits, so it is not 0 if there is a line.
+
+    :param stride: number of bits of a column of the board (rows + 1)
+    :param connect: number of bits of the lines
+    :return: a tuple of 4 tuples of steps: vertical, horizontal and both diagonals
+    """
+    directions = []
+    for shift in (1, stride, stride - 1, stride + 1):
+        steps = []
+        run = 1
+        while 2 * run <= connect:
+            steps.append(run * shift)
+            run *= 2
+        if run < connect:
+            steps.append((connect - run) * shift)
+        directions.append(tuple(steps))
+    return tuple(directions)
+
+
+class BitBoard:
+    """
+    Bitboard representation of a Connect 4 board, of any size and number of discs to align.
+
+    Each player owns a mask (a Python integer used as a bit set) with one bit per cell.
+    The cells of column c are the bits c * (rows + 1) to c * (rows + 1) + rows - 1, from
+    the bottom to the top: the extra bit on top of each column is always empty, so that
+    the shifts used to detect an alignment never wrap from one column to the next, whatever
+    its length.
+    For 6 rows and 7 columns, the masks fit in 49 bits:
+
+        6 13 20 27 34 41 48
+        5 12 19 26 33 40 47
+        4 11 18 25 32 39 46
+        3 10 17 24 31 38 45
+        2  9 16 23 30 37 44
+        1  8 15 22 29 36 43
+        0  7 14 21 28 35 42
+
+    The heights array gives the number of discs of each column, so a move is placed
+    and removed in O(1), and an alignment of 4 is detected with 8 shifts and ANDs (one
+    more per direction for an alignment of 5 to 7, see line_steps).
+    The Zobrist hash of the position is kept up to date by play and undo, with the hash of
+    its mirror image (columns from right to left, see canonical).
+    """
+
+    def __init__(self, rows=DEFAULT_ROWS, cols=DEFAULT_COLS, connect=DEFAULT_CONNECT):
+        """
+        Constructor of the BitBoard class, the board is empty.
+
+        :param rows: number of rows of the board
+        :param cols: number of columns of the board
+        :param connect: number of discs to align to win
+        """
+        self.rows = rows
+        self.cols = cols
+        self.connect = connect
+        # Number of bits used by a column (the cells and the empty bit on top).
+        self.stride = rows + 1
+        self.masks = {1: 0, -1: 0}
+        self.heights = [0] * cols
+        # Columns played so far, used to undo the moves.
+        self.history = []
+        self.keys = zobrist_keys(self.stride * cols)
+        self.line_steps = line_steps(self.stride, connect)
+        self.hash = 0
+        # Hash of the mirror image of the board.
+        self.mirror_hash = 0
+
+    def copy(self):
+        """
+        :return: an independent copy of the board
+        """
+        new_one = BitBoard.__new__(BitBoard)
+        new_one.rows = self.rows
+        new_one.cols = self.cols
+        new_one.connect = self.connect
+        new_one.stride = self.stride
+        new_one.masks = dict(self.masks)
+        new_one.heights = list(self.heights)
+        new_one.history = list(self.history)
+        new_one.keys = self.keys
+        new_one.line_steps = self.line_steps
+        new_one.hash = self.hash
+        new_one.mirror_hash = self.mirror_hash
+        return new_one
+
+    def bit(self, c, r):
+        """
+        :param c: the column
+        :param r: the row
+        :return: the bit of the cell at column c, row r
+        """
+        return 1 << (c * self.stride + r)
+
+    def cell(self, c, r):
+        """
+        :param c: the column
+        :param r: the row
+        :return: 1 or -1 depending on the player owning the cell, EMPTY if it is empty
+        """
+        b = self.bit(c, r)
+        if self.masks[1] & b:
+            return 1
+        if self.masks[-1] & b:
+            return -1
+        return EMPTY
+
+    def to_lists(self):
+        """
+        :return: the board as a list of columns, each column being a list of the cells
+            from the bottom to the top (1, -1 or EMPTY)
+        """
+        return [[self.cell(c, r) for r in range(self.rows)] for c in range(self.cols)]
+
+    def can_play(self, c):
+        """
+        :param c: the column
+        :return: True if column c is not full
+        """
+        return self.heights[c] < self.rows
+
+    def valid_moves(self):
+        """
+        :return: list of the indices of the columns that are not full
+        """
+        return [c for c in range(self.cols) if self.heights[c] < self.rows]
+
+    def is_full(self):
+        """
+        :return: True if no disc can be placed anymore
+        """
+        return len(self.history) == self.rows * self.cols
+
+    def play(self, c, player):
+        """
+        Places a disc of player on column c, the column must not be full.
+
+        :param c: the column
+        :param player: 1 or -1
+        :return: the row of the placed disc
+        """
+        r = self.heights[c]
+        index = c * self.stride + r
+        self.masks[player] |= 1 << index
+        self.hash ^= self.keys[player][index]
+        self.mirror_hash ^= self.keys[player][(self.cols - 1 - c) * self.stride + r]
+        self.heights[c] = r + 1
+        self.history.append(c)
+        return r
+
+    def undo(self):
+        """
+        Removes the last disc placed.
+
+        :return: the column of the removed disc
+        """
+        c = self.history.pop()
+        r = self.heights[c] - 1
+        index = c * self.stride + r
+        b = 1 << index
+        self.heights[c] = r
+        player = 1 if self.masks[1] & b else -1
+        self.masks[player] ^= b
+        self.hash ^= self.keys[player][index]
+        self.mirror_hash ^= self.keys[player][(self.cols - 1 - c) * self.stride + r]
+        return c
+
+    def has_line(self, mask):
+        """
+        Checks whether a mask contains connect aligned bits.
+
+        :param mask: the mask of a player
+        :return: True if there is an alignment of connect discs
+        """
+        for steps in self.line_steps:
+            lines = mask
+            for step in steps:
+                lines &= lines >> step
+            if lines:
+                return True
+        return False
+
+    def is_win(self, player):
+        """
+        :param player: 1 or -1
+        :return: True if player has aligned connect discs
+        """
+        return self.has_line(self.masks[player])
+
+    def is_winning_move(self, c, player):
+        """
+        Checks whether placing a disc of player on column c would align connect discs,
+        without modifying the board.
+
+        :param c: the column, it must not be full
+        :param player: 1 or -1
+        :return: True if the move wins the game
+        """
+        return self.has_line(self.masks[player] | (1 << (c * self.stride + self.heights[c])))
@@ -1,14 +1,12 @@
 import random
-import math
 from common import (
-    ROW_COUNT,
-    COLUMN_COUNT,
     MINIMAX,
     MONTE_CARLO,
     RANDOM,
     RANDOM_IMPR,
     Observer,
 )
+from threats import ThreatMap
 
 YELLOW_PLAYER = 1
 RED_PLAYER = -1
@@ -43,6 +41,12 @@ class Bot(Observer):
             self._pruning = pruning
         elif self._type == MONTE_CARLO:
             self._iteration = iteration
+        # Opening book used by the search bots before searching (see opening_book).
+        self.book = None
+        # Threats of the board of the game and the columns played when they were last set
+        # (see board_threats).
+        self._board_threats = None
+        self._threats_history = None
 
     def __repr__(self):
         return self._type
@@ -84,57 +88,79 @@ class Bot(Observer):
                     column = self.get_random_move()
                     # print("Random move", column)
         elif self._type == MINIMAX:
-            column, minimax_score = self.minimax(
-                self._game._board,
-                self._depth,
-                -math.inf,
-                math.inf,
-                True,
-                self._pruning,
-            )
+            column = self.get_book_move()
+            if column is None:
+                column, minimax_score = self.search(self._game._board)
             # print(column)
         elif self._type == MONTE_CARLO:
-            o = Node(self._game.copy_state())
-            column = self.monte_carlo_tree_search(self._iteration, o, 2.0)
+            column = self.get_book_move()
+            if column is None:
+                column = self.monte_carlo_tree_search(
+                    self._iteration, self._game.copy_state(), 2.0
+                )
         else:
             column = 0
 
         # print("-------------------------")
         self._game.place(column)
 
+    def get_book_move(self):
+        """
+        Looks the board up in the opening book of the bot.
+
+        :return: column given by the book, None if there is no book or the board is not in it
+        """
+        if self.book is None:
+            return None
+        entry = self.book.lookup(self._game._board, self._game._turn)
+        if entry is None:
+            return None
+        return entry[0]
+
     def get_winning_move(self):
         """
         Checks whether there is a winning column available for the next
-        move of the bot.
+        move of the bot. The winning columns are read in the threats of the board
+        (see board_threats).
 
         :return: winning column
         """
-        column = None
-        for c_win in range(self._game._cols):
-            for r in range(self._game._rows):
-                if self._game._board[c_win][r] == 0:
-                    self._game._board[c_win][r] = self._game._turn
-                    is_winner = self._game.check_win((c_win, r))
-                    self._game._board[c_win][r] = 0
-                    if is_winner:
-                        column = c_win
-                        return column
-                    break
-        return column
+        return self.board_threats().winning_move(self._game._turn)
+
+    def board_threats(self):
+        """
+        The threats of the players on the board of the game, kept by the bot rather than
+        by the board: the board is searched in place by MiniMax, which has its own.
+        The discs played since the last call are added, the threats are only set again
+        from the whole board when it is not the continuation of the last one.
+
+        :return: the ThreatMap of the board
+        """
+        board = self._game._board
+        history = board.history
+        known = self._threats_history
+        if self._board_threats is None:
+            self._board_threats = ThreatMap(board.rows, board.cols, board.connect)
+            known = None
+        if known is None or history[: len(known)] != known:
+            self._board_threats.reset(board)
+        else:
+            for k in range(len(known), len(history)):
+                c = history[k]
+                r = history[:k].count(c)
+                self._board_threats.add(c * board.stride + r, board.cell(c, r))
+        self._threats_history = list(history)
+        return self._board_threats
 
     def get_valid_locations(self, board):
         """
         Returns all the valid columns where the player can play, aka the columns
         that are not full
 
-        :param board: actual state of the game, board of the game
+        :param board: actual state of the game, BitBoard of the game
         :return: list of all valid column indices
         """
-        free_cols = []
-        for i in range(COLUMN_COUNT):
-            if board[i][ROW_COUNT - 1] == 0:
-                free_cols.append(i)
-                # print()
+        free_cols = board.valid_moves()
         if len(free_cols) == 0:
             return None
         return free_cols
@@ -156,62 +182,5 @@ class Bot(Observer):
 
         :return: column to be played to avoid losing immediatly
         """
-        column = None
-        for c_win in range(self._game._cols):
-            for r in range(self._game._rows):
-                if self._game._board[c_win][r] == 0:
-                    self._game._board[c_win][r] = -1 * self._game._turn
-                    is_winner = self._game.check_win((c_win, r))
-                    self._game._board[c_win][r] = 0
-                    if is_winner:
-                        column = c_win
-                        return column
-                    break
-        return column
-
+        return self.board_threats().winning_move(-1 * self._game._turn)
 
-class Node:
-    """
-    This class is used to represent nodes of the tree of boards used during
-    Monte-Carlo Tree Search.
-    """
-
-    def __init__(self, state, parent=None):
-        self.visits = 1
-        self.reward = 0.0
-        self.state = state  # Instance of Connect4Game
-        self.children = []
-        self.children_moves = []
-        self.parent = parent
-
-    def add_child(self, child_state, move):
-        """
-        Add a child to the current node.
-
-        :param child_state: state of the child to add
-        :param move: move to do to get to the newly added child
-        """
-        child = Node(child_state, parent=self)
-        self.children.append(child)
-        self.children_moves.append(move)
-
-    def update(self, reward):
-        """
-        Update the node's reward (indicates how good a certain node is
-        according to the MCTS algorithm)
-
-        :param reward: reward to be added to the node
-        """
-        self.reward += reward
-        self.visits += 1
-
-    def fully_explored(self):
-        """
-        Checks if the node is fully explored (which means we can not add
-        any more children to this node)
-
-        :return: True of False depending on if it is fully epxlored or not
-        """
-        if len(self.children) == len(self.state.get_valid_locations()):
-            return True
-        return False
@@ -0,0 +1,107 @@
+"""
+Canonical positions: a Connect 4 board and its mirror image (columns from right to left)
+have the same value, the best move of one being the mirror of the best move of the other.
+
+The caches of the bots identify a position by the smallest of its key and of the key of
+its mirror image, so that the two boards share one entry:
+
+- the transposition table of MiniMax by the smallest of the Zobrist hashes of the board
+  and of its mirror image (see canonical_hash, both are kept up to date by BitBoard),
+- the transposition table of the solver and the opening book by the smallest of the exact
+  keys of the board and of its mirror image (see canonical_key).
+
+A move is stored in the orientation of the canonical position: mirror_move maps it back
+to the board when it is not the canonical one. A symmetric board is its own mirror image,
+its mirrored moves are the same moves: the Monte Carlo tree only expands one of them
+(see canonical_moves).
+"""
+
+
+def mirror_move(col, cols):
+    """
+    :param col: a column
+    :param cols: number of columns of the board
+    :return: the column of the mirror image
+    """
+    return cols - 1 - col
+
+
+def mirror_mask(mask, rows, cols):
+    """
+    :param mask: mask of a BitBoard of the given size
+    :param rows: number of rows of the board
+    :param cols: number of columns of the board
+    :return: the mask of the mirror image of the board (column c becomes cols - 1 - c)
+    """
+    stride = rows + 1
+    column = (1 << stride) - 1
+    mirrored = 0
+    for c in range(cols):
+        mirrored |= ((mask >> (c * stride)) & column) << ((cols - 1 - c) * stride)
+    return mirrored
+
+
+def position_key(mask, all_mask, rows, cols):
+    """
+    Exact key of a position: the discs of the player to move plus the occupied cells plus
+    the bottom cell of every column. Each column then reads as its discs with a 1 on top of
+    them, which is different for every position, and the player to move is known from the
+    number of discs.
+
+    :param mask: mask of the player to move
+    :param all_mask: mask of all the discs
+    :param rows: number of rows of the board
+    :param cols: number of columns of the board
+    :return: the key, an integer of (rows + 1) * cols bits
+    """
+    bottom = sum(1 << (c * (rows + 1)) for c in range(cols))
+    return mask + all_mask + bottom
+
+
+def canonical_key(board, player):
+    """
+    :param board: BitBoard
+    :param player: player to move, 1 or -1
+    :return: a tuple (key, mirrored): the smallest exact key of the board and of its mirror
+        image, and whether it is the one of the mirror image
+    """
+    rows, cols = board.rows, board.cols
+    mask = board.masks[player]
+    all_mask = mask | board.masks[-player]
+    key = position_key(mask, all_mask, rows, cols)
+    mirror_key = position_key(
+        mirror_mask(mask, rows, cols), mirror_mask(all_mask, rows, cols), rows, cols
+    )
+    if mirror_key < key:
+        return mirror_key, True
+    return key, False
+
+
+def canonical_hash(board):
+    """
+    :param board: BitBoard
+    :return: a tuple (hash, mirrored): the smallest Zobrist hash of the board and of its
+        mirror image, and whether it is the one of the mirror image
+    """
+    if board.mirror_hash < board.hash:
+        return board.mirror_hash, True
+    return board.hash, False
+
+
+def is_symmetric(board):
+    """
+    :param board: BitBoard
+    :return: True if the board is its own mirror image
+    """
+    return board.hash == board.mirror_hash
+
+
+def canonical_moves(board, moves):
+    """
+    :param board: BitBoard
+    :param moves: columns that can be played on the board
+    :return: the moves, without the mirror of another one if the board is symmetric
+    """
+    if not is_symmetric(board):
+        return moves
+    return [col for col in moves if col <= mirror_move(col, board.cols)]
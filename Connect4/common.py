@@ -1,9 +1,10 @@
 import enum
 
 EMPTY = 0
-ROW_COUNT = 6
-COLUMN_COUNT = 7
-WINDOW_LENGTH = 4
+# Default geometry of the board: number of rows and columns and number of discs to align.
+DEFAULT_ROWS = 6
+DEFAULT_COLS = 7
+DEFAULT_CONNECT = 4
 
 MONTE_CARLO = "MONTE_CARLO"
 MINIMAX = "MINIMAX"
@@ -1,31 +1,21 @@
 from copy import deepcopy
 import random
-import pygame
-import pygame.gfxdraw
+from bitboard import BitBoard
 from bot import Bot
 from common import (
+    DEFAULT_COLS,
+    DEFAULT_CONNECT,
+    DEFAULT_ROWS,
     Event,
     MONTE_CARLO,
     MINIMAX,
-    ROW_COUNT,
-    COLUMN_COUNT,
-    SQUARE_SIZE,
     Observable,
-    Observer,
 )
 from monte_carlo import MonteCarlo
+from opening_book import OpeningBook, load_book
 from minimax import MiniMax
-
-# Graphical size settings
-DISC_SIZE_RATIO = 0.8
-
-# Colours
-BLUE_COLOR = (23, 93, 222)
-YELLOW_COLOR = (255, 240, 0)
-RED_COLOR = (255, 0, 0)
-BACKGROUND_COLOR = (19, 72, 162)
-BLACK_COLOR = (0, 0, 0)
-WHITE_COLOR = (255, 255, 255)
+from parallel_minimax import ParallelMiniMax
+from parallel_mcts import ParallelMonteCarlo
 
 
 class Connect4Game(Observable):
@@ -33,13 +23,21 @@ class Connect4Game(Observable):
         self,
         player1,
         player2,
-        rows=6,
-        cols=7,
+        rows=DEFAULT_ROWS,
+        cols=DEFAULT_COLS,
+        connect=DEFAULT_CONNECT,
         iteration=None,
         depth1=None,
         depth2=None,
         pruning1=True,
         pruning2=True,
+        time_limit1=None,
+        time_limit2=None,
+        parallel1=None,
+        parallel2=None,
+        workers=None,
+        starter=None,
+        book=None,
     ):
         """
         Constructor of the Connect4Game class.
@@ -48,43 +46,99 @@ class Connect4Game(Observable):
         :param player2: second player, can be a bot of any type
         :param rows: number of rows in the game
         :param cols: number of columns in the game
+        :param connect: number of discs to align to win
         :param iteration: number of iterations used by the players using MCTS
         :param depth1: depth used in the MiniMax algorithm of player1, it is uses MiniMax
         :param depth2: depth used in the MiniMax algorithm of player2, it is uses MiniMax
+        :param time_limit1: time budget in seconds of a move of player1, if it uses MiniMax
+            (iterative deepening up to depth1, None to always search at depth1)
+        :param time_limit2: time budget in seconds of a move of player2, if it uses MiniMax
+        :param parallel1: parallel search mode of player1, None for a search in a single
+            process. With MiniMax, one of parallel_minimax.PARALLEL_MODES ("root" to split
+            the moves of the root among processes, "lazy_smp" for Lazy SMP), with MCTS one
+            of parallel_mcts.PARALLEL_MODES ("root" for a tree per process, "tree" for a
+            shared tree whose random games are played by the processes)
+        :param parallel2: parallel search mode of player2
+        :param workers: number of processes of the parallel searches (default the number of CPUs)
+        :param starter: player who moves first in every game (1 or -1), None to draw it at random
+        :param book: opening book of the MiniMax and MCTS players, an opening_book.OpeningBook
+            or the path of a book file (None for no book)
         """
         super().__init__()
+        if not 2 <= connect <= max(rows, cols):
+            raise ValueError(
+                f"Cannot align {connect} discs on a board of {rows} rows and {cols} columns"
+            )
         self._rows = rows
         self._cols = cols
+        self._connect = connect
         self._board = None
         self._turn = None
         self._won = None
         self._round = 0
         self.bot = None
         self.moves = {1: [], -1: []}
+        self._first = starter
         self.reset_game()
         if player1 == MONTE_CARLO:
-            self._player1 = MonteCarlo(self, iteration=iteration)
+            self._player1 = self.monte_carlo_player(iteration, parallel1, workers)
         elif player1 == MINIMAX:
-            self._player1 = MiniMax(self, depth=depth1, pruning=pruning1)
+            self._player1 = self.minimax_player(
+                depth1, pruning1, time_limit1, parallel1, workers
+            )
         else:
             self._player1 = Bot(self, bot_type=player1)
         if player2 == MONTE_CARLO:
-            self._player2 = MonteCarlo(self, iteration=iteration)
+            self._player2 = self.monte_carlo_player(iteration, parallel2, workers)
         elif player2 == MINIMAX:
-            self._player2 = MiniMax(self, depth=depth2, pruning=pruning2)
+            self._player2 = self.minimax_player(
+                depth2, pruning2, time_limit2, parallel2, workers
+            )
         else:
             self._player2 = Bot(self, bot_type=player2)
+        if book is not None:
+            if not isinstance(book, OpeningBook):
+                book = load_book(book)
+            for player in (self._player1, self._player2):
+                if player._type in (MINIMAX, MONTE_CARLO):
+                    player.book = book
         self.last_move = None
 
+    def monte_carlo_player(self, iteration, parallel, workers):
+        """
+        :return: a MonteCarlo bot, searching in parallel if a parallel mode is given
+        """
+        if parallel is None:
+            return MonteCarlo(self, iteration=iteration)
+        return ParallelMonteCarlo(
+            self, iteration=iteration, mode=parallel, workers=workers
+        )
+
+    def minimax_player(self, depth, pruning, time_limit, parallel, workers):
+        """
+        :return: a MiniMax bot, searching in parallel if a parallel mode is given
+        """
+        if parallel is None:
+            return MiniMax(self, depth=depth, pruning=pruning, time_limit=time_limit)
+        return ParallelMiniMax(
+            self,
+            depth=depth,
+            pruning=pruning,
+            time_limit=time_limit,
+            mode=parallel,
+            workers=workers,
+        )
+
     def reset_game(self):
         """
         Resets the game state (board and variables)
         """
         # print("reset")
-        self._board = [
-            [0 for _ in range(self._rows)] for _ in range(self._cols)
-        ]
-        self._starter = random.choice([-1, 1])
+        self._board = BitBoard(self._rows, self._cols, self._connect)
+        if self._first is None:
+            self._starter = random.choice([-1, 1])
+        else:
+            self._starter = self._first
         self._turn = self._starter
         # (self._turn)
         self._won = None
@@ -98,30 +152,29 @@ class Connect4Game(Observable):
         :return: position of placed colour or None if not placeable
         """
         # print(self._board)
-        for r in range(self._rows):
-            if self._board[c][r] == 0:
-                self._board[c][r] = self._turn
-                self.last_move = [c, r]
-                self.notify(Event.PIECE_PLACED, (c, r))
-                self.moves[self._turn].append(c)
-
-                exists_winner = self.check_win((c, r))
-                if exists_winner:
-                    b = 0
-                    if (
-                        self._turn == self._starter
-                    ):  # Winner is the player that started
-                        b = 1
-                    self._won = self._turn
-                    self.notify(Event.GAME_WON, self._won)
-
-                if self._turn == 1:
-                    self._turn = -1
-                else:
-                    self._turn = 1
-
-                self._round = self._round + 1
-                return c, r
+        if self._board.can_play(c):
+            r = self._board.play(c, self._turn)
+            self.last_move = [c, r]
+            self.notify(Event.PIECE_PLACED, (c, r))
+            self.moves[self._turn].append(c)
+
+            exists_winner = self.check_win((c, r))
+            if exists_winner:
+                b = 0
+                if (
+                    self._turn == self._starter
+                ):  # Winner is the player that started
+                    b = 1
+                self._won = self._turn
+                self.notify(Event.GAME_WON, self._won)
+
+            if self._turn == 1:
+                self._turn = -1
+            else:
+                self._turn = 1
+
+            self._round = self._round + 1
+            return c, r
         return None
 
     def check_win(self, pos):
@@ -131,62 +184,50 @@ class Connect4Game(Observable):
         :param pos: position from which to check the win
         :return: player number if a win occurs, 0 if a draw occurs, None otherwise
         """
-        c = pos[0]
-        r = pos[1]
-        player = self._board[c][r]
-
-        min_col = max(c - 3, 0)
-        max_col = min(c + 3, self._cols - 1)
-        min_row = max(r - 3, 0)
-        max_row = min(r + 3, self._rows - 1)
+        player = self._board.cell(pos[0], pos[1])
 
-        # Horizontal check
-        count = 0
-        for ci in range(min_col, max_col + 1):
-            if self._board[ci][r] == player:
-                count += 1
-            else:
-                count = 0
-            if count == 4:
-                return True
-
-        # Vertical check
-        count = 0
-        for ri in range(min_row, max_row + 1):
-            if self._board[c][ri] == player:
-                count += 1
-            else:
-                count = 0
-            if count == 4:
-                return True
-
-        count1 = 0
-        count2 = 0
-        # Diagonal check
-        for i in range(-3, 4):
-            # bottom-left -> top-right
-            if 0 <= c + i < self._cols and 0 <= r + i < self._rows:
-                if self._board[c + i][r + i] == player:
-                    count1 += 1
-                else:
-                    count1 = 0
-                if count1 == 4:
-                    return True
-            # bottom-right -> top-let
-            if 0 <= c + i < self._cols and 0 <= r - i < self._rows:
-                if self._board[c + i][r - i] == player:
-                    count2 += 1
-                else:
-                    count2 = 0
-                if count2 == 4:
-                    return True
+        # The bitboard checks every direction at once with a few shifts.
+        if self._board.is_win(player):
+            return True
 
         # Draw check
-        if sum([x.count(0) for x in self._board]) == 0:
+        if self._board.is_full():
             return True
 
         return False
 
+    def apply_move(self, c):
+        """
+        Plays the c-th column for the player to move, in place and silently: the
+        observers are not notified and neither the move history nor the winner are
+        updated. Used by the search algorithms together with undo_move instead of
+        copying the game.
+
+        :param c: column to place on, it must not be full
+        :return: row of the placed disc
+        """
+        r = self._board.play(c, self._turn)
+        self._turn = -self._turn
+        return r
+
+    def undo_move(self):
+        """
+        Cancels the last move played with apply_move.
+
+        :return: column of the removed disc
+        """
+        self._turn = -self._turn
+        return self._board.undo()
+
+    def is_over(self):
+        """
+        Checks whether the last move won the game or filled the board, like check_win.
+        Unlike get_win, it also works on the moves played with apply_move.
+
+        :return: True if the game is over
+        """
+        return self._board.is_win(-self._turn) or self._board.is_full()
+
     def get_cols(self):
         """
         :return: The number of columns of the game
@@ -199,6 +240,12 @@ class Connect4Game(Observable):
         """
         return self._rows
 
+    def get_connect(self):
+        """
+        :return: The number of discs to align to win
+        """
+        return self._connect
+
     def get_win(self):
         """
         :return: If one play won or not
@@ -213,9 +260,9 @@ class Connect4Game(Observable):
 
     def get_board(self):
         """
-        :return: A copy of the game board
+        :return: A copy of the game board, as a list of columns (see BitBoard.to_lists)
         """
-        return self._board.copy()
+        return self._board.to_lists()
 
     def board_at(self, c, r):
         """
@@ -223,7 +270,7 @@ class Connect4Game(Observable):
         :param: r, the row
         :return: What value is held at column c, row r in the board
         """
-        return self._board[c][r]
+        return self._board.cell(c, r)
 
     def copy_state(self):
         """
@@ -235,7 +282,11 @@ class Connect4Game(Observable):
         temporary_observers = self._observers
         self._observers = []
 
-        new_one = deepcopy(self)
+        # The players are shared with the copy rather than copied: their search state
+        # (transposition table, worker processes, ...) is not needed to play moves on it.
+        new_one = deepcopy(
+            self, {id(self._player1): self._player1, id(self._player2): self._player2}
+        )
         new_one._observers.clear()  # Clear observers, such as GUI in our case.
 
         # Reassign the observers after deepcopy
@@ -257,112 +308,5 @@ class Connect4Game(Observable):
         Returns the indices of the columns that are not full, aka the column where
         the user can play his next move
         """
-        free_cols = []
-        for i in range(COLUMN_COUNT):
-            if self._board[i][ROW_COUNT - 1] == 0:
-                free_cols.append(i)
-
-        return free_cols
-
-
-class Connect4Viewer(Observer):
-    def __init__(self, game):
-        super(Observer, self).__init__()
-        assert game is not None
-        self._game = game
-        self._game.add_observer(self)
-        self._screen = None
-        self._font = None
-
-    def initialize(self):
-        """
-        Initialises the view window
-        """
-        pygame.init()
-        pygame.display.set_caption("Connect Four")
-        self._font = pygame.font.SysFont(None, 70)
-        self._screen = pygame.display.set_mode(
-            [
-                self._game.get_cols() * SQUARE_SIZE,
-                self._game.get_rows() * SQUARE_SIZE,
-            ]
-        )
-        self.draw_board()
-
-    def draw_board(self):
-        """
-        Draws board[c][r] with c = 0 and r = 0 being bottom left
-        0 = empty (background colour)
-        1 = yellow
-        2 = red
-        """
-        self._screen.fill(BLUE_COLOR)
-
-        for r in range(self._game.get_rows()):
-            for c in range(self._game.get_cols()):
-                colour = BACKGROUND_COLOR
-                if self._game.board_at(c, r) == 1:
-                    colour = YELLOW_COLOR
-                if self._game.board_at(c, r) == -1:
-                    colour = RED_COLOR
-
-                # Anti-aliased circle drawing
-                pygame.gfxdraw.aacircle(
-                    self._screen,
-                    c * SQUARE_SIZE + SQUARE_SIZE // 2,
-                    self._game.get_rows() * SQUARE_SIZE
-                    - r * SQUARE_SIZE
-                    - SQUARE_SIZE // 2,
-                    int(DISC_SIZE_RATIO * SQUARE_SIZE / 2),
-                    colour,
-                )
-
-                pygame.gfxdraw.filled_circle(
-                    self._screen,
-                    c * SQUARE_SIZE + SQUARE_SIZE // 2,
-                    self._game.get_rows() * SQUARE_SIZE
-                    - r * SQUARE_SIZE
-                    - SQUARE_SIZE // 2,
-                    int(DISC_SIZE_RATIO * SQUARE_SIZE / 2),
-                    colour,
-                )
-        pygame.display.update()
-
-    def update(self, obj, event, *argv):
-        """
-        Called when notified. Updates the view.
-        """
-        if event == Event.GAME_WON:
-            won = argv[0]
-            self.draw_win_message(won)
-        elif event == Event.GAME_RESET:
-            self.draw_board()
-        elif event == Event.PIECE_PLACED:
-            self.draw_board()
-
-    def draw_win_message(self, won):
-        """
-        Displays win message on top of the board
-        """
-        if won == 1:
-            img = self._font.render(
-                f"Yellow won ({self._game._player1})",
-                True,
-                BLACK_COLOR,
-                YELLOW_COLOR,
-            )
-        elif won == -1:
-            img = self._font.render(
-                f"Red won ({self._game._player2})", True, WHITE_COLOR, RED_COLOR
-            )
-        else:
-            img = self._font.render("Draw", True, WHITE_COLOR, BLUE_COLOR)
-
-        rect = img.get_rect()
-        rect.center = (
-            (self._game.get_cols() * SQUARE_SIZE) // 2,
-            (self._game.get_rows() * SQUARE_SIZE) // 2,
-        )
+        return self._board.valid_moves()
 
-        self._screen.blit(img, rect)
-        pygame.display.update()
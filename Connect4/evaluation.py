@@ -0,0 +1,243 @@
+from functools import lru_cache
+
+import numpy as np
+
+from common import DEFAULT_CONNECT
+
+# Score of a window for the player, see window_score.
+FULL_WINDOW_SCORE = 100
+ONE_MISSING_SCORE = 5
+TWO_MISSING_SCORE = 2
+OPPONENT_ONE_MISSING_SCORE = -4
+# Score of each disc of the player in the centre column.
+CENTRE_SCORE = 3
+
+
+def window_score(count, opp_count, length=DEFAULT_CONNECT):
+    """
+    Evaluates the score of a window (cells that can be aligned) for a player.
+
+    :param count: number of discs of the player in the window
+    :param opp_count: number of discs of the opponent in the window
+    :param length: number of cells of the window
+    :return: score of the window
+    """
+    empty = length - count - opp_count
+    score = 0
+    if count == length:
+        score += FULL_WINDOW_SCORE
+    elif count == length - 1 and empty == 1:
+        score += ONE_MISSING_SCORE
+    elif count == length - 2 and empty == 2:
+        score += TWO_MISSING_SCORE
+
+    if opp_count == length - 1 and empty == 1:
+        score += OPPONENT_ONE_MISSING_SCORE
+
+    return score
+
+
+@lru_cache(maxsize=None)
+def board_windows(rows, cols, length=DEFAULT_CONNECT):
+    """
+    Lists the windows of a board: every horizontal, vertical and diagonal line of length cells.
+    The cells are given by their index in the masks of the BitBoard (c * (rows + 1) + r).
+
+    :param rows: number of rows of the board
+    :param cols: number of columns of the board
+    :param length: number of cells of the windows
+    :return: tuple of windows, a window being a tuple of cell indices
+    """
+    stride = rows + 1
+    windows = []
+    for dc, dr in ((1, 0), (0, 1), (1, 1), (1, -1)):
+        for c in range(cols):
+            for r in range(rows):
+                end_c = c + dc * (length - 1)
+                end_r = r + dr * (length - 1)
+                if 0 <= end_c < cols and 0 <= end_r < rows:
+                    windows.append(
+                        tuple((c + dc * i) * stride + r + dr * i for i in range(length))
+                    )
+    return tuple(windows)
+
+
+def score_masks(mask, opp_mask, rows, cols, length=DEFAULT_CONNECT):
+    """
+    Computes from scratch the score of a board for a player: the sum of the scores of
+    all its windows, plus a bonus for each disc of the player in the centre column.
+
+    :param mask: mask of the discs of the player (see BitBoard)
+    :param opp_mask: mask of the discs of the opponent
+    :param rows: number of rows of the board
+    :param cols: number of columns of the board
+    :param length: number of discs to align
+    :return: score of the board
+    """
+    score = 0
+    for window in board_windows(rows, cols, length):
+        count = 0
+        opp_count = 0
+        for index in window:
+            if mask >> index & 1:
+                count += 1
+            elif opp_mask >> index & 1:
+                opp_count += 1
+        score += window_score(count, opp_count, length)
+    centre = (cols // 2) * (rows + 1)
+    for r in range(rows):
+        if mask >> (centre + r) & 1:
+            score += CENTRE_SCORE
+    return score
+
+
+class Evaluator:
+    """
+    Incremental evaluation of a board for both players.
+
+    The number of discs of each player is kept for every window, with the resulting
+    score of the board for each player. Placing or removing a disc only updates the
+    windows that contain its cell (at most 4 * length of them), so the score of a leaf
+    of the search is known without scanning the board.
+    """
+
+    def __init__(self, rows, cols, length=DEFAULT_CONNECT):
+        """
+        Constructor of the Evaluator class, for an empty board.
+
+        :param rows: number of rows of the board
+        :param cols: number of columns of the board
+        :param length: number of discs to align
+        """
+        self.rows = rows
+        self.cols = cols
+        self.length = length
+        self.windows = board_windows(rows, cols, length)
+        size = (rows + 1) * cols
+        # For each cell, the windows that contain it.
+        self.cell_windows = [[] for _ in range(size)]
+        for w, window in enumerate(self.windows):
+            for index in window:
+                self.cell_windows[index].append(w)
+        self.centre_bonus = [0] * size
+        for r in range(rows):
+            self.centre_bonus[(cols // 2) * (rows + 1) + r] = CENTRE_SCORE
+        # table[count][opp_count] is the score of a window.
+        self.table = [
+            [window_score(count, opp_count, length) for opp_count in range(length + 1)]
+            for count in range(length + 1)
+        ]
+        self.reset()
+
+    def reset(self, board=None):
+        """
+        Sets the counts for a board.
+
+        :param board: the BitBoard to evaluate, None for an empty board
+        """
+        self.counts = {1: [0] * len(self.windows), -1: [0] * len(self.windows)}
+        self.scores = {1: 0, -1: 0}
+        for player in (1, -1):
+            self.scores[player] = len(self.windows) * self.table[0][0]
+        if board is not None:
+            for player in (1, -1):
+                mask = board.masks[player]
+                for index in range(len(self.cell_windows)):
+                    if mask >> index & 1:
+                        self.add(index, player)
+
+    def add(self, index, player):
+        """
+        Updates the scores when a disc is placed.
+
+        :param index: index of the cell of the disc
+        :param player: 1 or -1
+        """
+        table = self.table
+        counts = self.counts[player]
+        opp_counts = self.counts[-player]
+        score = self.scores[player] + self.centre_bonus[index]
+        opp_score = self.scores[-player]
+        for w in self.cell_windows[index]:
+            count = counts[w]
+            opp_count = opp_counts[w]
+            score += table[count + 1][opp_count] - table[count][opp_count]
+            opp_score += table[opp_count][count + 1] - table[opp_count][count]
+            counts[w] = count + 1
+        self.scores[player] = score
+        self.scores[-player] = opp_score
+
+    def remove(self, index, player):
+        """
+        Updates the scores when a disc is removed.
+
+        :param index: index of the cell of the disc
+        :param player: 1 or -1
+        """
+        table = self.table
+        counts = self.counts[player]
+        opp_counts = self.counts[-player]
+        score = self.scores[player] - self.centre_bonus[index]
+        opp_score = self.scores[-player]
+        for w in self.cell_windows[index]:
+            count = counts[w]
+            opp_count = opp_counts[w]
+            score += table[count - 1][opp_count] - table[count][opp_count]
+            opp_score += table[opp_count][count - 1] - table[opp_count][count]
+            counts[w] = count - 1
+        self.scores[player] = score
+        self.scores[-player] = opp_score
+
+    def score(self, player):
+        """
+        :param player: 1 or -1
+        :return: score of the board for the player
+        """
+        return self.scores[player]
+
+
+def mask_cells(masks, size):
+    """
+    :param masks: masks of BitBoards, integers of at most size bits (the masks of the large
+        boards do not fit in 64 bits)
+    :param size: number of bits of the masks
+    :return: numpy array (masks, size) of the bits of the masks, 0 or 1
+    """
+    nbytes = (size + 7) // 8
+    data = b"".join(int(mask).to_bytes(nbytes, "little") for mask in masks)
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8), bitorder="little")
+    return bits.reshape(len(masks), 8 * nbytes)[:, :size]
+
+
+def batch_scores(masks, opp_masks, rows, cols, length=DEFAULT_CONNECT):
+    """
+    Vectorised version of score_masks, to score many boards at once.
+
+    :param masks: masks of the player, one per board (integers of any size)
+    :param opp_masks: masks of the opponent
+    :param rows: number of rows of the boards
+    :param cols: number of columns of the boards
+    :param length: number of discs to align
+    :return: numpy array of the scores of the boards
+    """
+    size = (rows + 1) * cols
+    # (boards, cells) arrays of 0 and 1.
+    cells = mask_cells(masks, size)
+    opp_cells = mask_cells(opp_masks, size)
+    # (cells, windows) incidence matrix, the matrix products count the discs of every window.
+    windows = board_windows(rows, cols, length)
+    incidence = np.zeros((size, len(windows)), dtype=np.int64)
+    for w, window in enumerate(windows):
+        incidence[list(window), w] = 1
+    counts = cells.astype(np.int64) @ incidence
+    opp_counts = opp_cells.astype(np.int64) @ incidence
+    table = np.array(
+        [
+            [window_score(count, opp_count, length) for opp_count in range(length + 1)]
+            for count in range(length + 1)
+        ]
+    )
+    centre = (cols // 2) * (rows + 1)
+    return table[counts, opp_counts].sum(axis=1) + CENTRE_SCORE * cells[
+        :, centre : centre + rows
+    ].sum(axis=1).astype(np.int64)
@@ -1,9 +1,21 @@
 import pygame
 import pygame.gfxdraw
 import time
-from connect4game import Connect4Game, Connect4Viewer
+from connect4game import Connect4Game
+from viewer import Connect4Viewer
 import time
-from common import MONTE_CARLO, MINIMAX, RANDOM, SQUARE_SIZE
+from common import (
+    DEFAULT_COLS,
+    DEFAULT_CONNECT,
+    DEFAULT_ROWS,
+    MONTE_CARLO,
+    MINIMAX,
+    RANDOM,
+    SQUARE_SIZE,
+)
+from opening_book import book_path
+from parallel_mcts import ROOT_PARALLEL, TREE_PARALLEL
+from parallel_minimax import LAZY_SMP, ROOT_SPLIT
 import sys
 import argparse
 
@@ -21,7 +33,16 @@ def main():
         type=str,
         help="Type of player for player 1",
         required=True,
-        choices=("minimax", "mcts", "random", "human"),
+        choices=(
+            "minimax",
+            "minimax-root",
+            "minimax-smp",
+            "mcts",
+            "mcts-root",
+            "mcts-tree",
+            "random",
+            "human",
+        ),
         default="minimax",
     )
     parser.add_argument(
@@ -31,16 +52,72 @@ def main():
         type=str,
         help="Type of player for player 2",
         required=True,
-        choices=("minimax", "mcts", "random"),
+        choices=(
+            "minimax",
+            "minimax-root",
+            "minimax-smp",
+            "mcts",
+            "mcts-root",
+            "mcts-tree",
+            "random",
+        ),
         default="MCTS",
     )
+    parser.add_argument(
+        "--time-limit",
+        "-t",
+        type=float,
+        help="Time budget in seconds of a move of the minimax players "
+        "(iterative deepening instead of a fixed depth)",
+        default=None,
+    )
+    parser.add_argument(
+        "--workers",
+        "-w",
+        type=int,
+        help="Number of processes of the parallel players "
+        "(minimax-root, minimax-smp, mcts-root and mcts-tree, default the number of CPUs)",
+        default=None,
+    )
+    parser.add_argument(
+        "--rows",
+        type=int,
+        help="Number of rows of the board",
+        default=DEFAULT_ROWS,
+    )
+    parser.add_argument(
+        "--cols",
+        type=int,
+        help="Number of columns of the board",
+        default=DEFAULT_COLS,
+    )
+    parser.add_argument(
+        "--connect",
+        type=int,
+        help="Number of discs to align to win",
+        default=DEFAULT_CONNECT,
+    )
+    parser.add_argument(
+        "--book",
+        nargs="?",
+        const="",
+        default=None,
+        help="Opening book of the minimax and mcts players "
+        "(default file books/connect<connect>_<rows>x<cols>.book, see opening_book.py)",
+    )
     args = parser.parse_args()
+    if args.book == "":
+        args.book = book_path(args.rows, args.cols, args.connect)
 
     nb_Games = 1
     total_games_won = [0, 0]
     # Change to True if one wants to play
     want_to_play = False
     p = [None, None]
+    # Parallel search mode of the players.
+    parallel = [None, None]
+    minimax_modes = {"minimax-root": ROOT_SPLIT, "minimax-smp": LAZY_SMP}
+    mcts_modes = {"mcts-root": ROOT_PARALLEL, "mcts-tree": TREE_PARALLEL}
     if args.player1 == "human":
         want_to_play = True
         p[0] = "Human"
@@ -48,17 +125,46 @@ def main():
         p[0] = RANDOM
     elif args.player1 == "minimax":
         p[0] = MINIMAX
+    elif args.player1 in minimax_modes:
+        p[0] = MINIMAX
+        parallel[0] = minimax_modes[args.player1]
     elif args.player1 == "mcts":
         p[0] = MONTE_CARLO
+    elif args.player1 in mcts_modes:
+        p[0] = MONTE_CARLO
+        parallel[0] = mcts_modes[args.player1]
 
     if args.player2 == "random":
         p[1] = RANDOM
     elif args.player2 == "minimax":
         p[1] = MINIMAX
+    elif args.player2 in minimax_modes:
+        p[1] = MINIMAX
+        parallel[1] = minimax_modes[args.player2]
     elif args.player2 == "mcts":
         p[1] = MONTE_CARLO
+    elif args.player2 in mcts_modes:
+        p[1] = MONTE_CARLO
+        parallel[1] = mcts_modes[args.player2]
 
-    game = Connect4Game(p[0], p[1], iteration=500, depth1=5, depth2=5)
+    # With a time limit, the depth is only a maximum.
+    depth = None if args.time_limit else 9
+    game = Connect4Game(
+        p[0],
+        p[1],
+        rows=args.rows,
+        cols=args.cols,
+        connect=args.connect,
+        iteration=500,
+        depth1=depth,
+        depth2=depth,
+        time_limit1=args.time_limit,
+        time_limit2=args.time_limit,
+        parallel1=parallel[0],
+        parallel2=parallel[1],
+        workers=args.workers,
+        book=args.book,
+    )
     view = Connect4Viewer(game=game)
     view.initialize()
 
@@ -0,0 +1,216 @@
+import numpy as np
+
+# Index of a missing node: parent of the root, first child of a node not expanded yet.
+NO_NODE = -1
+# Number of nodes allocated at first, the arrays are doubled when they are full.
+DEFAULT_CAPACITY = 1 << 14
+
+
+class SearchTree:
+    """
+    Tree of boards used during Monte-Carlo Tree Search, stored in preallocated NumPy arrays.
+
+    A node is an index in the arrays, which give for each node its number of visits, its
+    reward, its parent, the column played to get from the parent to the node and its
+    children. The children of a node are contiguous: the first time a node is expanded,
+    one slot is reserved for each of its valid columns (first_child and nb_children),
+    and the children are then added one by one (nb_expanded of them are in use).
+
+    No game state is kept in the tree: the state of a node is obtained by playing the
+    moves of its path on the state of the root (see MonteCarlo). The root is always the
+    node 0, the moves leading to its board being kept in history so that the tree can be
+    reused at the next move (see reroot).
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        """
+        Constructor of the SearchTree class, the tree only holds a root.
+
+        :param capacity: number of nodes allocated at first
+        """
+        self.visits = np.ones(capacity, dtype=np.int32)
+        self.reward = np.zeros(capacity, dtype=np.float64)
+        self.parent = np.full(capacity, NO_NODE, dtype=np.int32)
+        self.first_child = np.full(capacity, NO_NODE, dtype=np.int32)
+        self.nb_children = np.zeros(capacity, dtype=np.int8)
+        self.nb_expanded = np.zeros(capacity, dtype=np.int8)
+        self.move = np.full(capacity, -1, dtype=np.int8)
+        self.size = 1
+        # Columns played to get the board of the root, None if the tree is empty.
+        self.history = None
+
+    def __len__(self):
+        return self.size
+
+    def capacity(self):
+        """
+        :return: number of nodes allocated
+        """
+        return len(self.visits)
+
+    def clear(self, history=None):
+        """
+        Removes all the nodes but a new root.
+
+        :param history: columns played to get the board of the new root
+        """
+        size = self.size
+        self.visits[:size] = 1
+        self.reward[:size] = 0.0
+        self.parent[:size] = NO_NODE
+        self.first_child[:size] = NO_NODE
+        self.nb_children[:size] = 0
+        self.nb_expanded[:size] = 0
+        self.move[:size] = -1
+        self.size = 1
+        self.history = None if history is None else list(history)
+
+    def grow(self, needed):
+        """
+        Doubles the capacity of the arrays until needed nodes fit in them.
+
+        :param needed: number of nodes to hold
+        """
+        capacity = self.capacity()
+        while capacity < needed:
+            capacity *= 2
+        extra = capacity - self.capacity()
+        if extra == 0:
+            return
+        self.visits = np.concatenate([self.visits, np.ones(extra, dtype=np.int32)])
+        self.reward = np.concatenate([self.reward, np.zeros(extra)])
+        for name in ("parent", "first_child"):
+            array = getattr(self, name)
+            setattr(
+                self,
+                name,
+                np.concatenate([array, np.full(extra, NO_NODE, dtype=array.dtype)]),
+            )
+        self.nb_children = np.concatenate(
+            [self.nb_children, np.zeros(extra, dtype=np.int8)]
+        )
+        self.nb_expanded = np.concatenate(
+            [self.nb_expanded, np.zeros(extra, dtype=np.int8)]
+        )
+        self.move = np.concatenate([self.move, np.full(extra, -1, dtype=np.int8)])
+
+    def is_expanded(self, node):
+        """
+        :param node: index of the node
+        :return: True if the slots of the children of the node are reserved
+        """
+        return self.first_child[node] != NO_NODE
+
+    def fully_explored(self, node):
+        """
+        Checks if the node is fully explored (which means we can not add
+        any more children to this node)
+
+        :param node: index of the node
+        :return: True of False depending on if it is fully explored or not
+        """
+        return (
+            self.first_child[node] != NO_NODE
+            and self.nb_expanded[node] == self.nb_children[node]
+        )
+
+    def reserve_children(self, node, moves):
+        """
+        Reserves the slots of the children of a node, one for each valid column.
+
+        :param node: index of the node
+        :param moves: valid columns of the board of the node, in the order the children
+            will be added
+        """
+        first = self.size
+        self.grow(first + len(moves))
+        self.size = first + len(moves)
+        self.first_child[node] = first
+        self.nb_children[node] = len(moves)
+        self.nb_expanded[node] = 0
+        self.parent[first : self.size] = node
+        self.move[first : self.size] = moves
+
+    def add_child(self, node):
+        """
+        Adds the next child of a node, its slot must have been reserved.
+
+        :param node: index of the node
+        :return: index of the new child
+        """
+        child = self.first_child[node] + self.nb_expanded[node]
+        self.nb_expanded[node] += 1
+        return int(child)
+
+    def next_move(self, node):
+        """
+        :param node: index of the node
+        :return: column of the next child to be added to the node
+        """
+        return int(self.move[self.first_child[node] + self.nb_expanded[node]])
+
+    def children(self, node):
+        """
+        :param node: index of the node
+        :return: range of the indices of the children added to the node
+        """
+        first = int(self.first_child[node])
+        if first == NO_NODE:
+            return range(0)
+        return range(first, first + int(self.nb_expanded[node]))
+
+    def child(self, node, move):
+        """
+        :param node: index of the node
+        :param move: column played from the board of the node
+        :return: index of the child reached by the move, NO_NODE if it was not added
+        """
+        for child in self.children(node):
+            if self.move[child] == move:
+                return child
+        return NO_NODE
+
+    def reroot(self, node, history):
+        """
+        Keeps only the subtree of a node, which becomes the root (node 0). The nodes
+        are moved to the beginning of the arrays, the children of a node staying contiguous.
+
+        :param node: index of the new root
+        :param history: columns played to get the board of the new root
+        """
+        order = [node]
+        i = 0
+        while i < len(order):
+            first = int(self.first_child[order[i]])
+            if first != NO_NODE:
+                order.extend(range(first, first + int(self.nb_children[order[i]])))
+            i += 1
+        order = np.array(order, dtype=np.int64)
+        new_index = np.full(self.size, NO_NODE, dtype=np.int32)
+        new_index[order] = np.arange(len(order), dtype=np.int32)
+
+        size = self.size
+        self.visits[: len(order)] = self.visits[order]
+        self.reward[: len(order)] = self.reward[order]
+        parent = self.parent[order]
+        first_child = self.first_child[order]
+        self.parent[: len(order)] = np.where(parent == NO_NODE, NO_NODE, new_index[parent])
+        self.parent[0] = NO_NODE
+        self.first_child[: len(order)] = np.where(
+            first_child == NO_NODE, NO_NODE, new_index[first_child]
+        )
+        self.nb_children[: len(order)] = self.nb_children[order]
+        self.nb_expanded[: len(order)] = self.nb_expanded[order]
+        self.move[: len(order)] = self.move[order]
+        self.move[0] = -1
+
+        # The slots left free are reset.
+        self.size = len(order)
+        self.visits[self.size : size] = 1
+        self.reward[self.size : size] = 0.0
+        self.parent[self.size : size] = NO_NODE
+        self.first_child[self.size : size] = NO_NODE
+        self.nb_children[self.size : size] = 0
+        self.nb_expanded[self.size : size] = 0
+        self.move[self.size : size] = -1
+        self.history = list(history)
@@ -1,8 +1,30 @@
 from bot import Bot
-import copy
-from common import MINIMAX, EMPTY, ROW_COUNT, COLUMN_COUNT, WINDOW_LENGTH
+from canonical import canonical_hash, mirror_move
+from common import MINIMAX
+from evaluation import Evaluator, score_masks, window_score
+from solver import DEFAULT_THRESHOLD, DRAW, WIN, Solver
+from threats import ThreatMap
+from transposition import (
+    DEFAULT_SIZE,
+    EXACT,
+    LOWER_BOUND,
+    UPPER_BOUND,
+    TranspositionTable,
+)
 import random
 import math
+import time
+
+# Key mixed into the hash of the positions where the maximizing player is to move.
+MAXIMIZING_KEY = 0x9E3779B97F4A7C15
+# The clock is checked every CLOCK_INTERVAL nodes (a power of 2) when the search is timed.
+CLOCK_INTERVAL = 128
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside the search when the time budget of the move is spent.
+    """
 
 
 class MiniMax(Bot):
@@ -17,87 +39,252 @@ class MiniMax(Bot):
     The final choice is made based on the 7 boards possible with the score updated through the reward procedure describe above.
     Note that the larger the depth, the slower the execution.
     In order to avoid unnecessary exploration of boards, an alpha beta pruning has been implemented.
+    The values of the boards already searched are kept in a transposition table, so a board reached
+    through different move orders is only searched once, and a board and its mirror image share their
+    entry (see canonical). The table is kept from one move to the next.
+    The columns are tried in the order most likely to cause a pruning: the winning moves and the moves
+    blocking a win of the opponent (kept up to date in a ThreatMap), the best move found by a previous
+    search of the board (kept in the transposition table), the killer moves (the last moves that caused
+    a pruning at the same depth) and then the columns from the centre to the sides.
+    With a time limit, the search is an iterative deepening: the board is searched at depth 1, 2, ...
+    until the time is up, and the best move of the last completed depth is played.
+    Once few cells are left empty, the board is solved exactly instead (see solver): the bot
+    then plays the fastest win, or the move delaying its loss the most.
     """
 
-    def __init__(self, game, depth, pruning=True):
+    def __init__(
+        self,
+        game,
+        depth,
+        pruning=True,
+        tt_size=DEFAULT_SIZE,
+        time_limit=None,
+        solve_threshold=DEFAULT_THRESHOLD,
+    ):
+        """
+        :param depth: depth of the search, or maximum depth with a time limit (None for no maximum)
+        :param tt_size: maximum number of entries of the transposition table, 0 or None to
+            disable it (it is only used with the alpha beta pruning)
+        :param time_limit: time budget of a move in seconds, None to always search at the given depth
+        :param solve_threshold: the boards with at most this number of empty cells are solved
+            exactly, 0 or None to always use the MiniMax search
+        """
         super().__init__(game, bot_type=MINIMAX, depth=depth, pruning=pruning)
+        self._tt = TranspositionTable(tt_size) if pruning and tt_size else None
+        self._time_limit = time_limit
+        self._solve_threshold = solve_threshold
+        # Exact solver of the endgame, created at the first board to solve.
+        self._solver = None
+        # Solution of the last search if the board was solved, None otherwise.
+        self.solution = None
+        self._deadline = None
+        self._root_ply = 0
+        # Two killer moves per ply.
+        self._killers = [
+            [None, None] for _ in range(game.get_rows() * game.get_cols() + 1)
+        ]
+        # Number of nodes and depth of the last search.
+        self.nodes = 0
+        self.completed_depth = 0
+        geometry = (game.get_rows(), game.get_cols(), game.get_connect())
+        self._evaluator = Evaluator(*geometry)
+        self._threats = ThreatMap(*geometry)
+        cols = game.get_cols()
+        self._centre_order = sorted(range(cols), key=lambda c: abs(2 * c - (cols - 1)))
+        # The evaluation gives a bonus to the centre column, it is only the same for a board
+        # and its mirror image when the centre column is its own mirror.
+        self._symmetric = cols % 2 == 1
+
+    def make_move(self):
+        """
+        Searches and plays the next move, the entries of the transposition table stored
+        for the previous moves are kept but can be replaced.
+        """
+        if self._tt is not None:
+            self._tt.new_search()
+        super().make_move()
+
+    def search(self, board):
+        """
+        Searches the best move for the player to move, at the depth of the bot or, with a time
+        limit, by iterative deepening. The boards with few empty cells are solved instead.
+
+        :param board: BitBoard of the game, left unchanged
+        :return: column where to place the piece and its score
+        """
+        self.solution = None
+        empty_cells = board.rows * board.cols - len(board.history)
+        if self._solve_threshold and empty_cells <= self._solve_threshold:
+            return self.solve(board)
+
+        self.prepare(board)
+        if self._time_limit is None:
+            self.completed_depth = self._depth
+            return self.search_root(board, self._depth)
+
+        start = time.perf_counter()
+        max_depth = board.rows * board.cols - self._root_ply
+        if self._depth:
+            max_depth = min(max_depth, self._depth)
+        best = None
+        self.completed_depth = 0
+        try:
+            for depth in range(1, max_depth + 1):
+                best = self.search_root(board, depth)
+                self.completed_depth = depth
+                if abs(best[1]) == math.inf:
+                    # The game is decided, a deeper search would not change the move.
+                    break
+                # The depth 1 is always completed, so there is a move to play.
+                self._deadline = start + self._time_limit
+                if time.perf_counter() >= self._deadline:
+                    break
+        except SearchTimeout:
+            # The search was interrupted in the middle of a line, its moves are undone.
+            while len(board.history) > self._root_ply:
+                self.undo_piece(board)
+        finally:
+            self._deadline = None
+        return best
+
+    def solve(self, board):
+        """
+        Solves the board exactly, the solution is kept in self.solution.
+
+        :param board: BitBoard of the game, left unchanged
+        :return: column where to place the piece and its score, infinite if the game is won
+            or lost and 0 for a draw
+        """
+        if self._solver is None:
+            self._solver = Solver(board.rows, board.cols, board.connect)
+        self.solution = self._solver.solve(board, self._game._turn)
+        self.nodes = self._solver.nodes
+        self.completed_depth = board.rows * board.cols - len(board.history)
+        if self.solution.outcome == DRAW:
+            value = 0
+        else:
+            value = math.inf if self.solution.outcome == WIN else -math.inf
+        return self.solution.move, value
+
+    def prepare(self, board):
+        """
+        Resets the state of the search (killer moves, evaluator, threats, ...) before searching a board.
+
+        :param board: BitBoard to search, its current position is the root of the search
+        """
+        self._root_ply = len(board.history)
+        self._killers = [[None, None] for _ in range(board.rows * board.cols + 1)]
+        self.nodes = 0
+        self._evaluator.reset(board)
+        self._threats.reset(board)
+
+    def search_root(self, board, depth):
+        """
+        Searches the root board at a given depth.
+
+        :param board: BitBoard of the game, left unchanged
+        :param depth: depth of the search
+        :return: column where to place the piece and its score
+        """
+        return self.minimax(board, depth, -math.inf, math.inf, True, self._pruning)
+
+    def out_of_time(self):
+        """
+        Checked regularly during the search, which is interrupted (SearchTimeout) when it returns True.
 
-    def drop_piece(self, board, row, col, piece):
+        :return: True if the time budget of the move is spent
         """
-        Drop a piece in the board at the specified position
-        :param board: board with all the pieces that have been placed
-        :param col: one of the row of the board
+        return self._deadline is not None and time.perf_counter() >= self._deadline
+
+    def tt_key(self, board, maximizingPlayer):
+        """
+        :param board: BitBoard of the position
+        :param maximizingPlayer: whether the maximizing player is to move
+        :return: a tuple (key, mirrored): the key of the position in the transposition table,
+            from its canonical hash, and whether the moves of the table are mirrored
+        """
+        if self._symmetric:
+            key, mirrored = canonical_hash(board)
+        else:
+            key, mirrored = board.hash, False
+        return key ^ (MAXIMIZING_KEY if maximizingPlayer else 0), mirrored
+
+    def orient_move(self, move, mirrored):
+        """
+        Maps a move of the board to the canonical position, or back.
+
+        :param move: a column, or None
+        :param mirrored: whether the canonical position is the mirror image of the board
+        :return: the move in the other orientation
+        """
+        if move is None or not mirrored:
+            return move
+        return mirror_move(move, self._game.get_cols())
+
+    def order_moves(self, valid_locations, tt_move, ply):
+        """
+        Sorts the columns in the order they should be searched: the winning moves of the player to
+        move and the moves blocking the winning moves of the opponent (see ThreatMap), the best move
+        of the transposition table, the killer moves of the ply, and the other columns from the
+        centre to the sides.
+
+        :param valid_locations: columns that are not full
+        :param tt_move: best move stored in the transposition table for the board, or None
+        :param ply: number of moves played since the root of the search
+        :return: list of columns
+        """
+        # The player to move wins or must block with these columns.
+        player = self._game._turn if ply % 2 == 0 else -self._game._turn
+        first = (
+            self._threats.winning_moves(player)
+            + self._threats.winning_moves(-player)
+            + [tt_move]
+            + self._killers[ply]
+        )
+        moves = []
+        for col in first:
+            if col is not None and col in valid_locations and col not in moves:
+                moves.append(col)
+        for col in self._centre_order:
+            if col in valid_locations and col not in moves:
+                moves.append(col)
+        return moves
+
+    def drop_piece(self, board, col, piece):
+        """
+        Drop a piece in the board on the specified column
+        :param board: BitBoard with all the pieces that have been placed
         :param col: one of the column of the board
         :param piece: 1 or -1 depending on whose turn it is
         """
-        board[col][row] = piece
+        row = board.play(col, piece)
+        self._evaluator.add(col * board.stride + row, piece)
+        self._threats.add(col * board.stride + row, piece)
 
-    def get_next_open_row(self, board, col):
+    def undo_piece(self, board):
         """
-        Return the first row which does not have a piece in the specified column (col)
-        :param board: board with all the pieces that have been placed
-        :param col: one of the column of the board
-        :return: row number
+        Remove the last piece dropped in the board
+        :param board: BitBoard with all the pieces that have been placed
         """
-        for r in range(ROW_COUNT):
-            if board[col][r] == 0:
-                return r
+        col = board.history[-1]
+        row = board.heights[col] - 1
+        piece = board.cell(col, row)
+        board.undo()
+        self._evaluator.remove(col * board.stride + row, piece)
+        self._threats.remove(col * board.stride + row, piece)
 
     def winning_move(self, board, piece):
         """
         Check if the game has been won
-        :param board: board with all the pieces that have been placed
+        :param board: BitBoard with all the pieces that have been placed
         :param piece: 1 or -1 depending on whose turn it is
         """
-        # Check horizontal locations for win
-        for c in range(COLUMN_COUNT - 3):
-            for r in range(ROW_COUNT):
-                if (
-                    board[c][r] == piece
-                    and board[c + 1][r] == piece
-                    and board[c + 2][r] == piece
-                    and board[c + 3][r] == piece
-                ):
-                    return True
-
-        # Check vertical locations for win
-        for c in range(COLUMN_COUNT):
-            for r in range(ROW_COUNT - 3):
-                if (
-                    board[c][r] == piece
-                    and board[c][r + 1] == piece
-                    and board[c][r + 2] == piece
-                    and board[c][r + 3] == piece
-                ):
-                    return True
-
-        # Check positively sloped diaganols
-        for c in range(COLUMN_COUNT - 3):
-            for r in range(ROW_COUNT - 3):
-                if (
-                    board[c][r] == piece
-                    and board[c + 1][r + 1] == piece
-                    and board[c + 2][r + 2] == piece
-                    and board[c + 3][r + 3] == piece
-                ):
-                    return True
-
-        # Check negatively sloped diaganols
-        for c in range(COLUMN_COUNT - 3):
-            for r in range(3, ROW_COUNT):
-                if (
-                    board[c][r] == piece
-                    and board[c + 1][r - 1] == piece
-                    and board[c + 2][r - 2] == piece
-                    and board[c + 3][r - 3] == piece
-                ):
-                    return True
-        return False
+        return board.is_win(piece)
 
     def is_terminal_node(self, board):
         """
         Determines wheter the game is finished or not
-        :param board: board with all the pieces that have been placed
+        :param board: BitBoard with all the pieces that have been placed
         :return: boolean that determines wheter the game is finish or not
         """
         return (
@@ -111,71 +298,34 @@ class MiniMax(Bot):
         Evaluates the score of a portion of the board
         :param window: portion of the board with all the pieces that have been placed
         :param piece: 1 or -1 depending on whose turn it is
-        :return: score of the window
+        :return: score of the window (see evaluation.window_score)
         """
-        score = 0
-        opp_piece = self._game._turn * -1
-        if piece == self._game._turn * -1:
-            opp_piece = self._game._turn
-
-        if window.count(piece) == 4:
-            score += 100
-        elif window.count(piece) == 3 and window.count(EMPTY) == 1:
-            score += 5
-        elif window.count(piece) == 2 and window.count(EMPTY) == 2:
-            score += 2
-
-        if window.count(opp_piece) == 3 and window.count(EMPTY) == 1:
-            score -= 4
-
-        return score
+        return window_score(window.count(piece), window.count(-piece), len(window))
 
     def score_position(self, board, piece):
         """
         Main function that handles the scoring mechanism.
-        Handle the score for the minimax algorithm, the score is computed independently of which piece has just been dropped. This is a global score that looks at the whole board
-        :param board: board with all the pieces that have been placed
+        Handle the score for the minimax algorithm, the score is computed independently of which piece has just been dropped. This is a global score that looks at the whole board:
+        every horizontal, vertical and diagonal window of connect cells is scored and the pieces of the centre column get a bonus.
+        The search itself uses the incremental version of this score (see evaluation.Evaluator).
+        :param board: BitBoard with all the pieces that have been placed
         :param piece: 1 or -1 depending on whose turn it is
         :return: score of the board
         """
-
-        score = 0
-        # Score center column
-        center_array = [int(i) for i in list(board[COLUMN_COUNT // 2][:])]
-        center_count = center_array.count(piece)
-        score += center_count * 3
-
-        # Score Horizontal
-        for r in range(ROW_COUNT):
-            row_array = [int(i) for i in list(board[:][r])]
-            for c in range(COLUMN_COUNT - 3):
-                window = row_array[c : c + WINDOW_LENGTH]
-                score += self.evaluate_window(window, piece)
-
-        # Score Vertical
-        for c in range(COLUMN_COUNT):
-            col_array = [int(i) for i in list(board[c][:])]
-            for r in range(ROW_COUNT - 3):
-                window = col_array[r : r + WINDOW_LENGTH]
-                score += self.evaluate_window(window, piece)
-
-        # Score posiive sloped diagonal
-        for r in range(ROW_COUNT - 3):
-            for c in range(COLUMN_COUNT - 3):
-                window = [board[c + i][r + i] for i in range(WINDOW_LENGTH)]
-                score += self.evaluate_window(window, piece)
-
-        for r in range(ROW_COUNT - 3):
-            for c in range(COLUMN_COUNT - 3):
-                window = [board[c + i][r + 3 - i] for i in range(WINDOW_LENGTH)]
-                score += self.evaluate_window(window, piece)
-
-        return score
+        return score_masks(
+            board.masks[piece],
+            board.masks[-piece],
+            board.rows,
+            board.cols,
+            board.connect,
+        )
 
     def minimax(self, board, depth, alpha, beta, maximizingPlayer, pruning):
         """
         Main function of minimax, called whenever a move is needed.
         Recursive function, depth of the recursion being determined by the parameter depth.
+        :param board: BitBoard of the game, the moves searched are played on it and undone,
+            so it is left unchanged (the evaluator is set for it by search)
         :param depth: number of iterations the Minimax algorith will run for
             (the larger the depth the longer the algorithm takes)
         :alpha: used for the pruning, correspond to the lowest value of the range values of the node
@@ -184,11 +334,36 @@ class MiniMax(Bot):
         :pruning: boolean to specify if the algorithm uses the pruning
         :return: column where to place the piece
         """
+        self.nodes += 1
+        if self.nodes & (CLOCK_INTERVAL - 1) == 0 and self.out_of_time():
+            raise SearchTimeout()
+
         valid_locations = self.get_valid_locations(board)
         is_terminal = self.is_terminal_node(board)
 
+        tt = self._tt
+        tt_move = None
+        if tt is not None:
+            key, mirrored = self.tt_key(board, maximizingPlayer)
+            entry = tt.lookup(key)
+            if entry is not None:
+                tt_move = self.orient_move(entry.move, mirrored)
+            if entry is not None and entry.depth >= depth:
+                if entry.flag == EXACT:
+                    return tt_move, entry.value
+                if entry.flag == LOWER_BOUND:
+                    alpha = max(alpha, entry.value)
+                else:
+                    beta = min(beta, entry.value)
+                if alpha >= beta:
+                    return tt_move, entry.value
+            alpha_init, beta_init = alpha, beta
+
         if depth == 0:
-            return (None, self.score_position(board, self._game._turn))
+            value = self._evaluator.score(self._game._turn)
+            if tt is not None:
+                tt.store(key, depth, EXACT, value, None)
+            return (None, value)
         elif is_terminal:
             if self.winning_move(board, self._game._turn):
                 return (None, math.inf)
@@ -197,6 +372,8 @@ class MiniMax(Bot):
             else:  # Game is over, no more valid moves
                 return (None, 0)
 
+        ply = len(board.history) - self._root_ply
+        valid_locations = self.order_moves(valid_locations, tt_move, ply)
         column = valid_locations[0]
 
         if maximizingPlayer:
@@ -207,13 +384,12 @@ class MiniMax(Bot):
             turn = -1
 
         for col in valid_locations:
-            row = self.get_next_open_row(board, col)
-            b_copy = copy.deepcopy(board)
-
-            self.drop_piece(b_copy, row, col, self._game._turn * turn)
+            # The move is played on the board itself and undone after the search of the child.
+            self.drop_piece(board, col, self._game._turn * turn)
             new_score = self.minimax(
-                b_copy, depth - 1, alpha, beta, not maximizingPlayer, pruning
+                board, depth - 1, alpha, beta, not maximizingPlayer, pruning
             )[1]
+            self.undo_piece(board)
 
             if maximizingPlayer:
                 if new_score > value:
@@ -228,6 +404,20 @@ class MiniMax(Bot):
 
             if pruning:
                 if alpha >= beta:
+                    killers = self._killers[ply]
+                    if killers[0] != col:
+                        killers[1] = killers[0]
+                        killers[0] = col
                     break
 
+        if tt is not None:
+            # A value outside of the initial window is only a bound of the real value.
+            if value <= alpha_init:
+                flag = UPPER_BOUND
+            elif value >= beta_init:
+                flag = LOWER_BOUND
+            else:
+                flag = EXACT
+            tt.store(key, depth, flag, value, self.orient_move(column, mirrored))
+
         return column, value
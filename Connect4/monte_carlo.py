@@ -1,5 +1,8 @@
 from bot import Bot
+from canonical import canonical_moves
 from common import MONTE_CARLO
+from mcts_tree import NO_NODE, SearchTree
+from rollout import rollouts
 import random
 import math
 
@@ -13,98 +16,129 @@ class MonteCarlo(Bot):
     on an exploration parameter (also a parameter of the algorithm), and the best move
     can be decided based on that. The more iterations, the better the result, but the
     slower the execution.
+    The tree is stored in arrays (see SearchTree). It is kept from one move to the next:
+    the subtree of the board reached after the answer of the opponent becomes the new tree.
+    A symmetric board (its own mirror image, see canonical) only gets the children of one of
+    each pair of mirrored columns, their statistics would be the same.
     """
 
-    def __init__(self, game, iteration):
+    def __init__(self, game, iteration, reuse_tree=True):
+        """
+        :param reuse_tree: keep the statistics of the tree from one move to the next
+        """
         super().__init__(game, bot_type=MONTE_CARLO, iteration=iteration)
+        self._reuse_tree = reuse_tree
+        self.tree = SearchTree()
+
+    def set_root(self, state):
+        """
+        Makes the board of a state the root of the tree. The subtree of the board is
+        kept if the board was reached from the previous root, otherwise the tree is cleared.
+
+        :param state: game state of the new root
+        """
+        tree = self.tree
+        history = state._board.history
+        node = NO_NODE
+        if (
+            self._reuse_tree
+            and tree.history is not None
+            and history[: len(tree.history)] == tree.history
+        ):
+            node = 0
+            for col in history[len(tree.history) :]:
+                node = tree.child(node, col)
+                if node == NO_NODE:
+                    break
+        if node == NO_NODE:
+            tree.clear(history)
+        elif node != 0:
+            tree.reroot(node, history)
 
     def monte_carlo_tree_search(self, iterations, root, exploration_parameter):
         """
         Main function of MCTS, called whenever a move is needed.
+        The tree holds no game state: the moves leading to a node are played on the
+        state of the root in place during the selection, and undone at the end of each iteration.
 
         :param iterations: number of iterations the MCTS algorithm will run for
             (the more iterations the longer the algorithm takes)
-        :param root: root tree, starting point of the algorithm (board of the game
+        :param root: game state of the root, starting point of the algorithm (board of the game
             at the moment a move is wanted)
         :param exploration_parameter: factor used in the MCTS
 
         :return: column where to place the piece
         """
+        self.set_root(root)
+        state = root
         for i in range(iterations):
-            node, turn = self.selection(root, 1, exploration_parameter)
-            reward = self.simulation(node.state, turn)
+            node, turn, depth = self.selection(0, state, 1, exploration_parameter)
+            reward = self.simulation(state, turn)
             self.backpropagation(node, reward, turn)
+            for _ in range(depth):
+                state.undo_move()
 
-        ans = self.best_child(root, 0)
-        return ans.state.last_move[0]
+        ans = self.best_child(0, 0)
+        return int(self.tree.move[ans])
 
-    def selection(self, node, turn, exploration_parameter):
+    def selection(self, node, state, turn, exploration_parameter):
         """
         Expands the root node and takes the best child everytime until a winning state
         is reached. If a node is not fully explored, it is expanded and a child is returned.
         If it is fully explored, the best child of that node is taken.
 
-        :param node: starting node
+        :param node: index of the starting node
+        :param state: game state of the starting node, the moves of the selected nodes
+            are played on it
         :param turn: -1 or 1 according to which player plays next
         :param exploration_parameter: factor used for the MCTS algorithm
+        :return: the selected node, the turn and the number of moves played on state
         """
-        while not node.state.last_move or not node.state.check_win(
-            node.state.last_move
-        ):
-            if not node.fully_explored():
-                return self.expansion(node), -1 * turn
+        tree = self.tree
+        depth = 0
+        while not state.is_over():
+            if not tree.fully_explored(node):
+                return self.expansion(node, state), -1 * turn, depth + 1
             else:
                 node = self.best_child(node, exploration_parameter)
+                state.apply_move(int(tree.move[node]))
+                depth += 1
                 turn *= -1
 
-        return node, turn
+        return node, turn, depth
 
-    def expansion(self, node):
+    def expansion(self, node, state):
         """
-        Add a child state to the node. Concretely, plays a move and adds
-        it to the board of a newly created state, which is the child of the
-        current node.
+        Add a child state to the node. Concretely, plays a move on the state,
+        and adds a new child, corresponding to that move, to the current node.
+        The mirrored columns of a symmetric board are only added once.
 
-        :param node: current node to expand
-        :return: a newly created child of the current node
+        :param node: index of the current node to expand
+        :param state: game state of the current node, the move is played on it
+        :return: index of a newly created child of the current node
         """
-        free_cols = node.state.get_valid_locations()
-
-        for col in free_cols:
-            if col not in node.children_moves:
-                new_state = node.state.copy_state()
-                new_state.place(col)
-                break
-
-        node.add_child(new_state, col)
-        return node.children[-1]
-
-    def simulation(self, state_init, turn):
+        tree = self.tree
+        if not tree.is_expanded(node):
+            tree.reserve_children(
+                node, canonical_moves(state._board, state.get_valid_locations())
+            )
+        state.apply_move(tree.next_move(node))
+        return tree.add_child(node)
+
+    def simulation(self, state, turn):
         """
         Simulates random moves until the game is won by someone and returns a reward.
         Until a winning (or losing) situation is obtained, random moves are performed.
-        The reward is then simply 1 in case the winner is the actual player, and -1 otherwise.
+        The reward is then simply 1 in case the winner is the actual player, -1 otherwise,
+        and 0 if the board is filled without a winner. The random moves are played on a copy of the masks of the board (see rollout),
+        so the state is left unchanged.
 
-        :param state_init: current state from which we should end up finding a winning situation
+        :param state: current state from which we should end up finding a winning situation
         :param turn: 1 or -1 depending on whose turn it is
 
         :return: a reward
         """
-        state = state_init.copy_state()
-        while not state.last_move or not state.check_win(state.last_move):
-            free_cols = state.get_valid_locations()
-            col = random.choice(free_cols)
-            state.place(col)
-            turn *= -1
-
-        reward_bool = state.check_win(state.last_move)
-        if reward_bool and turn == -1:
-            reward = 1
-        elif reward_bool and turn == 1:
-            reward = -1
-        else:
-            reward = 0
-        return reward
+        return rollouts([state._board], [state._turn], [turn])[0]
 
     def backpropagation(self, node, reward, turn):
         """
@@ -113,15 +147,15 @@ class MonteCarlo(Bot):
         into account the fact a winning move from the current player should be
         encouraged, but a winning move from the opponent should be discouraged.
 
-        :param node: current node from which we start the backtracking
+        :param node: index of the node from which we start the backtracking
         :param reward: reward corresponding to that particular node
         :param turn: 1 or -1 depending on whose turn it is
         """
-        while node != None:
-            node.visits += 1
-            node.reward -= turn * reward
-            # node.reward += reward
-            node = node.parent
+        tree = self.tree
+        while node != NO_NODE:
+            tree.visits[node] += 1
+            tree.reward[node] -= turn * reward
+            node = tree.parent[node]
             turn *= -1
         return
 
@@ -131,19 +165,26 @@ class MonteCarlo(Bot):
         Cesa-Bianchi and Fischer. This formula combines a term of exploration and
         a term of exploitation.
 
-        :param node: node from which we want to find the best child
+        :param node: index of the node from which we want to find the best child
         :param factor: exploration parameter
+        :return: index of the best child
         """
+        tree = self.tree
+        children = tree.children(node)
+        # The children are contiguous, their statistics are read at once.
+        visits = tree.visits[children.start : children.stop].tolist()
+        rewards = tree.reward[children.start : children.stop].tolist()
+        log_visits = math.log2(tree.visits[node])
         best_score = -float("inf")
         best_children = []
-        for c in node.children:
-            exploitation = c.reward / c.visits
-            exploration = math.sqrt(math.log2(node.visits) / c.visits)
+        for i in range(len(visits)):
+            exploitation = rewards[i] / visits[i]
+            exploration = math.sqrt(log_visits / visits[i])
             score = exploitation + exploration_parameter * exploration
             if score == best_score:
-                best_children.append(c)
+                best_children.append(i)
             elif score > best_score:
-                best_children = [c]
+                best_children = [i]
                 best_score = score
         res = random.choice(best_children)
-        return res
+        return children.start + res
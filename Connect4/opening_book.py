@@ -0,0 +1,357 @@
+"""
+opening-book: generate the opening book of the Connect 4 bots.
+
+The book gives the move to play in the positions of the first plies of a game, found by
+a deep MiniMax search, so that the bots play the opening instantly and better than with
+their own search (see Bot.make_move).
+
+The book is selective: for each colour, the positions where this colour is to move only
+lead to the move of the book, while every answer of the opponent is followed. It covers
+every game where a bot follows the book, whatever its opponent plays, with about 7 ** (plies / 2)
+positions per colour instead of the 7 ** plies positions of all the games.
+
+A position is identified by its canonical key (see canonical): a board and its mirror image
+(columns from right to left) share one entry, the move being mirrored when the board is.
+The positions of each ply are searched in parallel, in a pool of processes.
+
+The book file holds a header (BOOK_MAGIC, version, rows, columns, number of discs to align,
+number of positions), then the sorted keys (unsigned integers of key_size bytes, enough for
+the (rows + 1) * columns bits of a key), the moves (8-bit integers) and the values (16-bit
+integers, for the player to move), all little endian.
+
+Usage:
+    python opening_book.py --plies 8 --depth 8
+    python opening_book.py --plies 10 --depth 9 --processes 8 -o books/connect4_6x7.book
+    python opening_book.py --rows 8 --cols 9 --connect 5 --plies 6 --depth 6
+"""
+import argparse
+import bisect
+import multiprocessing
+from functools import lru_cache
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+from bitboard import BitBoard
+from canonical import canonical_key, mirror_move
+from common import DEFAULT_COLS, DEFAULT_CONNECT, DEFAULT_ROWS
+from minimax import MiniMax
+from parallel_minimax import SearchGame
+
+BOOK_MAGIC = b"C4OB"
+BOOK_VERSION = 2
+HEADER = struct.Struct("<4sBBBBI")
+# Values of the won and lost positions, the other values are the scores of MiniMax.
+BOOK_WIN = 32767
+DEFAULT_PLIES = 8
+DEFAULT_DEPTH = 8
+BOOK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "books")
+
+# MiniMax of the worker processes, created at their first task.
+_searcher = None
+
+
+def book_path(rows=DEFAULT_ROWS, cols=DEFAULT_COLS, connect=DEFAULT_CONNECT):
+    """
+    :return: default path of the book of a board geometry
+    """
+    return os.path.join(BOOK_DIR, "connect{}_{}x{}.book".format(connect, rows, cols))
+
+
+def key_size(rows, cols):
+    """
+    :return: number of bytes of the keys of the positions of a board size in a book file
+    """
+    return ((rows + 1) * cols + 7) // 8
+
+
+@lru_cache(maxsize=None)
+def load_book(path):
+    """
+    Loads a book file once per process.
+
+    :param path: path of the book file
+    :return: the OpeningBook
+    """
+    return OpeningBook.load(path)
+
+
+class OpeningBook:
+    """
+    Moves and values of the positions of the opening, see the documentation of the module.
+    """
+
+    def __init__(
+        self,
+        keys,
+        moves,
+        values,
+        rows=DEFAULT_ROWS,
+        cols=DEFAULT_COLS,
+        connect=DEFAULT_CONNECT,
+    ):
+        """
+        :param keys: canonical keys of the positions (see canonical.canonical_key)
+        :param moves: moves of the positions, in the orientation of their key
+        :param values: values of the positions, for the player to move
+        :param rows: number of rows of the board
+        :param cols: number of columns of the board
+        :param connect: number of discs to align
+        """
+        # The keys of the large boards do not fit in 64 bits, they are kept as integers.
+        order = sorted(range(len(keys)), key=lambda i: keys[i])
+        self.keys = [int(keys[i]) for i in order]
+        self.moves = np.asarray(moves, dtype=np.int8)[order]
+        self.values = np.asarray(values, dtype=np.int16)[order]
+        self.rows = rows
+        self.cols = cols
+        self.connect = connect
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def load(cls, path):
+        """
+        :param path: path of a book file
+        :return: the OpeningBook
+        """
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version, rows, cols, connect, count = HEADER.unpack_from(data)
+        if magic != BOOK_MAGIC or version != BOOK_VERSION:
+            raise ValueError("{} is not an opening book".format(path))
+        offset = HEADER.size
+        size = key_size(rows, cols)
+        keys = [
+            int.from_bytes(data[offset + i * size : offset + (i + 1) * size], "little")
+            for i in range(count)
+        ]
+        offset += size * count
+        moves = np.frombuffer(data, dtype="i1", count=count, offset=offset)
+        offset += count
+        values = np.frombuffer(data, dtype="<i2", count=count, offset=offset)
+        return cls(keys, moves, values, rows, cols, connect)
+
+    def save(self, path):
+        """
+        :param path: path of the book file to write
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(
+                HEADER.pack(
+                    BOOK_MAGIC,
+                    BOOK_VERSION,
+                    self.rows,
+                    self.cols,
+                    self.connect,
+                    len(self),
+                )
+            )
+            size = key_size(self.rows, self.cols)
+            f.write(b"".join(key.to_bytes(size, "little") for key in self.keys))
+            f.write(self.moves.astype("i1").tobytes())
+            f.write(self.values.astype("<i2").tobytes())
+
+    def lookup(self, board, player):
+        """
+        :param board: BitBoard of the game
+        :param player: player to move, 1 or -1
+        :return: a tuple (column, value) for the player to move, None if the position is not
+            in the book
+        """
+        if (board.rows, board.cols, board.connect) != (self.rows, self.cols, self.connect):
+            return None
+        key, mirrored = canonical_key(board, player)
+        i = bisect.bisect_left(self.keys, key)
+        if i == len(self.keys) or self.keys[i] != key:
+            return None
+        move = int(self.moves[i])
+        if mirrored:
+            move = mirror_move(move, self.cols)
+        return move, int(self.values[i])
+
+
+def replay(moves, rows, cols, connect=DEFAULT_CONNECT):
+    """
+    :param moves: columns played from the empty board, player 1 moving first
+    :return: a tuple (board, player to move)
+    """
+    board = BitBoard(rows, cols, connect)
+    player = 1
+    for col in moves:
+        board.play(col, player)
+        player = -player
+    return board, player
+
+
+def search_position(task):
+    """
+    Searches a position of the book, run in a worker process.
+
+    :param task: a tuple (moves, depth, rows, cols, connect): the columns played to get the
+        position from the empty board, the depth of the search and the geometry of the board
+    :return: a tuple (column, value) for the player to move
+    """
+    global _searcher
+    moves, depth, rows, cols, connect = task
+    if _searcher is None or (
+        _searcher._game.get_rows(),
+        _searcher._game.get_cols(),
+        _searcher._game.get_connect(),
+    ) != (rows, cols, connect):
+        _searcher = MiniMax(SearchGame(rows, cols, connect), depth)
+    _searcher._depth = depth
+    board, player = replay(moves, rows, cols, connect)
+    _searcher._game._turn = player
+    _searcher._tt.new_search()
+    column, value = _searcher.search(board)
+    return column, int(max(-BOOK_WIN, min(BOOK_WIN, value)))
+
+
+def generate(
+    plies=DEFAULT_PLIES,
+    depth=DEFAULT_DEPTH,
+    rows=DEFAULT_ROWS,
+    cols=DEFAULT_COLS,
+    connect=DEFAULT_CONNECT,
+    processes=None,
+    progress=None,
+):
+    """
+    Generates a book, see the documentation of the module.
+
+    :param plies: the positions with less than plies discs are in the book
+    :param depth: depth of the MiniMax search of each position
+    :param rows: number of rows of the board
+    :param cols: number of columns of the board
+    :param connect: number of discs to align
+    :param processes: number of worker processes (default the number of CPUs)
+    :param progress: optional function called with the ply and the number of positions
+        in the book, after each ply
+    :return: the OpeningBook
+    """
+    keys, moves, values = [], [], []
+    # Positions of the ply: canonical key -> (columns played, colours following the book).
+    # The colours are 1 for the player who moves first and -1 for the other one.
+    frontier = {canonical_key(BitBoard(rows, cols, connect), 1)[0]: ((), {1, -1})}
+    with multiprocessing.Pool(processes) as pool:
+        for ply in range(plies):
+            mover = 1 if ply % 2 == 0 else -1
+            positions = [
+                (history, colours)
+                for history, colours in frontier.values()
+                if not _is_over(history, rows, cols, connect)
+            ]
+            tasks = [(history, depth, rows, cols, connect) for history, _ in positions]
+            results = pool.map(search_position, tasks, chunksize=max(1, len(tasks) // 64))
+            next_frontier = {}
+            for (history, colours), (column, value) in zip(positions, results):
+                board, player = replay(history, rows, cols, connect)
+                key, mirrored = canonical_key(board, player)
+                keys.append(key)
+                moves.append(mirror_move(column, cols) if mirrored else column)
+                values.append(value)
+                for col in board.valid_moves():
+                    # The colour to move only plays the move of the book, its opponent plays anything.
+                    followed = {c for c in colours if c != mover or col == column}
+                    if not followed:
+                        continue
+                    board.play(col, player)
+                    child_key = canonical_key(board, -player)[0]
+                    board.undo()
+                    if child_key in next_frontier:
+                        next_frontier[child_key][1].update(followed)
+                    else:
+                        next_frontier[child_key] = (history + (col,), set(followed))
+            frontier = next_frontier
+            if progress is not None:
+                progress(ply, len(keys))
+    return OpeningBook(keys, moves, values, rows, cols, connect)
+
+
+def _is_over(history, rows, cols, connect):
+    board, player = replay(history, rows, cols, connect)
+    return board.is_win(-player) or board.is_full()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="opening-book", description="Generate the opening book of the Connect 4 bots."
+    )
+    parser.add_argument(
+        "-o", "--output", default=None, help="Book file (default books/connect<connect>_<rows>x<cols>.book).",
+    )
+    parser.add_argument(
+        "--rows",
+        type=int,
+        default=DEFAULT_ROWS,
+        help="Number of rows of the board (default {}).".format(DEFAULT_ROWS),
+    )
+    parser.add_argument(
+        "--cols",
+        type=int,
+        default=DEFAULT_COLS,
+        help="Number of columns of the board (default {}).".format(DEFAULT_COLS),
+    )
+    parser.add_argument(
+        "--connect",
+        type=int,
+        default=DEFAULT_CONNECT,
+        help="Number of discs to align (default {}).".format(DEFAULT_CONNECT),
+    )
+    parser.add_argument(
+        "-p",
+        "--plies",
+        type=int,
+        default=DEFAULT_PLIES,
+        help="Number of plies of the book (default {}).".format(DEFAULT_PLIES),
+    )
+    parser.add_argument(
+        "-d",
+        "--depth",
+        type=int,
+        default=DEFAULT_DEPTH,
+        help="Depth of the search of each position (default {}).".format(DEFAULT_DEPTH),
+    )
+    parser.add_argument(
+        "-j",
+        "--processes",
+        type=int,
+        default=None,
+        help="Number of processes (default the number of CPUs).",
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+
+    def progress(ply, size):
+        print(
+            "ply {:>2}: {:>7} positions, {:.1f}s".format(
+                ply, size, time.perf_counter() - start
+            ),
+            file=sys.stderr,
+        )
+
+    book = generate(
+        args.plies,
+        args.depth,
+        args.rows,
+        args.cols,
+        args.connect,
+        processes=args.processes,
+        progress=progress,
+    )
+    path = args.output or book_path(args.rows, args.cols, args.connect)
+    book.save(path)
+    print("{} positions written to {}".format(len(book), path), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+Parallel versions of the Monte Carlo Tree Search, the iterations being spread over a pool of processes.
+
+Two modes are available (see ParallelMonteCarlo):
+
+- root parallelism (ROOT_PARALLEL): every worker process grows its own tree from the
+  board of the game, with its own random generator. The statistics of the children of
+  the roots are then added up and the move with the best mean reward is played.
+- tree parallelism (TREE_PARALLEL): the bot grows a single tree, selecting a batch of
+  leaves before simulating them. A virtual loss is given to the nodes of each selected
+  path, so that the next selections of the batch try other paths. The random games of
+  the batch are then played by the workers, and the virtual losses are replaced by the
+  real rewards during the backpropagation.
+"""
+import multiprocessing
+import os
+import random
+
+from monte_carlo import MonteCarlo
+from mcts_tree import NO_NODE
+from rollout import rollouts
+
+ROOT_PARALLEL = "root"
+TREE_PARALLEL = "tree"
+PARALLEL_MODES = (ROOT_PARALLEL, TREE_PARALLEL)
+
+# Number of leaves selected by each worker before the random games are played (tree parallelism).
+LEAVES_PER_WORKER = 8
+# Reward and visit given to the nodes of a selected path until its random game is played.
+VIRTUAL_LOSS = 1
+
+# State of the worker processes, set by init_worker.
+_bot = None
+_state = None
+
+
+def init_worker(rows, cols, connect):
+    """
+    Initialise a worker process.
+
+    :param rows: number of rows of the board
+    :param cols: number of columns of the board
+    :param connect: number of discs to align
+    """
+    global _bot, _state
+    # Imported here, connect4game imports this module to create the bots.
+    from common import RANDOM
+    from connect4game import Connect4Game
+
+    _state = Connect4Game(RANDOM, RANDOM, rows=rows, cols=cols, connect=connect)
+    _bot = MonteCarlo(_state, iteration=None)
+
+
+def grow_tree(task):
+    """
+    Grows a tree from a board, run in a worker process (root parallelism).
+
+    :param task: a tuple (board, player, iterations, exploration_parameter, seed): the board
+        of the game, the player to move, the number of iterations, the exploration parameter
+        and the seed of the random generator of the worker
+    :return: list of (move, visits, reward) of the children of the root
+    """
+    board, player, iterations, exploration_parameter, seed = task
+    random.seed(seed)
+    _state._board = board
+    _state._turn = player
+    _bot.monte_carlo_tree_search(iterations, _state, exploration_parameter)
+    tree = _bot.tree
+    return [
+        (int(tree.move[child]), int(tree.visits[child]), float(tree.reward[child]))
+        for child in tree.children(0)
+    ]
+
+
+def play_out(task):
+    """
+    Plays the random games of a batch of leaves, run in a worker process (tree parallelism).
+
+    :param task: a tuple (leaves, seed): the list of (board, player, turn) of the leaves, the
+        player to move and its turn relative to the root, and the seed of the random generator
+    :return: list of the rewards of the leaves (see rollout.rollouts)
+    """
+    leaves, seed = task
+    boards, players, turns = zip(*leaves)
+    return rollouts(boards, players, turns, random.Random(seed))
+
+
+class ParallelMonteCarlo(MonteCarlo):
+    """
+    Monte Carlo Tree Search bot using a pool of worker processes, in one of the
+    PARALLEL_MODES (see the documentation of the module). The pool is started at the
+    first move and kept until close is called.
+    """
+
+    def __init__(self, game, iteration, mode=ROOT_PARALLEL, workers=None):
+        """
+        :param iteration: number of iterations of a move, for each worker with root
+            parallelism and in total with tree parallelism
+        :param mode: ROOT_PARALLEL or TREE_PARALLEL
+        :param workers: number of worker processes (default the number of CPUs)
+        """
+        if mode not in PARALLEL_MODES:
+            raise ValueError(
+                f"Unknown parallel mode {mode}, expected one of {PARALLEL_MODES}"
+            )
+        # Each worker keeps its own tree with root parallelism.
+        super().__init__(game, iteration, reuse_tree=mode == TREE_PARALLEL)
+        self._mode = mode
+        self._workers = max(1, workers or os.cpu_count() or 1)
+        self._pool = None
+
+    def pool(self):
+        """
+        :return: the pool of the worker processes, started at the first call
+        """
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(
+                self._workers,
+                initializer=init_worker,
+                initargs=(
+                    self._game.get_rows(),
+                    self._game.get_cols(),
+                    self._game.get_connect(),
+                ),
+            )
+        return self._pool
+
+    def close(self):
+        """
+        Stops the worker processes.
+        """
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def monte_carlo_tree_search(self, iterations, root, exploration_parameter):
+        if self._mode == ROOT_PARALLEL:
+            return self.root_parallel_search(iterations, root, exploration_parameter)
+        return self.tree_parallel_search(iterations, root, exploration_parameter)
+
+    def root_parallel_search(self, iterations, root, exploration_parameter):
+        """
+        Grows one tree per worker and plays the move with the best mean reward over all the trees.
+
+        :param iterations: number of iterations of each tree
+        :param root: game state of the root
+        :param exploration_parameter: factor used in the MCTS
+        :return: column where to place the piece
+        """
+        tasks = [
+            (
+                root._board,
+                root._turn,
+                iterations,
+                exploration_parameter,
+                random.getrandbits(32),
+            )
+            for _ in range(self._workers)
+        ]
+        visits = {}
+        rewards = {}
+        for children in self.pool().map(grow_tree, tasks):
+            for move, nb_visits, reward in children:
+                visits[move] = visits.get(move, 0) + nb_visits
+                rewards[move] = rewards.get(move, 0.0) + reward
+        best_score = -float("inf")
+        best_moves = []
+        for move in sorted(visits):
+            score = rewards[move] / visits[move]
+            if score == best_score:
+                best_moves.append(move)
+            elif score > best_score:
+                best_moves = [move]
+                best_score = score
+        return random.choice(best_moves)
+
+    def tree_parallel_search(self, iterations, root, exploration_parameter):
+        """
+        Grows the tree of the bot by batches of leaves, whose random games are played by the workers.
+
+        :param iterations: number of iterations
+        :param root: game state of the root
+        :param exploration_parameter: factor used in the MCTS
+        :return: column where to place the piece
+        """
+        self.set_root(root)
+        state = root
+        batch_size = self._workers * LEAVES_PER_WORKER
+        done = 0
+        while done < iterations:
+            batch = min(batch_size, iterations - done)
+            selected = []
+            leaves = []
+            for _ in range(batch):
+                node, turn, depth = self.selection(0, state, 1, exploration_parameter)
+                if state.is_over():
+                    # Nothing to simulate, the reward is known.
+                    selected.append((node, turn, self.simulation(state, turn)))
+                else:
+                    selected.append((node, turn, None))
+                    leaves.append((state._board.copy(), state._turn, turn))
+                self.add_virtual_loss(node)
+                for _ in range(depth):
+                    state.undo_move()
+
+            # One task per worker, the rewards come back in the order of the leaves.
+            size = -(-len(leaves) // self._workers)
+            tasks = [
+                (leaves[i : i + size], random.getrandbits(32))
+                for i in range(0, len(leaves), size or 1)
+            ]
+            rewards = iter(
+                reward
+                for shard_rewards in self.pool().map(play_out, tasks)
+                for reward in shard_rewards
+            )
+
+            for node, turn, reward in selected:
+                self.remove_virtual_loss(node)
+                if reward is None:
+                    reward = next(rewards)
+                self.backpropagation(node, reward, turn)
+            done += batch
+
+        ans = self.best_child(0, 0)
+        return int(self.tree.move[ans])
+
+    def add_virtual_loss(self, node):
+        """
+        Counts a lost visit for the node and its ancestors, until the real reward is known.
+
+        :param node: index of the selected leaf
+        """
+        tree = self.tree
+        while node != NO_NODE:
+            tree.visits[node] += VIRTUAL_LOSS
+            tree.reward[node] -= VIRTUAL_LOSS
+            node = tree.parent[node]
+
+    def remove_virtual_loss(self, node):
+        """
+        Cancels add_virtual_loss.
+
+        :param node: index of the selected leaf
+        """
+        tree = self.tree
+        while node != NO_NODE:
+            tree.visits[node] -= VIRTUAL_LOSS
+            tree.reward[node] += VIRTUAL_LOSS
+            node = tree.parent[node]
@@ -0,0 +1,366 @@
+"""
+Parallel versions of the MiniMax search, the boards being searched by a pool of processes.
+
+Two modes are available (see ParallelMiniMax):
+
+- root split (ROOT_SPLIT): the first move of the root, the most promising one according
+  to the move ordering, is searched by the bot itself. The other moves are then shared
+  among the worker processes. The best score found so far (the alpha of the root) is
+  kept in shared memory and every worker reads it at each node, so the best move found
+  by one worker prunes the searches of the others.
+- Lazy SMP (LAZY_SMP): the workers search the same root as the bot at the same time,
+  one ply deeper or with the columns in another order, with no other synchronisation
+  than a transposition table in shared memory. The bot then finds in the table the
+  boards already searched by the workers, and plays the move of its own search.
+"""
+import math
+import multiprocessing
+import os
+import random
+import time
+
+from common import DEFAULT_CONNECT
+from minimax import MiniMax, SearchTimeout
+from solver import DEFAULT_THRESHOLD
+from transposition import (
+    DEFAULT_SIZE,
+    EXACT,
+    SharedTranspositionTable,
+    TranspositionTable,
+)
+
+ROOT_SPLIT = "root"
+LAZY_SMP = "lazy_smp"
+PARALLEL_MODES = (ROOT_SPLIT, LAZY_SMP)
+
+# State of the worker processes, set by init_worker.
+_searcher = None
+_alpha = None
+_alpha_lock = None
+
+
+class SearchGame:
+    """
+    The part of Connect4Game used by MiniMax, for the worker processes.
+    """
+
+    def __init__(self, rows, cols, connect=DEFAULT_CONNECT):
+        self._rows = rows
+        self._cols = cols
+        self._connect = connect
+        # Player of the root of the search, set for each task.
+        self._turn = 1
+
+    def get_rows(self):
+        return self._rows
+
+    def get_cols(self):
+        return self._cols
+
+    def get_connect(self):
+        return self._connect
+
+
+class WorkerMiniMax(MiniMax):
+    """
+    MiniMax search of a worker process. Its search is interrupted when the bot sets the
+    stop flag, and in a root split its alpha is raised to the alpha shared by the workers.
+    """
+
+    def __init__(self, game, tt, alpha=None, stop=None):
+        """
+        :param game: SearchGame giving the size of the board
+        :param tt: transposition table of the worker (None for no table)
+        :param alpha: shared value of the alpha of the root (root split only)
+        :param stop: shared flag set by the bot to interrupt the search (Lazy SMP only)
+        """
+        super().__init__(game, depth=None, tt_size=None)
+        self._tt = tt
+        self._shared_alpha = alpha
+        self._stop = stop
+
+    def out_of_time(self):
+        return super().out_of_time() or (
+            self._stop is not None and self._stop.value != 0
+        )
+
+    def minimax(self, board, depth, alpha, beta, maximizingPlayer, pruning):
+        # The scores are given for the player of the root, whatever the depth, so the
+        # best score already found at the root is a lower bound for every node.
+        if self._shared_alpha is not None and self._shared_alpha.value > alpha:
+            alpha = self._shared_alpha.value
+        return super().minimax(board, depth, alpha, beta, maximizingPlayer, pruning)
+
+
+def init_worker(mode, rows, cols, connect, pruning, tt_size, shared):
+    """
+    Initialise a worker process.
+
+    :param mode: ROOT_SPLIT or LAZY_SMP
+    :param rows: number of rows of the board
+    :param cols: number of columns of the board
+    :param connect: number of discs to align
+    :param pruning: whether the search uses the alpha beta pruning
+    :param tt_size: size of the transposition table of the worker (root split only)
+    :param shared: the objects shared with the bot, a tuple (alpha, alpha lock) for a root
+        split and (slots of the transposition table, stop flag) for Lazy SMP
+    """
+    global _searcher, _alpha, _alpha_lock
+    game = SearchGame(rows, cols, connect)
+    if mode == ROOT_SPLIT:
+        _alpha, _alpha_lock = shared
+        tt = TranspositionTable(tt_size) if pruning and tt_size else None
+        _searcher = WorkerMiniMax(game, tt, alpha=_alpha)
+    else:
+        slots, stop = shared
+        tt = None
+        if slots is not None:
+            tt = SharedTranspositionTable(len(slots) // 2, slots)
+        _searcher = WorkerMiniMax(game, tt, stop=stop)
+
+
+def search_move(task):
+    """
+    Searches one move of the root, run in a worker process (root split).
+
+    :param task: a tuple (board, turn, col, depth, pruning, generation, time_left): the root
+        board, its player to move, the column to search, the depth of the root search,
+        whether to prune, the generation of the transposition table and the time left
+        for the search (None for no limit)
+    :return: a tuple (col, value, raised), value being None if the time was up and raised
+        True if the move raised the shared alpha (its value is then exact)
+    """
+    board, turn, col, depth, pruning, generation, time_left = task
+    searcher = _searcher
+    searcher._game._turn = turn
+    if searcher._tt is not None:
+        searcher._tt.set_generation(generation)
+    searcher.prepare(board)
+    if time_left is not None:
+        searcher._deadline = time.perf_counter() + time_left
+    searcher.drop_piece(board, col, turn)
+    try:
+        value = searcher.minimax(
+            board, depth - 1, -math.inf, math.inf, False, pruning
+        )[1]
+    except SearchTimeout:
+        return col, None, False
+    finally:
+        searcher._deadline = None
+    raised = False
+    with _alpha_lock:
+        if value > _alpha.value:
+            _alpha.value = value
+            raised = True
+    return col, value, raised
+
+
+def search_helper(task):
+    """
+    Searches the root alongside the bot until it is stopped, run in a worker process (Lazy SMP).
+
+    :param task: a tuple (board, turn, depth, pruning, generation, shuffle): the root board,
+        its player to move, the depth of the search, whether to prune, the generation of the
+        transposition table and the seed used to shuffle the columns (None to keep the
+        order of the bot)
+    :return: the number of nodes searched
+    """
+    board, turn, depth, pruning, generation, shuffle = task
+    searcher = _searcher
+    searcher._game._turn = turn
+    if searcher._tt is not None:
+        searcher._tt.set_generation(generation)
+    searcher.prepare(board)
+    centre_order = searcher._centre_order
+    if shuffle is not None:
+        searcher._centre_order = list(centre_order)
+        random.Random(shuffle).shuffle(searcher._centre_order)
+    try:
+        searcher.minimax(board, depth, -math.inf, math.inf, True, pruning)
+    except SearchTimeout:
+        pass
+    finally:
+        searcher._centre_order = centre_order
+    return searcher.nodes
+
+
+class ParallelMiniMax(MiniMax):
+    """
+    MiniMax bot searching with a pool of worker processes, in one of the PARALLEL_MODES
+    (see the documentation of the module). The pool is started at the first move and kept
+    until close is called. Both modes work at a fixed depth and with a time limit: the
+    workers of a root split are then given the time left, those of Lazy SMP are stopped
+    with the search of the bot.
+    """
+
+    def __init__(
+        self,
+        game,
+        depth,
+        pruning=True,
+        tt_size=DEFAULT_SIZE,
+        time_limit=None,
+        mode=ROOT_SPLIT,
+        workers=None,
+        solve_threshold=DEFAULT_THRESHOLD,
+    ):
+        """
+        :param mode: ROOT_SPLIT or LAZY_SMP
+        :param workers: number of worker processes (default the number of CPUs, minus
+            one for the bot itself in Lazy SMP)
+        """
+        if mode not in PARALLEL_MODES:
+            raise ValueError(
+                f"Unknown parallel mode {mode}, expected one of {PARALLEL_MODES}"
+            )
+        super().__init__(
+            game,
+            depth,
+            pruning=pruning,
+            tt_size=tt_size,
+            time_limit=time_limit,
+            solve_threshold=solve_threshold,
+        )
+        self._mode = mode
+        if workers is None:
+            cpus = os.cpu_count() or 1
+            workers = cpus if mode == ROOT_SPLIT else cpus - 1
+        self._workers = max(1, workers)
+        self._tt_size = tt_size
+        self._pool = None
+        if mode == ROOT_SPLIT:
+            self._shared = (
+                multiprocessing.RawValue("d", -math.inf),
+                multiprocessing.Lock(),
+            )
+        else:
+            if self._tt is not None:
+                self._tt = SharedTranspositionTable(tt_size)
+            slots = None if self._tt is None else self._tt.shared_slots
+            self._shared = (slots, multiprocessing.RawValue("b", 0))
+
+    def pool(self):
+        """
+        :return: the pool of the worker processes, started at the first call
+        """
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(
+                self._workers,
+                initializer=init_worker,
+                initargs=(
+                    self._mode,
+                    self._game.get_rows(),
+                    self._game.get_cols(),
+                    self._game.get_connect(),
+                    self._pruning,
+                    self._tt_size,
+                    self._shared,
+                ),
+            )
+        return self._pool
+
+    def close(self):
+        """
+        Stops the worker processes.
+        """
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def time_left(self):
+        """
+        :return: the time left for the search in seconds, None if it is not limited
+        """
+        if self._deadline is None:
+            return None
+        return max(0.0, self._deadline - time.perf_counter())
+
+    def search_root(self, board, depth):
+        if self._mode == ROOT_SPLIT:
+            return self.split_root(board, depth)
+        return self.lazy_smp(board, depth)
+
+    def split_root(self, board, depth):
+        """
+        Searches the first move of the root, then the other ones in the worker processes.
+
+        :param board: BitBoard of the game, left unchanged
+        :param depth: depth of the search
+        :return: column where to place the piece and its score
+        """
+        valid_locations = self.get_valid_locations(board)
+        if depth == 0 or valid_locations is None or self.is_terminal_node(board):
+            return super().search_root(board, depth)
+
+        key, mirrored = self.tt_key(board, True)
+        tt_move = None
+        if self._tt is not None:
+            entry = self._tt.lookup(key)
+            if entry is not None:
+                tt_move = self.orient_move(entry.move, mirrored)
+        moves = self.order_moves(valid_locations, tt_move, 0)
+        turn = self._game._turn
+
+        self.drop_piece(board, moves[0], turn)
+        try:
+            value = self.minimax(
+                board, depth - 1, -math.inf, math.inf, False, self._pruning
+            )[1]
+        finally:
+            self.undo_piece(board)
+        column = moves[0]
+
+        if len(moves) > 1 and value != math.inf:
+            alpha, _ = self._shared
+            alpha.value = value
+            generation = 0 if self._tt is None else self._tt._generation
+            tasks = [
+                (board, turn, col, depth, self._pruning, generation, self.time_left())
+                for col in moves[1:]
+            ]
+            for col, new_score, raised in self.pool().map(search_move, tasks):
+                if new_score is None:
+                    raise SearchTimeout()
+                # Only a move that raised the shared alpha has an exact value, the others
+                # were cut off by it.
+                if raised and new_score > value:
+                    value = new_score
+                    column = col
+
+        if self._tt is not None:
+            self._tt.store(key, depth, EXACT, value, self.orient_move(column, mirrored))
+        return column, value
+
+    def lazy_smp(self, board, depth):
+        """
+        Searches the root with the worker processes searching it at the same time.
+
+        :param board: BitBoard of the game, left unchanged
+        :param depth: depth of the search
+        :return: column where to place the piece and its score
+        """
+        _, stop = self._shared
+        stop.value = 0
+        generation = 0 if self._tt is None else self._tt._generation
+        turn = self._game._turn
+        # Half the workers search one ply deeper, the others shuffle the columns.
+        tasks = [
+            (
+                board,
+                turn,
+                depth + 1 if i % 2 == 0 else depth,
+                self._pruning,
+                generation,
+                None if i % 2 == 0 else generation * self._workers + i,
+            )
+            for i in range(self._workers)
+        ]
+        pool = self.pool()
+        helpers = [pool.apply_async(search_helper, (task,)) for task in tasks]
+        try:
+            return super().search_root(board, depth)
+        finally:
+            stop.value = 1
+            for helper in helpers:
+                helper.wait()
@@ -0,0 +1,138 @@
+"""
+Random games (rollouts) of the Monte Carlo Tree Search, played directly on the masks of
+BitBoards rather than through Connect4Game.
+
+random_game plays one game with integers, random_games plays many games at once with
+NumPy arrays (one 64-bit mask per game and player), and rollouts gives the rewards of a
+batch of leaves using whichever is the fastest for the size of the batch.
+"""
+import random
+
+import numpy as np
+
+# From this number of games, the games of a batch are played together with NumPy.
+VECTOR_BATCH = 64
+
+
+def random_game(board, player, rng=random):
+    """
+    Plays random moves from a board until the last player aligns connect discs or the board
+    is full, like MonteCarlo.simulation. The board is left unchanged.
+
+    :param board: BitBoard to start from
+    :param player: player to move, 1 or -1
+    :param rng: random generator choosing the columns (the random module by default)
+    :return: a tuple (nb_moves, won): the number of moves played and whether the game ended
+        on an alignment (False for a draw, the board being full)
+    """
+    stride = board.stride
+    rows = board.rows
+    cols = board.valid_moves()
+    if board.is_win(-player):
+        return 0, True
+    if not cols:
+        return 0, False
+    mask = board.masks[player]
+    opp_mask = board.masks[-player]
+    heights = list(board.heights)
+    directions = board.line_steps
+    nb_moves = 0
+    while True:
+        c = rng.choice(cols)
+        r = heights[c]
+        heights[c] = r + 1
+        if r + 1 == rows:
+            cols.remove(c)
+        mask |= 1 << (c * stride + r)
+        nb_moves += 1
+        for steps in directions:
+            lines = mask
+            for step in steps:
+                lines &= lines >> step
+            if lines:
+                return nb_moves, True
+        if not cols:
+            return nb_moves, False
+        mask, opp_mask = opp_mask, mask
+
+
+def random_games(boards, players, generator):
+    """
+    Plays a random game from each board, all the games moving forward together: at each
+    step, every game not over yet plays a random valid column. The masks of the boards
+    must fit in 64 bits.
+
+    :param boards: list of BitBoard of the same size, left unchanged
+    :param players: list of the players to move (1 or -1), one per board
+    :param generator: numpy.random.Generator choosing the columns
+    :return: a tuple (nb_moves, won) of numpy arrays: the number of moves played in each
+        game and whether it ended on an alignment (False for a draw, the board being full)
+    """
+    first = boards[0]
+    stride = first.stride
+    rows = first.rows
+    nb_cols = first.cols
+    mask = np.array([b.masks[p] for b, p in zip(boards, players)], dtype=np.uint64)
+    opp_mask = np.array([b.masks[-p] for b, p in zip(boards, players)], dtype=np.uint64)
+    heights = np.array([b.heights for b in boards], dtype=np.int64)
+    directions = [[np.uint64(step) for step in steps] for steps in first.line_steps]
+    one = np.uint64(1)
+
+    def aligned(masks):
+        won = np.zeros(len(masks), dtype=bool)
+        for steps in directions:
+            lines = masks
+            for step in steps:
+                lines = lines & (lines >> step)
+            won |= lines != 0
+        return won
+
+    nb_moves = np.zeros(len(boards), dtype=np.int64)
+    won = aligned(opp_mask)
+    active = ~won & (heights < rows).any(axis=1)
+    games = np.arange(len(boards))
+    while active.any():
+        index = games[active]
+        valid = heights[index] < rows
+        # The k-th valid column of each game, k drawn uniformly.
+        k = (generator.random(len(index)) * valid.sum(axis=1)).astype(np.int64)
+        cols = (valid.cumsum(axis=1) <= k[:, None]).sum(axis=1)
+        r = heights[index, cols]
+        heights[index, cols] = r + 1
+        played = mask[index] | (one << (cols * stride + r).astype(np.uint64))
+        nb_moves[index] += 1
+        aligned_now = aligned(played)
+        won[index] = aligned_now
+        over = aligned_now | (heights[index] == rows).all(axis=1)
+        # The player to move changes: the masks are swapped.
+        mask[index] = opp_mask[index]
+        opp_mask[index] = played
+        active[index[over]] = False
+    return nb_moves, won
+
+
+def rollouts(boards, players, turns, rng=random):
+    """
+    Plays a random game from each board and gives the rewards, like MonteCarlo.simulation.
+
+    :param boards: list of BitBoard, left unchanged
+    :param players: list of the players to move (1 or -1), one per board
+    :param turns: list of the turns (1 or -1) of the players to move, relative to the root
+        of the search, one per board
+    :param rng: random generator (the random module by default), it also seeds the NumPy
+        generator of the large batches
+    :return: list of the rewards, 1 if the player who aligned discs last in the game is the
+        player of the root (turn 1), -1 if it is its opponent and 0 for a draw (the board
+        filled without an alignment)
+    """
+    if len(boards) >= VECTOR_BATCH and boards[0].stride * boards[0].cols <= 64:
+        generator = np.random.default_rng(rng.getrandbits(64))
+        nb_moves, won = random_games(boards, players, generator)
+        results = zip(nb_moves.tolist(), won.tolist())
+    else:
+        results = [random_game(b, p, rng) for b, p in zip(boards, players)]
+    # The turn after the game is turn * (-1) ** n, the winner is the player before it.
+    return [
+        (turn if n % 2 else -turn) if won else 0
+        for turn, (n, won) in zip(turns, results)
+    ]
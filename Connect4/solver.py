@@ -0,0 +1,293 @@
+"""
+Exact solver of Connect 4 positions, used by MiniMax in the endgame (see MiniMax.search).
+
+The search is a negamax with alpha beta pruning on the masks of the board: the value of a
+position is given for the player to move, the value of a move being the opposite of the
+value of the position it leads to. The score of a position tells who wins and how fast:
+
+- 0 if the game ends in a draw with the best play of both players,
+- (rows * cols + 1 - n) // 2 if the player to move wins, n being the number of discs on
+  the board before its winning disc is played, so a faster win has a higher score,
+- the opposite of the score of the opponent if it wins.
+
+The search only ever answers whether the score is above a given value (null window search,
+alpha = beta - 1), which prunes much more than a full window. The score is then found by
+a dichotomy on these values (see Solver.score). The bounds found for the positions are kept
+in a transposition table, a position and its mirror image sharing their entry (see
+canonical): the mirror image of the masks is updated along with them. The moves are tried
+from the one creating the most threats of alignment (and from the centre to the sides),
+and the moves that let the opponent win at once are never tried.
+"""
+from collections import namedtuple
+import math
+
+from canonical import canonical_moves, mirror_mask, mirror_move
+from common import DEFAULT_CONNECT
+from transposition import LOWER_BOUND, UPPER_BOUND, TranspositionTable
+
+WIN = "win"
+LOSS = "loss"
+DRAW = "draw"
+
+# MiniMax solves the boards with at most this number of empty cells.
+DEFAULT_THRESHOLD = 16
+# Default number of entries of the transposition table of the solver.
+SOLVER_TT_SIZE = 1 << 18
+# Odd multiplier spreading the keys of the positions over the slots of the table.
+KEY_MULTIPLIER = 0x9E3779B97F4A7C15
+
+Solution = namedtuple("Solution", ["move", "score", "outcome", "distance"])
+
+
+def outcome(score, nb_moves, rows, cols):
+    """
+    :param score: score of a position, see the documentation of the module
+    :param nb_moves: number of discs on the board of the position
+    :param rows: number of rows of the board
+    :param cols: number of columns of the board
+    :return: a tuple (outcome, distance): WIN, LOSS or DRAW for the player to move, and the
+        number of moves left until the end of the game, the winning disc included
+    """
+    if score == 0:
+        return DRAW, rows * cols - nb_moves
+    # The winning disc is played when n discs are on the board, (rows * cols + 1 - n) // 2
+    # being the score: n is one of two values, of the parity of the winner.
+    n = rows * cols + 1 - 2 * abs(score)
+    winner_parity = nb_moves % 2 if score > 0 else 1 - nb_moves % 2
+    if n % 2 != winner_parity:
+        n -= 1
+    return (WIN if score > 0 else LOSS), n - nb_moves + 1
+
+
+def _bit_count(mask):
+    return bin(mask).count("1")
+
+
+class Solver:
+    """
+    Negamax solver of the positions of a board size, see the documentation of the module.
+    The transposition table is kept from one position to the next.
+    """
+
+    def __init__(self, rows, cols, connect=DEFAULT_CONNECT, tt_size=SOLVER_TT_SIZE):
+        """
+        :param rows: number of rows of the board
+        :param cols: number of columns of the board
+        :param connect: number of discs to align
+        :param tt_size: maximum number of entries of the transposition table
+        """
+        self.rows = rows
+        self.cols = cols
+        self.connect = connect
+        self.stride = rows + 1
+        self.size = rows * cols
+        self._bottom = sum(1 << (c * self.stride) for c in range(cols))
+        self._board_mask = self._bottom * ((1 << rows) - 1)
+        self._column_masks = [((1 << rows) - 1) << (c * self.stride) for c in range(cols)]
+        self._centre_order = sorted(range(cols), key=lambda c: abs(2 * c - (cols - 1)))
+        # Shift moving a disc of each column to the mirror column.
+        self._mirror_shifts = [
+            (mirror_move(c, cols) - c) * self.stride for c in range(cols)
+        ]
+        # For each direction, the shifts of the connect - 1 cells on each side of a cell.
+        self._line_shifts = [
+            [k * shift for k in range(1, connect)]
+            for shift in (1, self.stride, self.stride - 1, self.stride + 1)
+        ]
+        self._tt = TranspositionTable(tt_size)
+        # Number of nodes of the last search.
+        self.nodes = 0
+
+    def solve(self, board, player):
+        """
+        Solves a position, the game must not be over.
+
+        :param board: BitBoard of the position, left unchanged
+        :param player: player to move, 1 or -1
+        :return: a Solution: the best move (the fastest win, the slowest loss), the score
+            of the position and its outcome and distance (see outcome)
+        """
+        current = board.masks[player]
+        mask = current | board.masks[-player]
+        nb_moves = len(board.history)
+        self.nodes = 0
+        self._tt.new_search()
+        best_move, best_score = None, -math.inf
+        # The mirrored moves of a symmetric board have the same score.
+        for col in canonical_moves(board, self._centre_order):
+            move = self.possible(mask) & self._column_masks[col]
+            if not move:
+                continue
+            if self.winning_positions(current, mask) & move:
+                score = (self.size + 1 - nb_moves) // 2
+            elif nb_moves + 1 == self.size:
+                score = 0
+            else:
+                score = -self.score(mask ^ current, mask | move, nb_moves + 1)
+            if score > best_score:
+                best_move, best_score = col, score
+        result, distance = outcome(best_score, nb_moves, self.rows, self.cols)
+        return Solution(best_move, best_score, result, distance)
+
+    def score(self, current, mask, nb_moves):
+        """
+        Finds the score of a position by a dichotomy on null window searches.
+
+        :param current: mask of the player to move
+        :param mask: mask of all the discs
+        :param nb_moves: number of discs on the board
+        :return: the score of the position, see the documentation of the module
+        """
+        if self.winning_positions(current, mask) & self.possible(mask):
+            return (self.size + 1 - nb_moves) // 2
+        mirrored_current = mirror_mask(current, self.rows, self.cols)
+        mirrored_mask = mirror_mask(mask, self.rows, self.cols)
+        low = -((self.size - nb_moves) // 2)
+        high = (self.size + 1 - nb_moves) // 2
+        while low < high:
+            middle = low + (high - low) // 2
+            # The values around 0 are tried first, they are the most frequent.
+            if middle <= 0 and int(low / 2) < middle:
+                middle = int(low / 2)
+            elif middle >= 0 and high // 2 > middle:
+                middle = high // 2
+            value = self.negamax(
+                current,
+                mask,
+                nb_moves,
+                middle,
+                middle + 1,
+                mirrored_current,
+                mirrored_mask,
+            )
+            if value <= middle:
+                high = value
+            else:
+                low = value
+        return low
+
+    def negamax(
+        self, current, mask, nb_moves, alpha, beta, mirrored_current, mirrored_mask
+    ):
+        """
+        Negamax search with alpha beta pruning. The player to move cannot win at once.
+
+        :param current: mask of the player to move
+        :param mask: mask of all the discs
+        :param nb_moves: number of discs on the board
+        :param alpha: the score is only needed if it is above alpha
+        :param beta: the score is only needed if it is below beta
+        :param mirrored_current: mirror image of current
+        :param mirrored_mask: mirror image of mask
+        :return: the score if it is between alpha and beta, otherwise a bound of the score
+            (at most alpha or at least beta)
+        """
+        self.nodes += 1
+        moves = self.non_losing_moves(current, mask)
+        if not moves:
+            # Every move lets the opponent win with its next disc.
+            return -((self.size - nb_moves) // 2)
+        if nb_moves >= self.size - 2:
+            # The two last discs cannot complete a line anymore.
+            return 0
+
+        # The opponent cannot win with its next disc, the score is above this one.
+        low = -((self.size - 2 - nb_moves) // 2)
+        if alpha < low:
+            alpha = low
+            if alpha >= beta:
+                return alpha
+        # The player to move cannot win with this disc, the score is below this one.
+        high = (self.size - 1 - nb_moves) // 2
+        key = min(current + mask, mirrored_current + mirrored_mask) * KEY_MULTIPLIER
+        entry = self._tt.lookup(key)
+        if entry is not None:
+            if entry.flag == LOWER_BOUND:
+                low = entry.value
+                if alpha < low:
+                    alpha = low
+                    if alpha >= beta:
+                        return alpha
+            else:
+                high = entry.value
+        if beta > high:
+            beta = high
+            if alpha >= beta:
+                return beta
+
+        opponent = mask ^ current
+        mirrored_opponent = mirrored_mask ^ mirrored_current
+        ordered = []
+        for col in self._centre_order:
+            move = moves & self._column_masks[col]
+            if move:
+                threats = _bit_count(self.winning_positions(current | move, mask))
+                ordered.append((threats, col, move))
+        # Stable sort: the columns with as many threats stay from the centre to the sides.
+        ordered.sort(key=lambda item: -item[0])
+        depth = self.size - nb_moves
+        for _, col, move in ordered:
+            shift = self._mirror_shifts[col]
+            mirrored_move = move << shift if shift >= 0 else move >> -shift
+            value = -self.negamax(
+                opponent,
+                mask | move,
+                nb_moves + 1,
+                -beta,
+                -alpha,
+                mirrored_opponent,
+                mirrored_mask | mirrored_move,
+            )
+            if value >= beta:
+                self._tt.store(key, depth, LOWER_BOUND, value, None)
+                return value
+            if value > alpha:
+                alpha = value
+        self._tt.store(key, depth, UPPER_BOUND, alpha, None)
+        return alpha
+
+    def possible(self, mask):
+        """
+        :param mask: mask of all the discs
+        :return: mask of the cells where a disc can be played
+        """
+        return (mask + self._bottom) & self._board_mask
+
+    def non_losing_moves(self, current, mask):
+        """
+        :param current: mask of the player to move
+        :param mask: mask of all the discs
+        :return: mask of the playable cells that do not let the opponent win at once
+        """
+        possible = self.possible(mask)
+        threats = self.winning_positions(mask ^ current, mask)
+        forced = possible & threats
+        if forced:
+            if forced & (forced - 1):
+                # Two winning cells for the opponent, it cannot be stopped.
+                return 0
+            possible = forced
+        # Playing below a winning cell of the opponent lets it play there.
+        return possible & ~(threats >> 1)
+
+    def winning_positions(self, position, mask):
+        """
+        :param position: mask of the discs of a player
+        :param mask: mask of all the discs
+        :return: mask of the empty cells (playable or not) that would align connect discs of
+            the player
+        """
+        wins = 0
+        for shifts in self._line_shifts:
+            # The cells with k discs before them, and with k discs after them, for k from 1.
+            before = [position << shifts[0]]
+            after = [position >> shifts[0]]
+            for shift in shifts[1:]:
+                before.append(before[-1] & (position << shift))
+                after.append(after[-1] & (position >> shift))
+            # The cell completes connect - 1 discs: k of them before it, the others after it.
+            wins |= before[-1] | after[-1]
+            last = len(shifts) - 1
+            for k in range(last):
+                wins |= before[k] & after[last - 1 - k]
+        return wins & (self._board_mask ^ mask)
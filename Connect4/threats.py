@@ -0,0 +1,175 @@
+from common import DEFAULT_CONNECT
+from evaluation import board_windows
+
+
+class ThreatMap:
+    """
+    Incremental map of the threats of both players: the empty cells where a disc of the
+    player would complete a line of length discs (see evaluation.board_windows).
+
+    The number of discs of each player is kept for every window. A window holding all its
+    discs but one of a player and none of the opponent is a threat of the player on its
+    empty cell, and
+    each cell counts the windows making it a threat of each player. Placing or removing a
+    disc only updates the windows that contain its cell, so the threats are always known:
+    the winning moves of a player are its threats on the playable cells, found with a few
+    operations on the masks.
+    """
+
+    def __init__(self, rows, cols, length=DEFAULT_CONNECT):
+        """
+        Constructor of the ThreatMap class, for an empty board.
+
+        :param rows: number of rows of the board
+        :param cols: number of columns of the board
+        :param length: number of discs to align
+        """
+        self.rows = rows
+        self.cols = cols
+        self.length = length
+        self.stride = rows + 1
+        self.windows = board_windows(rows, cols, length)
+        size = self.stride * cols
+        # For each cell, the windows that contain it.
+        self.cell_windows = [[] for _ in range(size)]
+        for w, window in enumerate(self.windows):
+            for index in window:
+                self.cell_windows[index].append(w)
+        self._bottom = sum(1 << (c * self.stride) for c in range(cols))
+        self._board_mask = self._bottom * ((1 << rows) - 1)
+        self.reset()
+
+    def reset(self, board=None):
+        """
+        Sets the threats of a board.
+
+        :param board: the BitBoard, None for an empty board
+        """
+        size = self.stride * self.cols
+        self.counts = {1: [0] * len(self.windows), -1: [0] * len(self.windows)}
+        # Number of windows making each cell a threat of the player.
+        self.cell_threats = {1: [0] * size, -1: [0] * size}
+        # Masks of the threats and of the discs of the players.
+        self.masks = {1: 0, -1: 0}
+        self.discs = {1: 0, -1: 0}
+        if board is not None:
+            for player in (1, -1):
+                mask = board.masks[player]
+                for index in range(size):
+                    if mask >> index & 1:
+                        self.add(index, player)
+
+    def copy(self):
+        """
+        :return: an independent copy of the threats, sharing the windows
+        """
+        new_one = ThreatMap.__new__(ThreatMap)
+        new_one.__dict__.update(self.__dict__)
+        new_one.counts = {player: list(self.counts[player]) for player in (1, -1)}
+        new_one.cell_threats = {
+            player: list(self.cell_threats[player]) for player in (1, -1)
+        }
+        new_one.masks = dict(self.masks)
+        new_one.discs = dict(self.discs)
+        return new_one
+
+    def add(self, index, player):
+        """
+        Updates the threats when a disc is placed.
+
+        :param index: index of the cell of the disc
+        :param player: 1 or -1
+        """
+        counts = self.counts[player]
+        opp_counts = self.counts[-player]
+        self.discs[player] |= 1 << index
+        missing = self.length - 1
+        for w in self.cell_windows[index]:
+            count = counts[w]
+            opp_count = opp_counts[w]
+            counts[w] = count + 1
+            if opp_count == 0:
+                if count == missing:
+                    # The threat of the player on this cell is now a complete line.
+                    self._remove_threat(index, player)
+                elif count + 1 == missing:
+                    self._add_threat(self._empty_cell(w), player)
+            elif count == 0 and opp_count == missing:
+                # The threat of the opponent on this cell is blocked.
+                self._remove_threat(index, -player)
+
+    def remove(self, index, player):
+        """
+        Updates the threats when a disc is removed.
+
+        :param index: index of the cell of the disc
+        :param player: 1 or -1
+        """
+        counts = self.counts[player]
+        opp_counts = self.counts[-player]
+        self.discs[player] ^= 1 << index
+        missing = self.length - 1
+        for w in self.cell_windows[index]:
+            count = counts[w] - 1
+            opp_count = opp_counts[w]
+            counts[w] = count
+            if opp_count == 0:
+                if count == missing:
+                    self._add_threat(index, player)
+                elif count + 1 == missing:
+                    self._remove_threat(self._empty_cell(w, index), player)
+            elif count == 0 and opp_count == missing:
+                self._add_threat(index, -player)
+
+    def _empty_cell(self, w, ignored=None):
+        """
+        :param w: index of a window with a single empty cell
+        :param ignored: a cell to consider as occupied
+        :return: the index of the empty cell of the window
+        """
+        occupied = self.discs[1] | self.discs[-1]
+        for index in self.windows[w]:
+            if index != ignored and not occupied >> index & 1:
+                return index
+
+    def _add_threat(self, index, player):
+        threats = self.cell_threats[player]
+        threats[index] += 1
+        if threats[index] == 1:
+            self.masks[player] |= 1 << index
+
+    def _remove_threat(self, index, player):
+        threats = self.cell_threats[player]
+        threats[index] -= 1
+        if threats[index] == 0:
+            self.masks[player] ^= 1 << index
+
+    def playable(self):
+        """
+        :return: mask of the cells where a disc can be placed
+        """
+        return ((self.discs[1] | self.discs[-1]) + self._bottom) & self._board_mask
+
+    def winning_moves(self, player):
+        """
+        :param player: 1 or -1
+        :return: list of the columns where a disc of the player completes a line
+        """
+        wins = self.masks[player] & self.playable()
+        columns = []
+        while wins:
+            bit = wins & -wins
+            columns.append((bit.bit_length() - 1) // self.stride)
+            wins ^= bit
+        return columns
+
+    def winning_move(self, player):
+        """
+        :param player: 1 or -1
+        :return: the first column where a disc of the player completes a line, None
+            if there is none
+        """
+        wins = self.masks[player] & self.playable()
+        if not wins:
+            return None
+        return ((wins & -wins).bit_length() - 1) // self.stride
@@ -0,0 +1,411 @@
+"""
+tournament: play headless round-robin tournaments between Connect 4 bots.
+
+Every pair of bots plays a given number of games, each bot moving first in half of
+them (as player 1, yellow). The games are spread over a pool of processes, game i being
+played with the seed seed + i, so a tournament is reproduced exactly by running it again.
+
+A bot is given as a string:
+    random                  random moves, but a winning move is always played
+    random_impr             like random, and a winning move of the opponent is blocked
+    minimax:DEPTH           MiniMax search at the given depth
+    minimax:DEPTH:SECONDS   MiniMax with a time limit per move (iterative deepening up to DEPTH)
+    mcts:ITERATIONS         Monte Carlo Tree Search with the given number of iterations
+
+One CSV line is written per bot with its Elo rating, its results and the percentiles of
+the time it took to play a move. The ratings are the maximum likelihood ratings of the
+results of the whole tournament (Bradley-Terry model), centred on 1500, so they do not
+depend on the order of the games. An optional second CSV gives the results of every pair.
+
+With --book, the MiniMax and MCTS bots play the moves of the opening book (see opening_book).
+The games are played on a board of 6 rows and 7 columns with 4 discs to align, unless
+another geometry is given with --rows, --cols and --connect.
+
+Usage:
+    python tournament.py random_impr minimax:4 mcts:500 -n 200 -o ratings.csv
+    python tournament.py minimax:6 minimax:6:0.1 --pairs pairs.csv --processes 8
+    python tournament.py minimax:4 mcts:500 --rows 9 --cols 9 --connect 5
+"""
+import argparse
+import csv
+import math
+import multiprocessing
+import random
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from common import (
+    DEFAULT_COLS,
+    DEFAULT_CONNECT,
+    DEFAULT_ROWS,
+    MINIMAX,
+    MONTE_CARLO,
+    RANDOM,
+    RANDOM_IMPR,
+)
+from connect4game import Connect4Game
+from opening_book import book_path
+
+# Rating of the average bot.
+MEAN_ELO = 1500
+# Number of iterations of the computation of the ratings.
+ELO_ITERATIONS = 1000
+PERCENTILES = (50, 90, 99)
+FIELDS = [
+    "bot",
+    "elo",
+    "games",
+    "wins",
+    "draws",
+    "losses",
+    "win_rate",
+    "score",
+    "moves",
+    "latency_p50_ms",
+    "latency_p90_ms",
+    "latency_p99_ms",
+    "latency_max_ms",
+]
+PAIR_FIELDS = ["bot", "opponent", "games", "wins", "draws", "losses", "score"]
+DEFAULT_GEOMETRY = (DEFAULT_ROWS, DEFAULT_COLS, DEFAULT_CONNECT)
+
+BotConfig = namedtuple(
+    "BotConfig", ["name", "type", "depth", "iteration", "time_limit"]
+)
+GameResult = namedtuple("GameResult", ["first", "second", "score", "latencies"])
+
+
+def parse_bot(text):
+    """
+    :param text: description of a bot, see the documentation of the module
+    :return: a BotConfig
+    """
+    kind, *params = text.lower().split(":")
+    try:
+        if kind in ("random", "random_impr") and not params:
+            bot_type = RANDOM if kind == "random" else RANDOM_IMPR
+            return BotConfig(text, bot_type, None, None, None)
+        if kind == "minimax" and 1 <= len(params) <= 2:
+            time_limit = float(params[1]) if len(params) == 2 else None
+            return BotConfig(text, MINIMAX, int(params[0]), None, time_limit)
+        if kind == "mcts" and len(params) == 1:
+            return BotConfig(text, MONTE_CARLO, None, int(params[0]), None)
+    except ValueError:
+        pass
+    raise argparse.ArgumentTypeError(f"invalid bot: {text}")
+
+
+def play_game(task):
+    """
+    Plays one game of the tournament, run in a worker process.
+
+    :param task: a tuple (first, second, bots, seed, book, geometry): the indices in bots of
+        the bot moving first (player 1) and of the other one, the list of the BotConfig, the
+        seed of the game, the path of the opening book of the search bots (None for no book)
+        and the tuple (rows, columns, discs to align) of the board
+    :return: a GameResult, score being 1 if the first bot won, 0 if it lost and 0.5 for a
+        draw, and latencies the times in seconds of the moves of each bot, as two lists
+    """
+    first, second, bots, seed, book, (nb_rows, nb_cols, connect) = task
+    random.seed(seed)
+    one, two = bots[first], bots[second]
+    game = Connect4Game(
+        one.type,
+        two.type,
+        rows=nb_rows,
+        cols=nb_cols,
+        connect=connect,
+        iteration=one.iteration or two.iteration,
+        depth1=one.depth,
+        depth2=two.depth,
+        time_limit1=one.time_limit,
+        time_limit2=two.time_limit,
+        starter=1,
+        book=book,
+    )
+    # The iterations are shared by the MCTS players of a game, they are set per bot.
+    for player, config in ((game._player1, one), (game._player2, two)):
+        if config.type == MONTE_CARLO:
+            player._iteration = config.iteration
+    latencies = {1: [], -1: []}
+    while game.get_win() is None:
+        turn = game._turn
+        start = time.perf_counter()
+        game.bot_place()
+        latencies[turn].append(time.perf_counter() - start)
+    winner = game.get_win()
+    # get_win gives the last player when the board is full, a draw has no alignment.
+    if not game._board.is_win(winner):
+        score = 0.5
+    else:
+        score = 1.0 if winner == 1 else 0.0
+    return GameResult(first, second, score, (latencies[1], latencies[-1]))
+
+
+def elo_ratings(scores, games):
+    """
+    Computes the maximum likelihood ratings of the bots from the results of their games.
+    Every pair is given one extra draw, so that a bot that never won has a finite rating.
+
+    :param scores: array (bots, bots), scores[i, j] being the points of bot i against bot j
+        (1 per win, 0.5 per draw)
+    :param games: array (bots, bots), the number of games between bot i and bot j
+    :return: numpy array of the Elo ratings of the bots, MEAN_ELO on average
+    """
+    played = games > 0
+    wins = scores + 0.5 * played
+    nb_games = games + played
+    strength = np.ones(len(scores))
+    for _ in range(ELO_ITERATIONS):
+        pair = strength[:, None] + strength[None, :]
+        strength = wins.sum(axis=1) / (nb_games / pair).sum(axis=1)
+        strength /= math.exp(np.log(strength).mean())
+    elo = 400 * np.log10(strength)
+    return elo - elo.mean() + MEAN_ELO
+
+
+def schedule(bots, nb_games, seed=0, book=None, geometry=DEFAULT_GEOMETRY):
+    """
+    :param bots: list of BotConfig
+    :param nb_games: number of games of each pair of bots
+    :param seed: seed of the first game
+    :param book: path of the opening book of the search bots, None for no book
+    :param geometry: tuple (rows, columns, discs to align) of the board
+    :return: list of the tasks of the tournament, see play_game
+    """
+    tasks = []
+    for i in range(len(bots)):
+        for j in range(i + 1, len(bots)):
+            for k in range(nb_games):
+                # The bots move first in turns.
+                first, second = (i, j) if k % 2 == 0 else (j, i)
+                tasks.append((first, second, bots, seed + len(tasks), book, geometry))
+    return tasks
+
+
+def run(
+    bots,
+    nb_games,
+    processes=None,
+    seed=0,
+    progress=None,
+    book=None,
+    geometry=DEFAULT_GEOMETRY,
+):
+    """
+    Plays a tournament.
+
+    :param bots: list of BotConfig
+    :param nb_games: number of games of each pair of bots
+    :param processes: number of worker processes (default the number of CPUs)
+    :param seed: seed of the first game
+    :param progress: optional function called with the number of games played and the
+        number of games of the tournament, after each game
+    :param book: path of the opening book of the search bots, None for no book
+    :param geometry: tuple (rows, columns, discs to align) of the board
+    :return: a tuple (wins, draws, latencies): the arrays (bots, bots) of the number of
+        games won by bot i against bot j and of the draws between them, and for each bot
+        the list of the times of its moves in seconds
+    """
+    tasks = schedule(bots, nb_games, seed, book, geometry)
+    wins = np.zeros((len(bots), len(bots)), dtype=np.int64)
+    draws = np.zeros((len(bots), len(bots)), dtype=np.int64)
+    latencies = [[] for _ in bots]
+    with multiprocessing.Pool(processes) as pool:
+        for done, result in enumerate(pool.imap_unordered(play_game, tasks), 1):
+            first, second = result.first, result.second
+            if result.score == 1:
+                wins[first, second] += 1
+            elif result.score == 0:
+                wins[second, first] += 1
+            else:
+                draws[first, second] += 1
+                draws[second, first] += 1
+            latencies[first].extend(result.latencies[0])
+            latencies[second].extend(result.latencies[1])
+            if progress is not None:
+                progress(done, len(tasks))
+    return wins, draws, latencies
+
+
+def rows(bots, wins, draws, latencies):
+    """
+    :param bots: list of BotConfig
+    :param wins: array of the games won by bot i against bot j, see run
+    :param draws: array of the draws between bot i and bot j
+    :param latencies: for each bot, the list of the times of its moves in seconds
+    :return: the CSV lines of the bots (dictionaries, see FIELDS), from the best rated
+    """
+    games = wins + wins.T + draws
+    elo = elo_ratings(wins + 0.5 * draws, games)
+    lines = []
+    for i, bot in enumerate(bots):
+        nb_games = int(games[i].sum())
+        times = np.array(latencies[i]) * 1000
+        row = {
+            "bot": bot.name,
+            "elo": round(float(elo[i]), 1),
+            "games": nb_games,
+            "wins": int(wins[i].sum()),
+            "draws": int(draws[i].sum()),
+            "losses": int(wins[:, i].sum()),
+            "win_rate": round(wins[i].sum() / max(1, nb_games), 4),
+            "score": round(
+                (wins[i].sum() + 0.5 * draws[i].sum()) / max(1, nb_games), 4
+            ),
+            "moves": len(times),
+        }
+        for p in PERCENTILES:
+            value = np.percentile(times, p) if len(times) else 0.0
+            row["latency_p{}_ms".format(p)] = round(float(value), 3)
+        row["latency_max_ms"] = round(float(times.max()) if len(times) else 0.0, 3)
+        lines.append(row)
+    return sorted(lines, key=lambda row: -row["elo"])
+
+
+def pair_rows(bots, wins, draws):
+    """
+    :return: the CSV lines of the results of every bot against every other one, see PAIR_FIELDS
+    """
+    lines = []
+    for i, bot in enumerate(bots):
+        for j, opponent in enumerate(bots):
+            nb_games = int(wins[i, j] + wins[j, i] + draws[i, j])
+            if i == j or nb_games == 0:
+                continue
+            lines.append(
+                {
+                    "bot": bot.name,
+                    "opponent": opponent.name,
+                    "games": nb_games,
+                    "wins": int(wins[i, j]),
+                    "draws": int(draws[i, j]),
+                    "losses": int(wins[j, i]),
+                    "score": round((wins[i, j] + 0.5 * draws[i, j]) / nb_games, 4),
+                }
+            )
+    return lines
+
+
+def write_csv(path, fields, lines):
+    """
+    :param path: output file, "-" for the standard output
+    :param fields: names of the columns
+    :param lines: list of dictionaries
+    """
+    out = sys.stdout if path == "-" else open(path, "w", newline="")
+    writer = csv.DictWriter(out, fieldnames=fields)
+    writer.writeheader()
+    writer.writerows(lines)
+    if out is not sys.stdout:
+        out.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="tournament",
+        description="Headless round-robin tournament between Connect 4 bots.",
+    )
+    parser.add_argument(
+        "bots",
+        nargs="+",
+        type=parse_bot,
+        help="Bots of the tournament: random, random_impr, "
+        "minimax:DEPTH[:SECONDS] or mcts:ITERATIONS.",
+    )
+    parser.add_argument(
+        "-n",
+        "--games",
+        type=int,
+        default=100,
+        help="Number of games of each pair of bots (default 100).",
+    )
+    parser.add_argument(
+        "-o", "--output", default="-", help="CSV output file of the ratings (default stdout)."
+    )
+    parser.add_argument(
+        "--pairs", help="Optional CSV output file of the results of every pair of bots."
+    )
+    parser.add_argument(
+        "-j",
+        "--processes",
+        type=int,
+        default=None,
+        help="Number of processes (default the number of CPUs).",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="Seed of the first game (default 0)."
+    )
+    parser.add_argument(
+        "--rows",
+        type=int,
+        default=DEFAULT_ROWS,
+        help="Number of rows of the board (default {}).".format(DEFAULT_ROWS),
+    )
+    parser.add_argument(
+        "--cols",
+        type=int,
+        default=DEFAULT_COLS,
+        help="Number of columns of the board (default {}).".format(DEFAULT_COLS),
+    )
+    parser.add_argument(
+        "--connect",
+        type=int,
+        default=DEFAULT_CONNECT,
+        help="Number of discs to align (default {}).".format(DEFAULT_CONNECT),
+    )
+    parser.add_argument(
+        "--book",
+        nargs="?",
+        const="",
+        default=None,
+        help="Opening book of the minimax and mcts bots "
+        "(default books/connect<connect>_<rows>x<cols>.book).",
+    )
+    args = parser.parse_args()
+    if len(args.bots) < 2:
+        parser.error("at least two bots are needed")
+    if not 2 <= args.connect <= max(args.rows, args.cols):
+        parser.error("cannot align {} discs on this board".format(args.connect))
+    if args.book == "":
+        args.book = book_path(args.rows, args.cols, args.connect)
+
+    def progress(done, total):
+        if done == total or done % max(1, total // 100) == 0:
+            print("\r{}/{} games".format(done, total), end="", file=sys.stderr, flush=True)
+
+    wins, draws, latencies = run(
+        args.bots,
+        args.games,
+        args.processes,
+        args.seed,
+        progress,
+        args.book,
+        (args.rows, args.cols, args.connect),
+    )
+    print(file=sys.stderr)
+    lines = rows(args.bots, wins, draws, latencies)
+    write_csv(args.output, FIELDS, lines)
+    if args.pairs:
+        write_csv(args.pairs, PAIR_FIELDS, pair_rows(args.bots, wins, draws))
+
+    for row in lines:
+        print(
+            "{:<20} elo {:>7.1f}  win rate {:>6.1%}  draws {:>5}  "
+            "p50 {:>8.2f}ms  p99 {:>8.2f}ms".format(
+                row["bot"],
+                row["elo"],
+                row["win_rate"],
+                row["draws"],
+                row["latency_p50_ms"],
+                row["latency_p99_ms"],
+            ),
+            file=sys.stderr,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+from array import array
+from collections import namedtuple
+import ctypes
+import math
+import multiprocessing
+
+# Kind of value stored in an entry: the exact value of the position, or only a
+# lower bound (the search was cut off by beta) or an upper bound (no move reached alpha).
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+# Default number of entries of a table (a power of 2).
+DEFAULT_SIZE = 1 << 20
+
+# The entries are packed in 64-bit words: the score is stored on 32 bits (the infinite
+# values of the won and lost positions as the largest ones).
+VALUE_BITS = 32
+VALUE_INFINITY = (1 << (VALUE_BITS - 1)) - 1
+# Bit set in the data of every stored entry, an empty slot being 0.
+USED_BIT = 1 << 63
+GENERATION_MASK = (1 << 17) - 1
+# The keys are compared on their 64 low bits.
+KEY_MASK = (1 << 64) - 1
+
+Entry = namedtuple("Entry", ["key", "depth", "flag", "value", "move", "generation"])
+
+
+class TranspositionTable:
+    """
+    Cache of the values of the positions already searched by the MiniMax algorithm.
+    In Connect 4 the same position is often reached through different move orders,
+    with a transposition table it is only searched once.
+
+    The positions are identified by their Zobrist hash (see BitBoard). The table has
+    a fixed number of slots, a position being stored in the slot given by the low bits
+    of its hash. When two positions compete for a slot, the one searched deeper is kept
+    (depth-preferred replacement), unless it comes from the search of a previous move
+    (its generation is older), so the table can be kept from one move to the next.
+
+    Each slot is a pair of 64-bit words of a flat array: the data of the entry (value,
+    depth, flag, move and generation packed in one integer) and the key of the position
+    XORed with this data. The table holds no Python object per entry, so a full table is
+    small and is not scanned by the garbage collector.
+    """
+
+    def __init__(self, size=DEFAULT_SIZE):
+        """
+        Constructor of the TranspositionTable class.
+
+        :param size: maximum number of entries, rounded up to a power of 2
+        """
+        size = 1 << max(0, (size - 1).bit_length())
+        self._mask = size - 1
+        self._slots = self._allocate(size)
+        self._generation = 0
+        self.hits = 0
+        self.probes = 0
+
+    @staticmethod
+    def _allocate(size):
+        """
+        :param size: number of slots
+        :return: the array of the words of the slots, all 0
+        """
+        return array("Q", bytes(16 * size))
+
+    def __len__(self):
+        return sum(1 for data in self._slots[::2] if data)
+
+    def new_search(self):
+        """
+        Called before the search of a new move: the entries stored until now can
+        be replaced by less deep ones.
+        """
+        self._generation += 1
+
+    def set_generation(self, generation):
+        """
+        Sets the generation of the entries stored from now on, so that a table used by
+        another process searching the same move has the generation of the main one.
+
+        :param generation: number of the search
+        """
+        self._generation = generation
+
+    def clear(self):
+        """
+        Removes all the entries.
+        """
+        self._slots = self._allocate(len(self._slots) // 2)
+
+    def lookup(self, key):
+        """
+        :param key: hash of the position
+        :return: the Entry of the position, None if it is not in the table
+        """
+        self.probes += 1
+        index = 2 * (key & self._mask)
+        data = self._slots[index]
+        if data and self._slots[index + 1] ^ data == key & KEY_MASK:
+            self.hits += 1
+            value = (data & ((1 << VALUE_BITS) - 1)) - VALUE_INFINITY
+            if abs(value) == VALUE_INFINITY:
+                value = math.copysign(math.inf, value)
+            move = (data >> 42 & 0xF) - 1
+            return Entry(
+                key,
+                data >> 32 & 0xFF,
+                data >> 40 & 0x3,
+                value,
+                None if move < 0 else move,
+                data >> 46 & GENERATION_MASK,
+            )
+        return None
+
+    def store(self, key, depth, flag, value, move):
+        """
+        Stores the result of the search of a position, unless its slot holds a
+        deeper result of the current search.
+
+        :param key: hash of the position
+        :param depth: depth of the search (less than 256)
+        :param flag: EXACT, LOWER_BOUND or UPPER_BOUND
+        :param value: value found by the search, an integer or an infinite value
+        :param move: best move found (None if there is none), less than 15
+        """
+        index = 2 * (key & self._mask)
+        old = self._slots[index]
+        generation = self._generation & GENERATION_MASK
+        if (
+            old
+            and old >> 46 & GENERATION_MASK == generation
+            and depth < (old >> 32 & 0xFF)
+        ):
+            return
+        if value == math.inf:
+            value = VALUE_INFINITY
+        elif value == -math.inf:
+            value = -VALUE_INFINITY
+        data = (
+            (int(value) + VALUE_INFINITY)
+            | depth << 32
+            | flag << 40
+            | (0 if move is None else move + 1) << 42
+            | generation << 46
+            | USED_BIT
+        )
+        self._slots[index] = data
+        self._slots[index + 1] = (key & KEY_MASK) ^ data
+
+
+class SharedTranspositionTable(TranspositionTable):
+    """
+    Transposition table held in shared memory, for the processes searching the same
+    position together (see parallel_minimax).
+
+    The slots are laid out like the ones of TranspositionTable. The processes read and
+    write them without lock: an entry half written by another process has a key that does
+    not match the hash anymore, it is then ignored as if the slot were empty.
+    """
+
+    def __init__(self, size=DEFAULT_SIZE, slots=None):
+        """
+        Constructor of the SharedTranspositionTable class.
+
+        :param size: maximum number of entries, rounded up to a power of 2
+        :param slots: shared array of another SharedTranspositionTable to use (see
+            shared_slots), None to allocate a new one
+        """
+        super().__init__(size if slots is None else 1)
+        if slots is not None:
+            self._mask = len(slots) // 2 - 1
+            self._slots = slots
+
+    @staticmethod
+    def _allocate(size):
+        return multiprocessing.RawArray(ctypes.c_uint64, 2 * size)
+
+    @property
+    def shared_slots(self):
+        """
+        :return: the shared array of the entries, given to the other processes
+        """
+        return self._slots
+
+    def clear(self):
+        """
+        Removes all the entries.
+        """
+        ctypes.memset(self._slots, 0, ctypes.sizeof(self._slots))